@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Approximate GROUP BY: HyperLogLog COUNT(DISTINCT) and Sampled SUM/AVG
+The SECTION 10 business queries count distinct products per customer and
+distinct customers per product or day. Exact COUNT(DISTINCT) keeps a hash set
+per group that grows with the data; this opt-in mode streams the table in
+chunks and keeps a bounded state per group instead:
+
+- COUNT(DISTINCT col): a HyperLogLog sketch per group. A group starts as
+  the exact set of 32-bit hash prefixes it has seen and is promoted to
+  2**precision one-byte registers only once that set would be larger, so
+  small groups cost less than an exact hash set. Sketches merge by union or
+  register-wise maxima, so chunks, shards or partial results combine
+  without re-reading rows.
+- SUM(col) / AVG(col): exact moments (non-NULL count, sum, sum of squares)
+  of each group's first sample_size rows, plus a uniform reservoir of at most
+  sample_size of its later rows. SUM is the exact part plus the sample mean
+  times the remaining non-NULL count, with a 95% confidence interval over
+  that remainder (finite population corrected); AVG divides by the exact
+  non-NULL count. A group no larger than the reservoir holds no rows and is
+  exact.
+- COUNT(*) and COUNT(col) stay exact; they are one counter per group.
+
+Every estimate comes with an <alias>_error column (95% half-width) and the
+result reports the sketch memory of each group.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from columnar import Column, concat, hash_factorize, table_length
+from groupby_engine import compute_group_ids, group_by
+from scaled_data import generate_sales
+from table_stats import columnar_chunks, distinct_hashes, splitmix64
+
+APPROXIMATE_FUNCTIONS = ('COUNT(*)', 'COUNT', 'COUNT_DISTINCT', 'SUM', 'AVG')
+Z_95 = 1.959964
+# 2**-rank for every register value, so estimates are a table lookup
+INVERSE_POWERS = np.ldexp(1.0, -np.arange(65))
+
+
+def row_hashes(values):
+    """64-bit hash per value, the same hash table_stats.distinct_hashes uses"""
+    if values.dtype == object:
+        uniques, inverse = hash_factorize(values)
+        return distinct_hashes(uniques)[inverse]
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.view(np.int64)
+    elif values.dtype.itemsize != 8 or values.dtype.kind == 'b':
+        values = values.astype(np.int64 if values.dtype.kind in 'iub' else np.float64)
+    return splitmix64(np.ascontiguousarray(values).view(np.uint64))
+
+
+def _leading_zeros(x):
+    """Count leading zero bits of every uint64 (64 for zero) by binary search"""
+    zeros = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (x >> np.uint64(64 - shift)) == 0
+        zeros += shift * empty
+        x = np.where(empty, x << np.uint64(shift), x)
+    return zeros + (x == 0)
+
+
+class GroupedHyperLogLog:
+    """
+    One HyperLogLog sketch per group over the top 32 bits of each hash. A group
+    starts sparse, as the set of distinct 32-bit prefixes it has seen, which
+    counts exactly up to prefix collisions; once that set would take more bytes
+    than 2**precision one-byte registers, the group is promoted to registers.
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        # Four bytes per sparse prefix against one byte per register
+        self.limit = self.m // 4
+        # Row of each group in registers, -1 while the group is sparse
+        self.dense = np.zeros(0, dtype=np.int64)
+        self.registers = np.zeros((0, self.m), dtype=np.uint8)
+        self.sparse_groups = np.zeros(0, dtype=np.int64)
+        self.sparse_prefixes = np.zeros(0, dtype=np.uint32)
+
+    def grow(self, n_groups):
+        if n_groups > len(self.dense):
+            self.dense = np.r_[self.dense, np.full(n_groups - len(self.dense), -1)]
+
+    def add(self, group_ids, hashes):
+        self._add_prefixes(group_ids, (hashes >> np.uint64(32)).astype(np.uint32))
+
+    def _add_prefixes(self, group_ids, prefixes):
+        rows = self.dense[group_ids]
+        dense = rows >= 0
+        self._update_registers(rows[dense], prefixes[dense])
+        # The sparse set is kept sorted by (group, prefix); only unseen pairs are merged in
+        known = self._sparse_keys(self.sparse_groups, self.sparse_prefixes)
+        new = np.sort(self._sparse_keys(group_ids[~dense], prefixes[~dense]))
+        new = new[np.r_[True, new[1:] != new[:-1]]] if len(new) else new
+        position = np.minimum(np.searchsorted(known, new), max(len(known) - 1, 0))
+        if len(known):
+            new = new[known[position] != new]
+        keys = np.sort(np.r_[known, new], kind='stable')
+        self.sparse_groups = (keys >> np.uint64(32)).astype(np.int64)
+        self.sparse_prefixes = keys.astype(np.uint32)
+        counts = np.bincount(self.sparse_groups, minlength=len(self.dense))
+        self._promote(np.flatnonzero(counts > self.limit))
+
+    @staticmethod
+    def _sparse_keys(groups, prefixes):
+        return (groups.astype(np.uint64) << np.uint64(32)) | prefixes.astype(np.uint64)
+
+    def _promote(self, groups):
+        """Give sparse groups registers and fold their prefixes into them"""
+        groups = groups[self.dense[groups] < 0]
+        if not len(groups):
+            return
+        self.dense[groups] = len(self.registers) + np.arange(len(groups))
+        self.registers = np.concatenate(
+            [self.registers, np.zeros((len(groups), self.m), dtype=np.uint8)])
+        moving = self.dense[self.sparse_groups] >= 0
+        self._update_registers(self.dense[self.sparse_groups[moving]],
+                               self.sparse_prefixes[moving])
+        self.sparse_groups = self.sparse_groups[~moving]
+        self.sparse_prefixes = self.sparse_prefixes[~moving]
+
+    def _update_registers(self, rows, prefixes):
+        """Register index from the top bits, rank = leading zeros of the rest + 1"""
+        index = (prefixes >> np.uint32(32 - self.precision)).astype(np.int64)
+        rest = prefixes.astype(np.uint64) << np.uint64(32 + self.precision)
+        rank = np.minimum(_leading_zeros(rest) + 1, 32 - self.precision + 1)
+        np.maximum.at(self.registers.reshape(-1), rows * self.m + index, rank.astype(np.uint8))
+
+    def merge(self, other, group_map):
+        """Fold other's sketches into ours; group_map[i] is our group for other's group i"""
+        self.grow(int(group_map.max()) + 1 if len(group_map) else 0)
+        promoted = np.flatnonzero(other.dense >= 0)
+        if len(promoted):
+            targets = group_map[promoted]
+            self._promote(np.unique(targets))
+            rows = self.dense[targets]
+            self.registers[rows] = np.maximum(self.registers[rows],
+                                              other.registers[other.dense[promoted]])
+        self._add_prefixes(group_map[other.sparse_groups], other.sparse_prefixes)
+
+    @property
+    def relative_error(self):
+        """Standard error of the raw estimate, 1.04 / sqrt(m)"""
+        return 1.04 / math.sqrt(self.m)
+
+    @property
+    def exact(self):
+        """Groups still counted exactly"""
+        return self.dense < 0
+
+    def nbytes(self):
+        """Bytes held per group: 4 per sparse prefix, or the registers"""
+        sparse = 4 * np.bincount(self.sparse_groups, minlength=len(self.dense))
+        return np.where(self.exact, sparse, self.m)
+
+    def estimate(self):
+        estimate = np.bincount(self.sparse_groups, minlength=len(self.dense)).astype(np.float64)
+        if len(self.registers):
+            m = self.m
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+            raw = alpha * m * m / INVERSE_POWERS[self.registers].sum(axis=1)
+            zeros = np.count_nonzero(self.registers == 0, axis=1)
+            # Linear counting while many registers are still empty (small cardinalities)
+            small = (raw <= 2.5 * m) & (zeros > 0)
+            linear = m * np.log(m / np.maximum(zeros, 1))
+            promoted = ~self.exact
+            estimate[promoted] = np.where(small, linear, raw)[self.dense[promoted]]
+        return estimate
+
+
+def _ranks(sorted_groups):
+    """Position of every entry within its run of equal group ids"""
+    positions = np.arange(len(sorted_groups))
+    first = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    return positions - np.maximum.accumulate(np.where(first, positions, 0))
+
+
+class GroupedReservoir:
+    """
+    Per group, exact moments (non-NULL count, sum, sum of squares) of every
+    column over its first `size` rows, and a uniform sample of at most `size`
+    of the rows after them: the rows with the smallest random tags. A group no
+    larger than `size` holds no rows.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.moments = {}
+        self.groups = np.zeros(0, dtype=np.int64)
+        self.tags = np.zeros(0)
+        self.columns = {}
+        self.full = np.zeros(0, dtype=bool)
+        self.cutoff = np.zeros(0)
+
+    def grow(self, n_groups):
+        if n_groups > len(self.full):
+            extra = n_groups - len(self.full)
+            self.seen = np.r_[self.seen, np.zeros(extra, dtype=np.int64)]
+            self.moments = {name: tuple(np.r_[a, np.zeros(extra, dtype=a.dtype)] for a in arrays)
+                            for name, arrays in self.moments.items()}
+            self.full = np.r_[self.full, np.zeros(extra, dtype=bool)]
+            self.cutoff = np.r_[self.cutoff, np.zeros(extra)]
+
+    def _moments(self, name):
+        if name not in self.moments:
+            n_groups = len(self.seen)
+            self.moments[name] = (np.zeros(n_groups, dtype=np.int64), np.zeros(n_groups),
+                                  np.zeros(n_groups))
+        return self.moments[name]
+
+    def add(self, group_ids, columns):
+        """Sum each group's rows up to its first `size` exactly and sample the rest"""
+        order = np.argsort(group_ids, kind='stable')
+        ordinal = np.empty(len(group_ids), dtype=np.int64)
+        ordinal[order] = self.seen[group_ids[order]] + _ranks(group_ids[order])
+        self.seen += np.bincount(group_ids, minlength=len(self.seen))
+        exact = ordinal < self.size
+        for name, column in columns.items():
+            counts, totals, squares = self._moments(name)
+            valid = exact & column.valid
+            values = column.values[valid].astype(np.float64)
+            n_groups = len(counts)
+            counts += np.bincount(group_ids[valid], minlength=n_groups)
+            totals += np.bincount(group_ids[valid], weights=values, minlength=n_groups)
+            squares += np.bincount(group_ids[valid], weights=values * values, minlength=n_groups)
+        if not exact.all():
+            later = ~exact
+            self._sample(group_ids[later], {name: column.filter(later)
+                                            for name, column in columns.items()})
+
+    def _sample(self, group_ids, columns, tags=None):
+        if tags is None:
+            tags = self.rng.random(len(group_ids))
+        # Like a heap root: a row only enters if its tag beats the group's largest kept tag
+        keep = ~self.full[group_ids] | (tags < self.cutoff[group_ids])
+        groups = np.r_[self.groups, group_ids[keep]]
+        tags = np.r_[self.tags, tags[keep]]
+        merged = {name: Column(np.r_[self.columns[name].values, column.values[keep]],
+                               np.r_[self.columns[name].valid, column.valid[keep]])
+                  if name in self.columns else column.filter(keep)
+                  for name, column in columns.items()}
+
+        # Only groups that overflow their reservoir are sorted and trimmed
+        counts = np.bincount(groups, minlength=len(self.full))
+        keep = np.ones(len(groups), dtype=bool)
+        overflow = np.flatnonzero((counts > self.size)[groups])
+        if len(overflow):
+            order = overflow[np.argsort(tags[overflow], kind='stable')]
+            order = order[np.argsort(groups[order], kind='stable')]
+            keep[order[_ranks(groups[order]) >= self.size]] = False
+
+        self.groups, self.tags = groups[keep], tags[keep]
+        self.columns = {name: column.filter(keep) for name, column in merged.items()}
+        self.full = np.minimum(counts, self.size) >= self.size
+        in_full = self.full[self.groups]
+        self.cutoff[:] = 0.0
+        np.maximum.at(self.cutoff, self.groups[in_full], self.tags[in_full])
+
+    def merge(self, other, group_map):
+        self.grow(int(group_map.max()) + 1 if len(group_map) else 0)
+        np.add.at(self.seen, group_map, other.seen)
+        for name, arrays in other.moments.items():
+            for mine, theirs in zip(self._moments(name), arrays):
+                np.add.at(mine, group_map, theirs)
+        if len(other.groups):
+            self._sample(group_map[other.groups], other.columns, other.tags)
+
+    def nbytes(self, n_groups):
+        """Row counter and moments per group, plus tag and sampled values per kept row"""
+        row_bytes = self.tags.itemsize + sum(c.values.itemsize + 1 for c in self.columns.values())
+        group_bytes = self.seen.itemsize + sum(a.itemsize for arrays in self.moments.values()
+                                               for a in arrays)
+        return group_bytes + np.bincount(self.groups, minlength=n_groups) * row_bytes
+
+    def estimate(self, source, counts):
+        """
+        AVG and SUM of a column with 95% half-widths, given exact non-NULL
+        counts: the exact part plus the sampled rows' mean scaled to the rest
+        """
+        n_groups = len(counts)
+        exact_count, exact_total, _ = self._moments(source)
+        k = total = squares = np.zeros(n_groups)
+        column = self.columns.get(source)
+        if column is not None:
+            groups = self.groups[column.valid]
+            values = column.values[column.valid].astype(np.float64)
+            k = np.bincount(groups, minlength=n_groups)
+            total = np.bincount(groups, weights=values, minlength=n_groups)
+            squares = np.bincount(groups, weights=values * values, minlength=n_groups)
+        rest = counts - exact_count
+        mean = np.divide(total, k, out=np.zeros(n_groups), where=k > 0)
+        variance = np.divide(squares - total * mean, k - 1, out=np.full(n_groups, np.inf),
+                             where=k > 1)
+        # Finite population correction: no error once the sample is the whole rest
+        half = np.zeros(n_groups)
+        partial = k < rest
+        correction = 1 - k[partial] / rest[partial]
+        half[partial] = Z_95 * np.sqrt(np.maximum(variance[partial], 0)
+                                       / np.maximum(k[partial], 1) * correction)
+        sums, sum_half = exact_total + rest * mean, rest * half
+        average = np.divide(sums, counts, out=np.zeros(n_groups), where=counts > 0)
+        average_half = np.divide(sum_half, counts, out=np.zeros(n_groups), where=counts > 0)
+        return average, average_half, sums, sum_half
+
+
+class ApproximateGroupBy:
+    """
+    Streaming approximate GROUP BY over chunks of a columnar table.
+
+    aggregates: list of (alias, function, source) as in groupby_engine.group_by,
+    where source is a column name, a function of the chunk returning a Column
+    (an expression such as quantity * unit_price), or None for COUNT(*).
+    """
+
+    def __init__(self, keys, aggregates, precision=12, sample_size=1024, seed=42):
+        for alias, func, _ in aggregates:
+            if func not in APPROXIMATE_FUNCTIONS:
+                raise ValueError(f"{func} has no approximate form ({alias})")
+        self.keys = keys
+        self.aggregates = aggregates
+        self.group_keys = {}
+        self.key_parts = [[] for _ in keys]
+        self.counts = {}
+        self.sketches = {alias: GroupedHyperLogLog(precision)
+                         for alias, func, _ in aggregates if func == 'COUNT_DISTINCT'}
+        self.reservoir = GroupedReservoir(sample_size, np.random.default_rng(seed))
+        self.row_counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def n_groups(self):
+        return len(self.group_keys)
+
+    def _global_ids(self, key_rows, key_columns):
+        """Map key tuples to stable group ids, registering new groups and their key values"""
+        known = self.n_groups
+        ids = np.empty(len(key_rows), dtype=np.int64)
+        for i, key in enumerate(key_rows):
+            ids[i] = self.group_keys.setdefault(key, len(self.group_keys))
+        new = ids >= known
+        for parts, column in zip(self.key_parts, key_columns):
+            parts.append(column.filter(new))
+        self._grow()
+        return ids
+
+    def key_columns(self):
+        return [concat(parts) for parts in self.key_parts]
+
+    def _grow(self):
+        n_groups = self.n_groups
+        self.row_counts = np.r_[self.row_counts,
+                                np.zeros(n_groups - len(self.row_counts), dtype=np.int64)]
+        for alias in list(self.counts):
+            counts = self.counts[alias]
+            self.counts[alias] = np.r_[counts, np.zeros(n_groups - len(counts), dtype=np.int64)]
+        for sketch in self.sketches.values():
+            sketch.grow(n_groups)
+        self.reservoir.grow(n_groups)
+
+    def update(self, chunk):
+        n_rows = table_length(chunk)
+        key_columns = [chunk[k] for k in self.keys]
+        local_ids, _, first_rows = compute_group_ids(key_columns, n_rows)
+        first_keys = [c.take(first_rows) for c in key_columns]
+        key_rows = list(zip(*(c.to_list() for c in first_keys))) if self.keys else [()]
+        group_ids = self._global_ids(key_rows, first_keys)[local_ids]
+        self.row_counts += np.bincount(group_ids, minlength=self.n_groups)
+
+        sampled = {}
+        for alias, func, source in self.aggregates:
+            if func == 'COUNT(*)':
+                continue
+            column = chunk[source] if isinstance(source, str) else source(chunk)
+            counts = np.bincount(group_ids[column.valid], minlength=self.n_groups)
+            self.counts[alias] = self.counts.get(alias, np.zeros(self.n_groups, np.int64)) + counts
+            if func == 'COUNT_DISTINCT':
+                self.sketches[alias].add(group_ids[column.valid],
+                                         row_hashes(column.values[column.valid]))
+            elif func in ('SUM', 'AVG'):
+                # SUM and AVG of the same source share one sampled column
+                sampled[source] = column
+        if sampled:
+            self.reservoir.add(group_ids, sampled)
+        return self
+
+    def merge(self, other):
+        """Combine the state of another ApproximateGroupBy over different rows"""
+        group_map = self._global_ids(list(other.group_keys), other.key_columns())
+        np.add.at(self.row_counts, group_map, other.row_counts)
+        for alias, counts in other.counts.items():
+            self.counts.setdefault(alias, np.zeros(self.n_groups, dtype=np.int64))
+            np.add.at(self.counts[alias], group_map, counts)
+        for alias, sketch in other.sketches.items():
+            self.sketches[alias].merge(sketch, group_map)
+        if other.reservoir.moments:
+            self.reservoir.merge(other.reservoir, group_map)
+        return self
+
+    def sketch_bytes(self):
+        """State kept per group: counters, HyperLogLog prefixes or registers, reservoir"""
+        counters = 8 * (1 + len(self.counts))
+        sketches = sum(s.nbytes() for s in self.sketches.values())
+        return counters + sketches + self.reservoir.nbytes(self.n_groups)
+
+    def result(self):
+        """Keys, then per aggregate the estimate and <alias>_error, then sketch_bytes"""
+        result = dict(zip(self.keys, self.key_columns()))
+        for alias, func, source in self.aggregates:
+            if func == 'COUNT(*)':
+                result[alias] = Column(self.row_counts.copy())
+            elif func == 'COUNT':
+                result[alias] = Column(self.counts[alias].copy())
+            elif func == 'COUNT_DISTINCT':
+                sketch = self.sketches[alias]
+                estimate = np.minimum(sketch.estimate(), self.counts[alias])
+                result[alias] = Column(np.round(estimate).astype(np.int64))
+                error = np.where(sketch.exact, 0.0, Z_95 * sketch.relative_error * estimate)
+                result[f'{alias}_error'] = Column(error)
+            else:
+                counts = self.counts[alias]
+                avg, avg_half, total, total_half = self.reservoir.estimate(source, counts)
+                value, half = (avg, avg_half) if func == 'AVG' else (total, total_half)
+                result[alias] = Column(value, counts > 0)
+                result[f'{alias}_error'] = Column(half, counts > 0)
+        result['sketch_bytes'] = Column(self.sketch_bytes())
+        return result
+
+
+def approximate_group_by(chunks, keys, aggregates, **options):
+    """One streaming pass of ApproximateGroupBy over an iterable of chunks"""
+    state = ApproximateGroupBy(keys, aggregates, **options)
+    for chunk in chunks:
+        state.update(chunk)
+    return state.result()
+
+
+# ----------------------------------------------------------------------------
+# Benchmark: the SECTION 10 COUNT(DISTINCT) queries on the sales table
+# ----------------------------------------------------------------------------
+
+def revenue(table):
+    return table['quantity'] * table['unit_price']
+
+
+QUERIES = [
+    # label, keys, aggregates, HyperLogLog precision
+    ("Ex2: per customer", ['customer_id'],
+     [('total_purchases', 'COUNT(*)', None), ('unique_products', 'COUNT_DISTINCT', 'product_id'),
+      ('total_spent', 'SUM', revenue), ('avg_purchase', 'AVG', revenue)], 10),
+    ("Ex3: per product", ['product_id'],
+     [('times_sold', 'COUNT(*)', None), ('unique_customers', 'COUNT_DISTINCT', 'customer_id'),
+      ('total_revenue', 'SUM', revenue), ('avg_sale_value', 'AVG', revenue)], 12),
+    ("Ex4: per day", ['sale_date'],
+     [('daily_sales', 'COUNT(*)', None), ('unique_customers', 'COUNT_DISTINCT', 'customer_id'),
+      ('daily_units', 'SUM', 'quantity'), ('avg_order_value', 'AVG', revenue)], 12),
+]
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _aligned(exact, approximate, keys):
+    """Row positions in approximate for every exact group (NULL keys included)"""
+    positions = {row: i for i, row in
+                 enumerate(zip(*(approximate[k].to_list() for k in keys)))}
+    return np.array([positions[row] for row in zip(*(exact[k].to_list() for k in keys))])
+
+
+def _accuracy(exact, approximate, alias):
+    """Mean and max relative error over groups, and the share inside the reported bound"""
+    truth, estimate = exact[alias], approximate[alias]
+    both = truth.valid & estimate.valid & (truth.values != 0)
+    actual = truth.values[both].astype(np.float64)
+    error = np.abs(estimate.values[both] - actual)
+    covered = error <= approximate[f'{alias}_error'].values[both] + 1e-9 * np.abs(actual)
+    relative = error / np.abs(actual)
+    return relative.mean(), relative.max(), covered.mean()
+
+
+def run_benchmark(n_rows, sample_size, chunk_rows):
+    sales = generate_sales(n_rows)
+    print(f"\nScale: {n_rows:,} sales rows, reservoir {sample_size:,} rows per group")
+    print(f"{'Query / aggregate':<36}{'Mean err':>10}{'Max err':>10}{'In bound':>10}")
+    print("-" * 78)
+    for label, keys, aggregates, precision in QUERIES:
+        exact_aggregates = [(alias, func, source(sales) if callable(source) else source)
+                            for alias, func, source in aggregates]
+        exact_time, exact = _timed(lambda: group_by(sales, keys, exact_aggregates))
+        approximate_time, approximate = _timed(lambda: approximate_group_by(
+            columnar_chunks(sales, chunk_rows), keys, aggregates, precision=precision,
+            sample_size=sample_size))
+        rows = _aligned(exact, approximate, keys)
+        approximate = {name: column.take(rows) for name, column in approximate.items()}
+
+        distinct = [alias for alias, func, _ in aggregates if func == 'COUNT_DISTINCT']
+        hash_set_bytes = sum(int(exact[alias].values.sum()) * 8 for alias in distinct)
+        sketch_bytes = int(approximate['sketch_bytes'].values.sum())
+        n_groups = len(rows)
+        print(f"{label} ({n_groups:,} groups, HLL p={precision}): exact {exact_time:.2f}s, "
+              f"approximate {approximate_time:.2f}s")
+        print(f"  state: exact hash sets >= {hash_set_bytes / 2 ** 20:.1f} MB, "
+              f"sketches {sketch_bytes / 2 ** 20:.1f} MB "
+              f"({sketch_bytes / n_groups / 1024:.1f} KB per group)")
+        for alias, func, _ in aggregates:
+            if func in ('COUNT_DISTINCT', 'SUM', 'AVG'):
+                mean_error, max_error, covered = _accuracy(exact, approximate, alias)
+                print(f"  {func + '(' + alias + ')':<34}{mean_error:>9.2%}{max_error:>10.2%}"
+                      f"{covered:>10.1%}")
+
+        # Per-group report for the two groups with the largest state
+        sample = np.argsort(approximate['sketch_bytes'].values, kind='stable')[-2:]
+        for i in sample.tolist():
+            key = ', '.join(str(approximate[k].to_list()[i]) for k in keys)
+            parts = [f"{alias}={approximate[alias].values[i]:,.0f}"
+                     f"±{approximate[alias + '_error'].values[i]:,.0f}"
+                     f" (exact {exact[alias].values[i]:,.0f})"
+                     for alias, func, _ in aggregates if func in ('COUNT_DISTINCT', 'SUM')]
+            print(f"    {key}: {'; '.join(parts)}; "
+                  f"{approximate['sketch_bytes'].values[i] / 1024:.1f} KB")
+
+
+def check_merge(n_rows, chunk_rows):
+    """Two halves aggregated separately and merged keep the same sketches and counts"""
+    sales = generate_sales(n_rows)
+    _, keys, aggregates, precision = QUERIES[1]
+    chunks = list(columnar_chunks(sales, chunk_rows))
+    whole = ApproximateGroupBy(keys, aggregates, precision=precision)
+    for chunk in chunks:
+        whole.update(chunk)
+    halves = [ApproximateGroupBy(keys, aggregates, precision=precision, seed=seed)
+              for seed in (1, 2)]
+    for i, chunk in enumerate(chunks):
+        halves[i % 2].update(chunk)
+    merged = halves[0].merge(halves[1])
+    rows = _aligned(whole.result(), merged.result(), keys)
+    sketch, single = merged.sketches['unique_customers'], whole.sketches['unique_customers']
+    return (np.array_equal(sketch.estimate()[rows], single.estimate())
+            and np.array_equal(sketch.exact[rows], single.exact)
+            and np.array_equal(merged.row_counts[rows], whole.row_counts))
+
+
+def main():
+    """Compare approximate with exact COUNT(DISTINCT), SUM and AVG on the scaled sales table"""
+    parser = argparse.ArgumentParser(description="Approximate aggregation mode")
+    parser.add_argument('--rows', type=int, nargs='+', default=[5_000_000])
+    parser.add_argument('--sample-size', type=int, default=1024)
+    parser.add_argument('--chunk-rows', type=int, default=262144)
+    args = parser.parse_args()
+
+    print("Approximate aggregation: HyperLogLog COUNT(DISTINCT), sampled SUM/AVG")
+    print("=" * 78)
+    ok = check_merge(200_000, 50_000)
+    print(f"{'✓' if ok else '✗'} sketches merged from two halves equal a single pass")
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.sample_size, args.chunk_rows)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Deferred Index Builds for Bulk Loads of the Q5 & Q6 Schemas
+SECTION 8 of q5_join_examples.sql drops and recreates idx_employees_dept_id
+to show what an index costs. This script measures the same trade-off for a
+whole bulk load by loading the scaled example tables into file-backed SQLite
+databases three ways:
+
+- none: no secondary indexes (the reference for raw insert cost)
+- indexed: the sql/ indexes exist before the load, so every row updates
+  every index B-tree at a random position as it arrives
+- deferred: rows are sorted by primary key and appended in key order,
+  then each index is built in one pass; CREATE INDEX sorts the keys first
+  and writes the index B-tree left to right, with full pages
+
+Both indexed databases must hold the same rows and index definitions. The
+SQLite-runnable sql/ queries whose plans SEARCH a secondary index, plus point
+and range lookups on the indexed columns, are timed on all three databases:
+the deferred build should lose nothing at query time against the indexed
+path, and both should beat the unindexed one. --shuffled delivers rows in
+random order, which the deferred path sorts before appending.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from index_advisor import best_time, database_bytes
+from scaled_data import (generate_customers, generate_departments, generate_employees,
+                         generate_products, generate_projects, generate_sales, load_into_sqlite,
+                         secondary_indexes)
+from sql_workload import runnable_queries
+
+MODES = ('none', 'indexed', 'deferred')
+LOOKUPS = [
+    "SELECT COUNT(*), SUM(quantity) FROM sales WHERE customer_id = 4242",
+    "SELECT COUNT(*) FROM sales WHERE sale_date BETWEEN '2024-03-01' AND '2024-03-07'",
+    "SELECT region, product_id, COUNT(*) FROM sales WHERE region = 'North' AND product_id = 150 "
+    "GROUP BY region, product_id",
+    "SELECT name, salary FROM employees WHERE dept_id = 120",
+]
+
+
+def generate_tables(n_sales, n_employees, shuffled, seed=42):
+    """Every scaled Q5/Q6 table, optionally in random arrival order"""
+    n_departments = max(4, n_employees // 50)
+    tables = {
+        'departments': generate_departments(n_departments, seed=seed),
+        'employees': generate_employees(n_employees, n_departments, seed=seed),
+        'projects': generate_projects(n_departments * 2, n_departments, seed=seed),
+        'products': generate_products(seed=seed),
+        'customers': generate_customers(seed=seed),
+        'sales': generate_sales(n_sales, seed=seed),
+    }
+    if shuffled:
+        rng = np.random.default_rng(seed)
+        for name, table in tables.items():
+            order = rng.permutation(len(next(iter(table.values()))))
+            tables[name] = {c: column.take(order) for c, column in table.items()}
+    return tables
+
+
+def load(path, tables, mode):
+    """Load every table in one mode; returns per-table seconds"""
+    conn = sqlite3.connect(path)
+    seconds = {}
+    for name, table in tables.items():
+        start = time.perf_counter()
+        load_into_sqlite(conn, name, table, index_mode=None if mode == 'none' else mode)
+        seconds[name] = time.perf_counter() - start
+    conn.close()
+    return seconds
+
+
+def fingerprint(conn, tables):
+    """Digest of every row in primary-key order plus the index definitions"""
+    digest = hashlib.sha256()
+    for name in tables:
+        for row in conn.execute(f"SELECT * FROM {name} ORDER BY rowid"):
+            digest.update(repr(row).encode())
+    for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' "
+                               "AND sql IS NOT NULL ORDER BY name"):
+        digest.update(sql.encode())
+    return digest.hexdigest()
+
+
+def index_queries(conn):
+    """Runnable sql/ queries that SEARCH a secondary index, plus the indexed lookups"""
+    names = [ddl.split()[2] for name in ('sales', 'employees', 'departments')
+             for ddl in secondary_indexes(name)]
+    queries = []
+    for statement in runnable_queries(conn):
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {statement.sql}").fetchall()
+        if any(row[-1].startswith('SEARCH') and any(n in row[-1] for n in names) for row in plan):
+            queries.append((statement.label, statement.sql))
+    return queries + [(f"lookup #{i + 1}", sql) for i, sql in enumerate(LOOKUPS)]
+
+
+def main():
+    """Compare indexed-insert and deferred-index bulk loads: load time, size and query latency"""
+    parser = argparse.ArgumentParser(description="Deferred index builds for bulk loads")
+    parser.add_argument('--sales', type=int, default=2_000_000)
+    parser.add_argument('--employees', type=int, default=20_000)
+    parser.add_argument('--shuffled', action='store_true',
+                        help="rows arrive in random order instead of primary-key order")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=1.0, help="seconds allowed per query")
+    args = parser.parse_args()
+
+    print("Deferred index build for bulk loads")
+    print("=" * 90)
+    tables = generate_tables(args.sales, args.employees, args.shuffled)
+    directory = tempfile.mkdtemp()
+    try:
+        paths = {mode: os.path.join(directory, f'{mode}.db') for mode in MODES}
+        timings = {mode: load(paths[mode], tables, mode) for mode in MODES}
+        conns = {mode: sqlite3.connect(paths[mode]) for mode in MODES}
+
+        print(f"{'Table':<14}{'Rows':>12}{'Indexes':>9}"
+              + ''.join(f"{mode:>12}" for mode in MODES) + f"{'Speedup':>10}")
+        print("-" * 90)
+        for name, table in tables.items():
+            n_rows = len(next(iter(table.values())))
+            row = [timings[mode][name] for mode in MODES]
+            speedup = f"{row[1] / row[2]:.2f}x" if secondary_indexes(name) else ''
+            print(f"{name:<14}{n_rows:>12,}{len(secondary_indexes(name)):>9}"
+                  + ''.join(f"{t:>11.2f}s" for t in row) + f"{speedup:>10}")
+        totals = [sum(timings[mode].values()) for mode in MODES]
+        sizes = [database_bytes(conns[mode]) / 2 ** 20 for mode in MODES]
+        print("-" * 90)
+        print(f"{'Total load':<35}" + ''.join(f"{t:>11.2f}s" for t in totals)
+              + f"{totals[1] / totals[2]:>9.2f}x")
+        print(f"{'Database size':<35}" + ''.join(f"{s:>10.1f}MB" for s in sizes))
+        print(f"Index maintenance: indexed inserts {totals[1] - totals[0]:.2f}s, "
+              f"deferred build {totals[2] - totals[0]:.2f}s "
+              f"({'shuffled' if args.shuffled else 'primary-key'} arrival order)")
+        same = fingerprint(conns['indexed'], tables) == fingerprint(conns['deferred'], tables)
+        print(f"{'✓' if same else '✗'} indexed and deferred databases hold identical rows "
+              f"and index definitions")
+        ok = conns['deferred'].execute("PRAGMA quick_check").fetchone()[0] == 'ok'
+        print(f"{'✓' if ok else '✗'} PRAGMA quick_check on the deferred database")
+
+        print()
+        print(f"{'Query':<22}" + ''.join(f"{mode:>12}" for mode in MODES)
+              + f"{'Ratio':>9}  Same plan")
+        print("-" * 90)
+        ratios = []
+        for label, sql in index_queries(conns['indexed']):
+            plans = [conns[m].execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+                     for m in ('indexed', 'deferred')]
+            times = [best_time(conns[m], sql, args.repeat, args.budget) for m in MODES]
+            if None in times[1:]:
+                print(f"{label:<22}{'over budget':>36}")
+                continue
+            ratios.append(times[1] / times[2])
+            unindexed = f"{times[0] * 1000:>10.2f}ms" if times[0] is not None else f"{'> budget':>12}"
+            print(f"{label:<22}{unindexed}{times[1] * 1000:>10.2f}ms{times[2] * 1000:>10.2f}ms"
+                  f"{ratios[-1]:>8.2f}x  {'✓' if plans[0] == plans[1] else '✗'}")
+        print("-" * 90)
+        print(f"Geometric mean query speed, deferred vs indexed: "
+              f"{np.exp(np.mean(np.log(ratios))):.2f}x")
+        for conn in conns.values():
+            conn.close()
+    finally:
+        shutil.rmtree(directory)
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Columnar Storage for the Example Tables
+Each table is a directory holding one file per column plus a manifest:
+
+    sales/
+        manifest.json        row count, and per column: dtype, files, NULL count
+        quantity.bin         raw little-endian typed array (np.memmap-able)
+        quantity.valid       validity bitmap, 1 bit per row (only if NULLs exist)
+        email.bin            UTF-8 string bytes, back to back
+        email.offsets        int64 start offsets (n_rows + 1) into email.bin
+        region.bin           dictionary codes (int8/16/32) for a low-cardinality string
+        region.dict.bin      the sorted dictionary, stored like a string column
+
+Opening a table maps the files without reading them: numeric, date and
+dictionary code columns are zero-copy NumPy views, bitmaps are unpacked and
+plain string columns decoded only when a query first touches them.
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+
+from columnar import Column, DictionaryColumn, concat, dictionary_encode, table_length
+from groupby_engine import group_by, rows_match, result_rows
+from scaled_data import create_sales_database, generate_sales
+from table_stats import sqlite_chunks
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'column_store')
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+# String columns with at most this many distinct values per row are dictionary encoded
+MAX_DICTIONARY_RATIO = 0.5
+
+
+def _map(path, dtype, count):
+    """Read-only memory map; empty files cannot be mapped, so return an empty array"""
+    if count == 0 or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _write_strings(path, column):
+    encoded = [v.encode() if ok else b''
+               for v, ok in zip(column.values.tolist(), column.valid.tolist())]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)),
+              out=offsets[1:])
+    offsets.tofile(path + '.offsets')
+    with open(path + '.bin', 'wb') as handle:
+        handle.write(b''.join(encoded))
+
+
+def _read_strings(path, n_rows):
+    offsets = _map(path + '.offsets', '<i8', n_rows + 1)
+    blob = bytes(_map(path + '.bin', np.uint8, int(offsets[-1])) if n_rows else b'')
+    bounds = offsets.tolist()
+    if blob.isascii():
+        # Byte offsets are character offsets, so slice the decoded text directly
+        text = blob.decode('ascii')
+        items = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    else:
+        items = [blob[a:b].decode() for a, b in zip(bounds, bounds[1:])]
+    return np.array(items, dtype=object)
+
+
+def _read_valid(path, spec, n_rows):
+    if not spec['null_count']:
+        return np.ones(n_rows, dtype=bool)
+    bitmap = _map(path + '.valid', np.uint8, math.ceil(n_rows / 8))
+    return np.unpackbits(bitmap, count=n_rows, bitorder='little').view(bool)
+
+
+def _encoded(column, n_rows):
+    """The column dictionary encoded if it is a string column worth encoding"""
+    if isinstance(column, DictionaryColumn) or column.values.dtype != object:
+        return column
+    encoded = dictionary_encode(column)
+    return encoded if len(encoded.dictionary) <= MAX_DICTIONARY_RATIO * n_rows else column
+
+
+def write_table(directory, table, encode_strings=True):
+    """Write a columnar table (dict of name -> Column) as one file per column"""
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    n_rows = table_length(table)
+    specs = []
+    for name, column in table.items():
+        path = os.path.join(directory, name)
+        spec = {'name': name, 'null_count': column.null_count}
+        if encode_strings:
+            column = _encoded(column, n_rows)
+        if isinstance(column, DictionaryColumn):
+            spec['dtype'] = 'dictionary'
+            spec['code_dtype'] = column.codes.dtype.newbyteorder('<').str
+            spec['dictionary_size'] = len(column.dictionary)
+            column.codes.astype(spec['code_dtype'], copy=False).tofile(path + '.bin')
+            _write_strings(path + '.dict', Column(column.dictionary))
+        elif column.values.dtype == object:
+            spec['dtype'] = 'utf8'
+            _write_strings(path, column)
+        else:
+            values = column.values.astype(column.values.dtype.newbyteorder('<'), copy=False)
+            spec['dtype'] = values.dtype.str
+            np.ascontiguousarray(values).tofile(path + '.bin')
+        if spec['null_count']:
+            np.packbits(column.valid, bitorder='little').tofile(path + '.valid')
+        specs.append(spec)
+    # The manifest goes last so a half-written table is never opened
+    with open(os.path.join(directory, MANIFEST), 'w') as handle:
+        json.dump({'format': FORMAT_VERSION, 'rows': n_rows, 'columns': specs}, handle, indent=1)
+
+
+class MappedColumn(Column):
+    """A Column backed by files; values and validity are materialized on first access"""
+
+    def __init__(self, directory, spec, n_rows):
+        self._path = os.path.join(directory, spec['name'])
+        self._spec = spec
+        self._n_rows = n_rows
+        self._values = None
+        self._valid = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            if self._spec['dtype'] == 'utf8':
+                self._values = _read_strings(self._path, self._n_rows)
+            else:
+                self._values = _map(self._path + '.bin', np.dtype(self._spec['dtype']),
+                                    self._n_rows)
+        return self._values
+
+    @property
+    def valid(self):
+        if self._valid is None:
+            self._valid = _read_valid(self._path, self._spec, self._n_rows)
+        return self._valid
+
+    def __len__(self):
+        return self._n_rows
+
+    @property
+    def null_count(self):
+        return self._spec['null_count']
+
+
+def open_table(directory):
+    """Map a table written by write_table; only the small string dictionaries are read up front"""
+    with open(os.path.join(directory, MANIFEST)) as handle:
+        manifest = json.load(handle)
+    if manifest['format'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported column store format: {manifest['format']}")
+    n_rows = manifest['rows']
+    table = {}
+    for spec in manifest['columns']:
+        if spec['dtype'] == 'dictionary':
+            path = os.path.join(directory, spec['name'])
+            table[spec['name']] = DictionaryColumn(
+                _map(path + '.bin', np.dtype(spec['code_dtype']), n_rows),
+                _read_strings(path + '.dict', spec['dictionary_size']),
+                _read_valid(path, spec, n_rows))
+        else:
+            table[spec['name']] = MappedColumn(directory, spec, n_rows)
+    return table
+
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+
+def tables_equal(expected, actual):
+    """Same columns, NULL positions and non-NULL values"""
+    if list(expected) != list(actual):
+        return False
+    for name, column in expected.items():
+        other = actual[name]
+        if not np.array_equal(column.valid, other.valid):
+            return False
+        if not np.array_equal(column.values[column.valid], other.values[other.valid]):
+            return False
+    return True
+
+
+# ----------------------------------------------------------------------------
+# Benchmark: startup cost of SQLite rows vs mapped columns
+# ----------------------------------------------------------------------------
+
+QUERY_KEYS = ['region']
+QUERY_AGGREGATES = [('sales', 'COUNT(*)', None), ('total_quantity', 'SUM', 'quantity'),
+                    ('avg_discount', 'AVG', 'discount')]
+
+
+def load_from_sqlite(conn, name):
+    """The row-at-a-time path: SELECT * and convert each batch of tuples to columns"""
+    chunks = list(sqlite_chunks(conn, name))
+    return {column: concat([chunk[column] for chunk in chunks]) for column in chunks[0]}
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(n_rows, directory):
+    print(f"\nScale: {n_rows:,} sales rows")
+    print("-" * 72)
+    sales = generate_sales(n_rows)
+    conn = create_sales_database(n_rows)
+    path = os.path.join(directory, 'sales')
+
+    write_time, _ = _timed(lambda: write_table(path, sales))
+    print(f"Write column files: {write_time:.2f}s, {directory_bytes(path) / 2 ** 20:.1f} MB on disk")
+
+    sqlite_time, from_sqlite = _timed(lambda: load_from_sqlite(conn, 'sales'))
+    open_time, mapped = _timed(lambda: open_table(path))
+    query = lambda table: group_by(table, QUERY_KEYS, QUERY_AGGREGATES)
+    sqlite_query, expected = _timed(lambda: query(from_sqlite))
+    mapped_query, actual = _timed(lambda: query(mapped))
+
+    print(f"{'Path':<26}{'Startup':>12}{'First query':>14}{'Total':>12}")
+    print(f"{'SQLite SELECT * -> columns':<26}{sqlite_time * 1000:>10.1f}ms"
+          f"{sqlite_query * 1000:>12.1f}ms{(sqlite_time + sqlite_query) * 1000:>10.1f}ms")
+    print(f"{'Memory-mapped columns':<26}{open_time * 1000:>10.2f}ms"
+          f"{mapped_query * 1000:>12.1f}ms{(open_time + mapped_query) * 1000:>10.1f}ms")
+    match = rows_match(result_rows(expected), result_rows(actual), n_keys=len(QUERY_KEYS))
+    print(f"{'✓' if match else '✗'} GROUP BY region results match")
+    print(f"{'✓' if tables_equal(sales, open_table(path)) else '✗'} "
+          "every column round-trips with its NULLs")
+    zero_copy = not (mapped['quantity'].values.flags.owndata or mapped['region'].codes.flags.owndata)
+    print(f"{'✓' if zero_copy else '✗'} numeric and dictionary code columns are zero-copy "
+          "memory maps")
+    conn.close()
+
+
+def main():
+    """Write the scaled sales table as column files and compare startup with SQLite"""
+    parser = argparse.ArgumentParser(description="Memory-mapped columnar storage")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--directory', default=STORE_DIR)
+    args = parser.parse_args()
+
+    print("Memory-mapped column store")
+    print("=" * 72)
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.directory)
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
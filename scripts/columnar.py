@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Columnar Data Model for the Q5 & Q6 Engines
+Typed NumPy arrays with validity masks so SQL NULL semantics survive
+vectorized execution. Low-cardinality string columns can be dictionary
+encoded: small integer codes into a sorted dictionary of distinct values.
+"""
+
+import numpy as np
+
+
+class Column:
+    """A typed NumPy array plus a validity mask (True = value present, False = NULL)"""
+
+    def __init__(self, values, valid=None):
+        self.values = np.asarray(values)
+        if valid is None:
+            valid = np.ones(len(self.values), dtype=bool)
+        self.valid = np.asarray(valid, dtype=bool)
+        if len(self.valid) != len(self.values):
+            raise ValueError("values and validity mask must have the same length")
+
+    @classmethod
+    def from_list(cls, items, dtype=None):
+        """Build a column from Python values, treating None as NULL"""
+        valid = np.array([item is not None for item in items], dtype=bool)
+        if dtype is None:
+            sample = next((item for item in items if item is not None), 0)
+            if isinstance(sample, str):
+                dtype = object
+            elif isinstance(sample, float):
+                dtype = np.float64
+            else:
+                dtype = np.int64
+        fill = '' if dtype is object else 0
+        values = np.array([fill if item is None else item for item in items], dtype=dtype)
+        return cls(values, valid)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"Column({self.to_list()!r})"
+
+    @property
+    def null_count(self):
+        return int(len(self.valid) - np.count_nonzero(self.valid))
+
+    def to_list(self):
+        """Return Python values with None in place of NULLs"""
+        return [v if ok else None for v, ok in zip(self.values.tolist(), self.valid.tolist())]
+
+    def take(self, indices):
+        """Gather rows by position"""
+        return Column(self.values[indices], self.valid[indices])
+
+    def filter(self, mask):
+        """Keep rows where mask is True"""
+        return Column(self.values[mask], self.valid[mask])
+
+    # Arithmetic follows SQL: any NULL operand yields NULL
+    def _binary(self, other, op):
+        if isinstance(other, Column):
+            return Column(op(self.values, other.values), self.valid & other.valid)
+        return Column(op(self.values, other), self.valid.copy())
+
+    def __add__(self, other):
+        return self._binary(other, np.add)
+
+    def __sub__(self, other):
+        return self._binary(other, np.subtract)
+
+    def __mul__(self, other):
+        return self._binary(other, np.multiply)
+
+    def coalesce(self, default):
+        """COALESCE(col, default)"""
+        values = np.where(self.valid, self.values, default)
+        return Column(values, np.ones(len(values), dtype=bool))
+
+
+def hash_factorize(values):
+    """Dict-based factorization for object (string) arrays, codes in sorted key order"""
+    positions = {}
+    codes = np.fromiter((positions.setdefault(v, len(positions)) for v in values.tolist()),
+                        dtype=np.int64, count=len(values))
+    uniques = np.array(list(positions), dtype=object)
+    order = np.argsort(uniques, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return uniques[order], rank[codes]
+
+
+def _code_dtype(n_values):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class DictionaryColumn(Column):
+    """
+    A dictionary-encoded column: codes index a sorted array of distinct values.
+
+    Because the dictionary is sorted, code order is value order, so grouping,
+    sorting and equality tests can run on the codes alone. values decodes on
+    demand for code paths that need the strings themselves.
+    """
+
+    def __init__(self, codes, dictionary, valid=None):
+        self.codes = np.asarray(codes)
+        self.dictionary = np.asarray(dictionary, dtype=object)
+        if valid is None:
+            valid = np.ones(len(self.codes), dtype=bool)
+        self.valid = np.asarray(valid, dtype=bool)
+        if len(self.valid) != len(self.codes):
+            raise ValueError("codes and validity mask must have the same length")
+
+    @property
+    def values(self):
+        if not len(self.dictionary):
+            return np.full(len(self.codes), '', dtype=object)
+        return self.dictionary[self.codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def take(self, indices):
+        return DictionaryColumn(self.codes[indices], self.dictionary, self.valid[indices])
+
+    def filter(self, mask):
+        return DictionaryColumn(self.codes[mask], self.dictionary, self.valid[mask])
+
+    def code_of(self, value):
+        """Code of value in the dictionary, or -1 if it does not occur"""
+        position = int(np.searchsorted(self.dictionary, value))
+        if position < len(self.dictionary) and self.dictionary[position] == value:
+            return position
+        return -1
+
+    def equals(self, value):
+        """Rows where column = value is TRUE (NULL rows never qualify)"""
+        return self.valid & (self.codes == self.code_of(value))
+
+    def recode(self, dictionary):
+        """Codes translated into another sorted dictionary; -1 where a value is missing"""
+        dictionary = np.asarray(dictionary, dtype=object)
+        if len(dictionary) == 0 or len(self.dictionary) == 0:
+            return np.full(len(self.codes), -1, dtype=np.int64)
+        position = np.minimum(np.searchsorted(dictionary, self.dictionary), len(dictionary) - 1)
+        mapping = np.where(dictionary[position] == self.dictionary, position, -1)
+        return mapping[self.codes]
+
+
+def dictionary_encode(column):
+    """Encode a string column; NULL rows get code 0 and stay masked by valid"""
+    codes = np.zeros(len(column), dtype=np.int64)
+    dictionary, codes[column.valid] = hash_factorize(column.values[column.valid])
+    return DictionaryColumn(codes.astype(_code_dtype(len(dictionary))), dictionary,
+                            column.valid.copy())
+
+
+def null_column(n_rows, dtype):
+    """A column of n_rows NULLs"""
+    return Column(np.zeros(n_rows, dtype=dtype), np.zeros(n_rows, dtype=bool))
+
+
+def concat(columns):
+    """Stack columns end to end (UNION ALL)"""
+    return Column(np.concatenate([c.values for c in columns]),
+                  np.concatenate([c.valid for c in columns]))
+
+
+def table_length(table):
+    """Row count of a table given as a dict of name -> Column"""
+    return len(next(iter(table.values()))) if table else 0
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Bulk Constraint Validator for the Q2 Key and Constraint Model
+database_designs_Q2.py illustrates PRIMARY KEY, UNIQUE, NOT NULL, CHECK
+(DeptName length > 3) and FOREIGN KEY constraints. This module enforces them
+on columnar batches before a bulk load:
+
+- NOT NULL: one pass over the validity mask
+- CHECK: compiled by predicate_compiler; like SQL, only FALSE violates, a
+  NULL (UNKNOWN) result passes
+- PRIMARY KEY / UNIQUE: existing and incoming keys are factorized together
+  into dense key ids (hash factorization for strings, direct addressing or
+  sorting for integers); a row violates when an earlier accepted row or an
+  existing row holds the same key. Keys containing a NULL never conflict
+- FOREIGN KEY: child keys must occur in the key set of the parent's existing
+  rows plus the parent rows accepted from the same load (MATCH SIMPLE: a key
+  with a NULL component passes)
+
+Accepted rows are exactly what row-at-a-time INSERTs would accept, in order:
+a row rejected for one reason does not claim its other keys. Rows whose key
+an existing row holds are rejected, and rows whose keys no other candidate
+shares are accepted, both vectorized; only the rows left contending for a
+shared key are decided in one ordered scan.
+
+Against SQLite the win is modest: the bulk INSERT that follows still pays
+for row conversion and SQLite's own index checks. What validation buys is a
+per-constraint report of every bad row up front and a load that cannot fail
+halfway.
+"""
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from columnar import Column, concat, table_length
+from groupby_engine import compute_group_ids
+from predicate_compiler import compile_expression
+
+
+class NotNull:
+    def __init__(self, column):
+        self.column = column
+        self.name = f'NOT NULL({column})'
+
+    def ddl(self):
+        return None
+
+
+class Check:
+    def __init__(self, name, expression):
+        self.name = name
+        self.expression = expression
+        self.compiled = compile_expression(expression)
+
+    def ddl(self):
+        return f"CONSTRAINT {self.name} CHECK ({self.expression})"
+
+
+class Unique:
+    keyword = 'UNIQUE'
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.name = f"{self.keyword}({', '.join(self.columns)})"
+
+    def ddl(self):
+        return f"{self.keyword} ({', '.join(self.columns)})"
+
+
+class PrimaryKey(Unique):
+    """UNIQUE plus NOT NULL on every key column"""
+
+    keyword = 'PRIMARY KEY'
+
+
+class ForeignKey:
+    def __init__(self, columns, parent, parent_columns):
+        self.columns = list(columns)
+        self.parent = parent
+        self.parent_columns = list(parent_columns)
+        self.name = (f"FOREIGN KEY({', '.join(self.columns)}) -> "
+                     f"{parent}({', '.join(self.parent_columns)})")
+
+    def ddl(self):
+        return (f"FOREIGN KEY ({', '.join(self.columns)}) "
+                f"REFERENCES {self.parent} ({', '.join(self.parent_columns)})")
+
+
+class TableSchema:
+    """Declared column types and constraints of one table"""
+
+    def __init__(self, columns, constraints):
+        self.columns = columns
+        self.constraints = constraints
+
+    def not_null_columns(self):
+        columns = [c.column for c in self.constraints if isinstance(c, NotNull)]
+        for constraint in self.constraints:
+            if isinstance(constraint, PrimaryKey):
+                columns.extend(constraint.columns)
+        return columns
+
+    def ddl(self, name):
+        """CREATE TABLE with the same constraints, for the SQLite comparison"""
+        not_null = set(self.not_null_columns())
+        lines = [f"{column} {kind}{' NOT NULL' if column in not_null else ''}"
+                 for column, kind in self.columns.items()]
+        lines += [c.ddl() for c in self.constraints if c.ddl()]
+        return f"CREATE TABLE {name} (\n    " + ',\n    '.join(lines) + "\n)"
+
+
+# The model drawn by database_designs_Q2.py
+Q2_SCHEMA = {
+    'department': TableSchema(
+        {'dept_id': 'TEXT', 'dept_name': 'TEXT'},
+        [PrimaryKey(['dept_id']), NotNull('dept_name'),
+         Check('dept_name_length', "LENGTH(dept_name) > 3")]),
+    'employee': TableSchema(
+        {'emp_id': 'INTEGER', 'name': 'TEXT', 'dept_id': 'TEXT'},
+        [PrimaryKey(['emp_id']), NotNull('name'), Unique(['name']),
+         ForeignKey(['dept_id'], 'department', ['dept_id'])]),
+}
+
+
+# ----------------------------------------------------------------------------
+# Validation
+# ----------------------------------------------------------------------------
+
+def _key_ids(columns_per_part, lengths):
+    """Dense ids for key tuples over several stacked parts; -1 where any component is NULL"""
+    n_rows = sum(lengths)
+    stacked = [concat(parts) if len(parts) > 1 else parts[0] for parts in columns_per_part]
+    ids, _, _ = compute_group_ids(stacked, n_rows)
+    complete = np.logical_and.reduce([c.valid for c in stacked])
+    return np.where(complete, ids, -1)
+
+
+class ValidationReport:
+    """Violating row positions per constraint, and the rows a sequential load would accept"""
+
+    def __init__(self, table, n_rows):
+        self.table = table
+        self.n_rows = n_rows
+        self.violations = {}
+        self.accepted = np.ones(n_rows, dtype=bool)
+
+    @property
+    def n_rejected(self):
+        return int(self.n_rows - np.count_nonzero(self.accepted))
+
+    def summary(self):
+        lines = [f"{self.table}: {self.n_rows:,} rows, {self.n_rejected:,} rejected"]
+        for name, rows in self.violations.items():
+            if len(rows):
+                sample = ', '.join(str(r) for r in rows[:5].tolist())
+                lines.append(f"  {name:<48} {len(rows):>8,} rows  e.g. {sample}")
+        return '\n'.join(lines)
+
+
+def validate_table(name, schema, batch, existing=None, parents=None):
+    """
+    Validate one incoming batch (dict of Columns) against its TableSchema.
+
+    existing: rows already in the table (dict of Columns) or None
+    parents: {table: dict of Columns} holding every row a foreign key may
+             reference (existing plus accepted incoming parent rows)
+    """
+    n_rows = table_length(batch)
+    report = ValidationReport(name, n_rows)
+    local_ok = np.ones(n_rows, dtype=bool)
+    # Row-local constraints: NOT NULL (incl. key columns), CHECK, FOREIGN KEY
+    for column in schema.not_null_columns():
+        bad = ~batch[column].valid
+        report.violations.setdefault(f'NOT NULL({column})', np.flatnonzero(bad))
+        local_ok &= ~bad
+    for constraint in schema.constraints:
+        if isinstance(constraint, Check):
+            result = constraint.compiled(batch)
+            bad = result.valid & ~np.asarray(result.values, dtype=bool)
+        elif isinstance(constraint, ForeignKey):
+            parent = parents[constraint.parent]
+            n_parent = table_length(parent)
+            ids = _key_ids([[parent[p], batch[c]] for p, c in zip(constraint.parent_columns,
+                                                                  constraint.columns)],
+                           [n_parent, n_rows])
+            present = np.zeros(int(ids.max(initial=-1)) + 2, dtype=bool)
+            present[ids[:n_parent][ids[:n_parent] >= 0]] = True
+            child = ids[n_parent:]
+            bad = (child >= 0) & ~present[child]
+        else:
+            continue
+        report.violations[constraint.name] = np.flatnonzero(bad)
+        local_ok &= ~bad
+
+    # Keys: existing rows always hold their keys; incoming rows in load order
+    keys = []
+    n_existing = table_length(existing) if existing else 0
+    for constraint in schema.constraints:
+        if isinstance(constraint, Unique):
+            parts = [[existing[c], batch[c]] if existing else [batch[c]]
+                     for c in constraint.columns]
+            ids = _key_ids(parts, [n_existing, n_rows] if existing else [n_rows])
+            taken = np.zeros(int(ids.max(initial=-1)) + 2, dtype=bool)
+            taken[ids[:n_existing][ids[:n_existing] >= 0]] = True
+            keys.append((constraint, ids[n_existing:], taken))
+
+    # Existing rows always win; a row whose keys no other candidate shares is
+    # accepted outright, so only contended rows are decided in load order
+    accepted = local_ok.copy()
+    for constraint, ids, taken in keys:
+        accepted &= ~((ids >= 0) & taken[np.maximum(ids, 0)])
+    contended = np.zeros(n_rows, dtype=bool)
+    for constraint, ids, taken in keys:
+        live = accepted & (ids >= 0)
+        counts = np.bincount(ids[live], minlength=len(taken))
+        contended |= live & (counts[np.maximum(ids, 0)] > 1)
+    order = np.flatnonzero(contended)
+    if len(order):
+        row_ids = [ids[order].tolist() for _, ids, _ in keys]
+        held = [set() for _ in keys]
+        for i, row in enumerate(order.tolist()):
+            claimed = [ids[i] for ids in row_ids]
+            if any(key >= 0 and key in h for key, h in zip(claimed, held)):
+                accepted[row] = False
+                continue
+            for key, h in zip(claimed, held):
+                h.add(key)
+    rows = np.arange(n_rows)
+    for constraint, ids, taken in keys:
+        report.violations[constraint.name] = np.flatnonzero(_conflicts(ids, taken, rows, accepted))
+    report.accepted = accepted
+    return report
+
+
+def _conflicts(ids, taken, rows, accepted):
+    """Rows whose key is held by an existing row or by an earlier accepted row"""
+    first = np.full(len(taken), len(rows))
+    holders = accepted & (ids >= 0)
+    keys, first_positions = np.unique(ids[holders], return_index=True)
+    first[keys] = rows[holders][first_positions]
+    has_key = ids >= 0
+    clash = np.zeros(len(rows), dtype=bool)
+    clash[has_key] = taken[ids[has_key]] | (first[ids[has_key]] < rows[has_key])
+    return clash
+
+
+def validate(batches, schema, existing=None):
+    """Validate batches for several tables, parents before children; returns {table: report}"""
+    existing = existing or {}
+    reports, loaded = {}, {}
+    for name in _load_order(schema):
+        if name not in batches:
+            loaded[name] = existing.get(name)
+            continue
+        reports[name] = validate_table(name, schema[name], batches[name], existing.get(name),
+                                       loaded)
+        accepted = {c: col.filter(reports[name].accepted) for c, col in batches[name].items()}
+        if name in existing:
+            accepted = {c: concat([existing[name][c], accepted[c]]) for c in accepted}
+        loaded[name] = accepted
+    return reports
+
+
+def _load_order(schema):
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for constraint in schema[name].constraints:
+            if isinstance(constraint, ForeignKey) and constraint.parent != name:
+                visit(constraint.parent)
+        order.append(name)
+    for name in schema:
+        visit(name)
+    return order
+
+
+# ----------------------------------------------------------------------------
+# Demo data and the row-at-a-time SQLite comparison
+# ----------------------------------------------------------------------------
+
+def generate_load(n_employees, n_departments, n_existing, seed=42):
+    """Existing rows plus incoming Q2 batches with known violations of every kind"""
+    rng = np.random.default_rng(seed)
+    n_established = max(1, n_departments // 10)
+    established = np.array([f'E{i}' for i in range(1, n_established + 1)], dtype=object)
+    dept_ids = np.array([f'D{i}' for i in range(1, n_departments + 1)], dtype=object)
+    dept_names = np.array([f'Department {i}' for i in range(1, n_departments + 1)], dtype=object)
+    # The Q2 sample rows: 'HR' and 'IT' fail LENGTH(DeptName) > 3
+    dept_names[:2] = ['HR', 'IT']
+    dept_valid = np.ones(n_departments, dtype=bool)
+    dept_valid[2] = False
+    dept_ids[-1] = established[0]                                # already in the table
+    departments = {'dept_id': Column(dept_ids),
+                   'dept_name': Column(np.where(dept_valid, dept_names, ''), dept_valid)}
+
+    total = n_existing + n_employees
+    emp_id = np.arange(1, total + 1, dtype=np.int64)
+    names = np.array([f'Employee {i}' for i in range(1, total + 1)], dtype=object)
+    targets = np.concatenate([established, dept_ids[3:-1]])
+    emp_dept = np.concatenate([established[rng.integers(0, n_established, n_existing)],
+                               targets[rng.integers(0, len(targets), n_employees)]])
+    dept_valid = np.ones(total, dtype=bool)
+    dept_valid[n_existing:] = rng.random(n_employees) >= 0.02
+    name_valid = np.ones(total, dtype=bool)
+
+    incoming = np.arange(n_existing, total)
+    picks = rng.choice(incoming[1:], size=(5, max(1, n_employees // 200)), replace=False)
+    earlier = lambda rows: rng.integers(0, rows)  # any row before, existing or incoming
+    emp_id[picks[0]] = emp_id[earlier(picks[0])]                 # duplicate EmpID
+    names[picks[1]] = names[earlier(picks[1])]                   # duplicate Name
+    name_valid[picks[2]] = False                                 # NULL Name
+    emp_dept[picks[3]] = 'D0'                                    # no such department
+    emp_dept[picks[4]] = rng.choice(dept_ids[:3], picks.shape[1])  # rejected departments
+
+    def rows(selection):
+        return {'emp_id': Column(emp_id[selection]),
+                'name': Column(np.where(name_valid, names, '')[selection], name_valid[selection]),
+                'dept_id': Column(np.where(dept_valid, emp_dept, '')[selection],
+                                  dept_valid[selection])}
+    existing = {'department': {'dept_id': Column(established),
+                               'dept_name': Column(np.array([f'Established {i}' for i in
+                                                             range(1, n_established + 1)],
+                                                            dtype=object))},
+                'employee': rows(slice(0, n_existing))}
+    return existing, {'department': departments, 'employee': rows(slice(n_existing, total))}
+
+
+def _sqlite_database(existing):
+    """In-memory database with the Q2 DDL, foreign keys on and the existing rows loaded"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute("PRAGMA foreign_keys = ON")
+    for name in _load_order(Q2_SCHEMA):
+        conn.execute(Q2_SCHEMA[name].ddl(name))
+        columns = list(existing[name])
+        conn.executemany(_insert_sql(name, columns),
+                         zip(*(existing[name][c].to_list() for c in columns)))
+    conn.commit()
+    return conn
+
+
+def _insert_sql(name, columns):
+    return f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+def sqlite_row_at_a_time(existing, batches, limit):
+    """INSERT each row in one transaction, catching IntegrityError; returns accepted masks"""
+    conn = _sqlite_database(existing)
+    accepted = {}
+    start = time.perf_counter()
+    for name in _load_order(Q2_SCHEMA):
+        columns = list(batches[name])
+        sql = _insert_sql(name, columns)
+        rows = list(zip(*(batches[name][c].take(slice(0, limit)).to_list() for c in columns)))
+        ok = np.zeros(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            try:
+                conn.execute(sql, row)
+                ok[i] = True
+            except sqlite3.IntegrityError:
+                pass
+        accepted[name] = ok
+    conn.commit()
+    seconds = time.perf_counter() - start
+    conn.close()
+    return accepted, seconds
+
+
+def sqlite_bulk_load(existing, batches, reports):
+    """
+    executemany of the pre-validated rows; must not raise. Foreign keys were
+    proven by validate(), so SQLite skips its per-row parent lookups
+    """
+    conn = _sqlite_database(existing)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    start = time.perf_counter()
+    for name in _load_order(Q2_SCHEMA):
+        columns = list(batches[name])
+        sql = _insert_sql(name, columns)
+        conn.executemany(sql, zip(*(batches[name][c].filter(reports[name].accepted).to_list()
+                                    for c in columns)))
+    conn.commit()
+    seconds = time.perf_counter() - start
+    conn.close()
+    return seconds
+
+
+def check_sequential_semantics():
+    """Chained conflicts: a row rejected for one key must not claim its other keys"""
+    batch = {'emp_id': Column.from_list([1, 1, 2, 3, 3]),
+             'name': Column.from_list(['X', 'Y', 'Y', None, 'Z']),
+             'dept_id': Column.from_list(['D9', 'D9', 'D9', 'D9', None])}
+    parents = {'department': {'dept_id': Column.from_list(['D9']),
+                              'dept_name': Column.from_list(['Research'])}}
+    report = validate_table('employee', Q2_SCHEMA['employee'], batch, None, parents)
+    # Row 1 repeats emp_id 1, so row 2 may use name 'Y'; row 3 has a NULL name, so row 4
+    # may use emp_id 3; a NULL foreign key passes
+    assert report.accepted.tolist() == [True, False, True, False, True], report.accepted
+    return True
+
+
+def main():
+    """Pre-validate a Q2 bulk load and compare with row-at-a-time SQLite INSERTs"""
+    parser = argparse.ArgumentParser(description="Bulk constraint validation for the Q2 model")
+    parser.add_argument('--employees', type=int, default=1_000_000)
+    parser.add_argument('--departments', type=int, default=1_000)
+    parser.add_argument('--existing', type=int, default=100_000)
+    parser.add_argument('--sqlite-rows', type=int, default=None,
+                        help="row-at-a-time INSERTs for only the first N rows of each table")
+    args = parser.parse_args()
+
+    print("Bulk constraint validator (Q2 model)")
+    print("=" * 90)
+    check_sequential_semantics()
+    print("✓ chained UNIQUE conflicts resolve like sequential INSERTs")
+    print()
+    print(Q2_SCHEMA['department'].ddl('department'))
+    print(Q2_SCHEMA['employee'].ddl('employee'))
+
+    existing, batches = generate_load(args.employees, args.departments, args.existing)
+    start = time.perf_counter()
+    reports = validate(batches, Q2_SCHEMA, existing)
+    validate_seconds = time.perf_counter() - start
+    print()
+    for report in reports.values():
+        print(report.summary())
+
+    accepted, row_seconds = sqlite_row_at_a_time(existing, batches, args.sqlite_rows)
+    n_checked = sum(len(mask) for mask in accepted.values())
+    same = all(np.array_equal(mask, reports[name].accepted[:len(mask)])
+               for name, mask in accepted.items())
+    bulk_seconds = sqlite_bulk_load(existing, batches, reports)
+    n_rows = sum(r.n_rows for r in reports.values())
+    row_total = row_seconds * n_rows / n_checked
+    print()
+    print(f"Vectorized validation:        {validate_seconds:8.2f}s "
+          f"({n_rows / validate_seconds:,.0f} rows/s)")
+    print(f"Row-at-a-time INSERTs:        {row_total:8.2f}s"
+          f"{'' if n_checked == n_rows else f' (scaled from {n_checked:,} rows)'} "
+          f"{'✓' if same else '✗'} same rows accepted")
+    print(f"Validate + bulk INSERT:       {validate_seconds + bulk_seconds:8.2f}s "
+          f"(bulk INSERT of accepted rows {bulk_seconds:.2f}s, no constraint errors)")
+    print(f"Validate + bulk INSERT vs row-at-a-time: "
+          f"{row_total / (validate_seconds + bulk_seconds):.2f}x the speed")
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
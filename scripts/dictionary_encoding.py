@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Dictionary Encoding Benchmark for Low-Cardinality String Columns
+region, category, dept_name and location repeat a handful of strings millions
+of times. columnar.DictionaryColumn stores them as int8/int16 codes into a
+sorted dictionary; the GROUP BY engine groups on the codes directly and the
+join engine joins on them, so neither hashes a Python string per row.
+
+This script measures memory and query time for plain object columns against
+dictionary-encoded ones on the scaled sales table.
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from columnar import Column, DictionaryColumn, dictionary_encode
+from groupby_engine import group_by, result_rows, rows_match
+from join_engine import equi_join
+from scaled_data import REGIONS, generate_products, generate_sales
+
+STRING_COLUMNS = ['region', 'category']
+
+# A small dimension keyed by the region string, for the equality join
+REGION_TARGETS = {
+    'region': Column(REGIONS.copy()),
+    'target': Column(np.array([250_000.0, 180_000.0, 210_000.0, 195_000.0])),
+}
+
+
+def column_bytes(column):
+    """Array buffers plus the distinct Python string objects they point to"""
+    if isinstance(column, DictionaryColumn):
+        strings = column.dictionary.tolist()
+        return column.codes.nbytes + column.valid.nbytes + sum(map(sys.getsizeof, strings))
+    size = column.values.nbytes + column.valid.nbytes
+    if column.values.dtype == object:
+        distinct = {id(v): v for v in column.values.tolist()}
+        size += sum(map(sys.getsizeof, distinct.values()))
+    return size
+
+
+def prepare_sales(n_rows):
+    """Sales with the product category attached (the SECTION 10 join)"""
+    sales = generate_sales(n_rows)
+    products = generate_products()
+    category = products['category'].values[sales['product_id'].values - 101]
+    sales['category'] = Column(category)
+    return sales
+
+
+def encode_table(table, columns):
+    encoded = dict(table)
+    for name in columns:
+        encoded[name] = dictionary_encode(table[name])
+    return encoded
+
+
+def region_join(table):
+    """SELECT s.*, t.target FROM sales s JOIN region_targets t ON s.region = t.region"""
+    targets = REGION_TARGETS['region']
+    if isinstance(table['region'], DictionaryColumn):
+        targets = dictionary_encode(targets)
+    left, right = equi_join(table['region'], targets, 'hash')
+    return len(left), float(REGION_TARGETS['target'].values[right].sum())
+
+
+def north_by_category(table):
+    """SELECT category, SUM(quantity) ... WHERE region = 'North' GROUP BY category"""
+    region = table['region']
+    if isinstance(region, DictionaryColumn):
+        mask = region.equals('North')
+    else:
+        mask = region.valid & (region.values == 'North')
+    filtered = {name: column.filter(mask) for name, column in table.items()}
+    return group_by(filtered, ['category'], [('total_quantity', 'SUM', 'quantity')])
+
+
+QUERIES = [
+    ("GROUP BY region",
+     lambda t: group_by(t, ['region'], [('sales', 'COUNT(*)', None),
+                                         ('total_quantity', 'SUM', 'quantity')]), 1),
+    ("GROUP BY region, category",
+     lambda t: group_by(t, ['region', 'category'], [('sales', 'COUNT(*)', None),
+                                                     ('avg_discount', 'AVG', 'discount')]), 2),
+    ("WHERE region = 'North' GROUP BY category", north_by_category, 1),
+    ("JOIN region_targets ON region", region_join, None),
+]
+
+
+def _best(func, repeat):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _same(expected, actual, n_keys):
+    if n_keys is None:
+        return expected == actual
+    return rows_match(result_rows(expected), result_rows(actual), n_keys)
+
+
+def run_benchmark(n_rows, repeat):
+    print(f"\nScale: {n_rows:,} sales rows")
+    print("-" * 78)
+    plain = prepare_sales(n_rows)
+    encode_time, encoded = _best(lambda: encode_table(plain, STRING_COLUMNS), 1)
+
+    print(f"{'Column':<24}{'Object':>12}{'Encoded':>12}{'Saving':>10}")
+    for name in STRING_COLUMNS:
+        before, after = column_bytes(plain[name]), column_bytes(encoded[name])
+        print(f"{name:<24}{before / 2 ** 20:>10.2f}MB{after / 2 ** 20:>10.2f}MB"
+              f"{before / after:>9.1f}x")
+    print(f"(one-time encoding: {encode_time * 1000:.0f}ms; free when read from column_store)")
+
+    print(f"\n{'Query':<44}{'Object':>10}{'Codes':>10}{'Speedup':>10}")
+    for label, query, n_keys in QUERIES:
+        plain_time, expected = _best(lambda: query(plain), repeat)
+        codes_time, actual = _best(lambda: query(encoded), repeat)
+        ok = _same(expected, actual, n_keys)
+        print(f"{label:<44}{plain_time * 1000:>8.1f}ms{codes_time * 1000:>8.1f}ms"
+              f"{plain_time / codes_time:>9.1f}x {'✓' if ok else '✗'}")
+
+
+def main():
+    """Compare object string columns with dictionary-encoded columns"""
+    parser = argparse.ArgumentParser(description="Dictionary encoding benchmark")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Dictionary-encoded string columns")
+    print("=" * 78)
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.repeat)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Schema-Driven ER Diagrams (Green Theme)
+database_designs_Q1.py and database_designs_Q2.py place every table, column
+and foreign-key arrow by hand. This module draws entity-relationship
+diagrams from CREATE TABLE statements instead: the sql/ example files, the
+Q2 model DDL from constraint_validator.py, or any schema text.
+
+- Parsing: column types, PRIMARY KEY, NOT NULL, UNIQUE and REFERENCES /
+  FOREIGN KEY clauses, inline or table-level. The sql/ files declare no
+  foreign keys, so references are also inferred from the example queries'
+  JOIN ... ON a.x = b.y conditions where one side is a single-column
+  primary key; inferred references are drawn dashed
+- Layout: each connected component gets a layered layout (parents above
+  the tables that reference them, longest-path layers, barycenter ordering
+  sweeps to reduce crossings), then components are packed onto shelves.
+  Every step is O(tables + references) per sweep, so 500 tables lay out in
+  tens of milliseconds
+- Caching: a component's layout is stored under output/er_cache/ keyed by a
+  hash of its tables and references. Adding a table re-lays out only the
+  component it joins; every other component comes from the cache and is
+  only moved by the packing step. Rendered PNGs are keyed by the hash of
+  the whole schema
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.patches import FancyArrowPatch, Rectangle
+
+from generate_sql_diagrams import COLORS, set_green_style
+from sql_workload import load_statements
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'er_cache')
+LAYOUT_VERSION = 1
+
+# Layout units: one character wide, one column row high
+LAYER_GAP = 3.0
+TABLE_GAP = 4.0
+COMPONENT_GAP = 6.0
+SWEEPS = 4
+# Figure scale: inches per layout unit (monospace 7pt)
+INCH_X = 0.065
+INCH_Y = 0.17
+
+
+class Reference:
+    """columns of the child table -> parent_columns of parent"""
+
+    def __init__(self, columns, parent, parent_columns, inferred=False):
+        self.columns = list(columns)
+        self.parent = parent
+        self.parent_columns = list(parent_columns)
+        self.inferred = inferred
+
+    def to_dict(self):
+        return {'columns': self.columns, 'parent': self.parent,
+                'parent_columns': self.parent_columns, 'inferred': self.inferred}
+
+
+class Table:
+    """One CREATE TABLE: columns in order, keys and outgoing references"""
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}
+        self.primary_key = []
+        self.not_null = set()
+        self.unique = []
+        self.references = []
+
+    def to_dict(self):
+        return {'name': self.name, 'columns': list(self.columns.items()),
+                'primary_key': self.primary_key, 'not_null': sorted(self.not_null),
+                'unique': self.unique, 'references': [r.to_dict() for r in self.references]}
+
+    def marker(self, column):
+        keys = []
+        if column in self.primary_key:
+            keys.append('PK')
+        if any(column in r.columns for r in self.references):
+            keys.append('FK')
+        if [column] in self.unique:
+            keys.append('UQ')
+        return ','.join(keys)
+
+    def row_labels(self):
+        """Column rows as drawn: key markers, name, type and NOT NULL"""
+        return [f"{self.marker(c):<5} {c} {kind}{' NN' if c in self.not_null else ''}".rstrip()
+                for c, kind in self.columns.items()]
+
+    @property
+    def size(self):
+        width = max([len(self.name)] + [len(label) for label in self.row_labels()]) + 2
+        return width, len(self.columns) + 1.5
+
+
+# ----------------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------------
+
+CREATE_PATTERN = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*)\)\s*;?\s*$',
+                            re.I | re.S)
+REFERENCES_PATTERN = re.compile(r'REFERENCES\s+(\w+)\s*(?:\(([^)]*)\))?', re.I)
+COLUMN_KEYWORDS = ('PRIMARY', 'NOT', 'NULL', 'UNIQUE', 'REFERENCES', 'CHECK', 'DEFAULT',
+                   'CONSTRAINT', 'COLLATE', 'GENERATED', 'AUTOINCREMENT')
+
+
+def _split_top_level(text):
+    """Split on commas outside parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [p for p in parts if p]
+
+
+def _names(text):
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+def parse_create_table(sql):
+    """A Table for a CREATE TABLE statement, None for anything else"""
+    match = CREATE_PATTERN.match(sql)
+    if not match:
+        return None
+    table = Table(match.group(1))
+    for item in _split_top_level(match.group(2)):
+        item = re.sub(r'^CONSTRAINT\s+\w+\s+', '', item, flags=re.I)
+        upper = item.upper()
+        if upper.startswith('PRIMARY KEY'):
+            table.primary_key = _names(item[item.index('(') + 1:item.rindex(')')])
+        elif upper.startswith('UNIQUE'):
+            table.unique.append(_names(item[item.index('(') + 1:item.rindex(')')]))
+        elif upper.startswith('FOREIGN KEY'):
+            columns = _names(item[item.index('(') + 1:item.index(')')])
+            target = REFERENCES_PATTERN.search(item)
+            parent_columns = _names(target.group(2) or '') or columns
+            table.references.append(Reference(columns, target.group(1), parent_columns))
+        elif not upper.startswith('CHECK'):
+            _parse_column(table, item)
+    for column in table.primary_key:
+        table.not_null.add(column)
+    return table
+
+
+def _parse_column(table, item):
+    name, _, rest = item.partition(' ')
+    words = rest.split()
+    type_words = []
+    for word in words:
+        if word.upper().split('(')[0] in COLUMN_KEYWORDS:
+            break
+        type_words.append(word)
+    table.columns[name] = ' '.join(type_words)
+    upper = rest.upper()
+    if 'PRIMARY KEY' in upper:
+        table.primary_key = [name]
+    if 'NOT NULL' in upper:
+        table.not_null.add(name)
+    if re.search(r'\bUNIQUE\b', upper):
+        table.unique.append([name])
+    target = REFERENCES_PATTERN.search(rest)
+    if target:
+        table.references.append(Reference([name], target.group(1),
+                                          _names(target.group(2) or '') or [name]))
+
+
+def parse_schema(statements):
+    """{name: Table} from SQL statement strings, in declaration order"""
+    tables = {}
+    for sql in statements:
+        table = parse_create_table(sql)
+        if table is not None:
+            tables[table.name] = table
+    return tables
+
+
+ALIAS_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+EQUALITY_PATTERN = re.compile(r'(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)')
+NOT_ALIASES = {'ON', 'WHERE', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'CROSS', 'OUTER',
+               'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'UNION', 'USING', 'NATURAL'}
+
+
+def infer_references(tables, statements):
+    """Add references implied by JOIN conditions that match a single-column primary key"""
+    found = set()
+    for sql in statements:
+        aliases = {}
+        for name, alias in ALIAS_PATTERN.findall(sql):
+            if name in tables:
+                aliases[name] = name
+                if alias and alias.upper() not in NOT_ALIASES:
+                    aliases[alias] = name
+        for left, left_column, right, right_column in EQUALITY_PATTERN.findall(sql):
+            sides = [(aliases.get(left), left_column), (aliases.get(right), right_column)]
+            if None in (sides[0][0], sides[1][0]) or sides[0][0] == sides[1][0]:
+                continue
+            for (child, column), (parent, key) in (sides, sides[::-1]):
+                if (tables[parent].primary_key == [key] and tables[child].primary_key != [column]
+                        and column in tables[child].columns):
+                    found.add((child, column, parent, key))
+    for child, column, parent, key in sorted(found):
+        declared = any(r.columns == [column] for r in tables[child].references)
+        if not declared:
+            tables[child].references.append(Reference([column], parent, [key], inferred=True))
+    return tables
+
+
+def example_schema():
+    """Tables from the sql/ example files with JOIN-inferred references"""
+    statements = [s.sql for s in load_statements()]
+    return infer_references(parse_schema(statements), statements)
+
+
+# ----------------------------------------------------------------------------
+# Layout
+# ----------------------------------------------------------------------------
+
+def _edges(tables):
+    """(child, parent) pairs between distinct tables of the schema"""
+    return [(t.name, r.parent) for t in tables.values() for r in t.references
+            if r.parent in tables and r.parent != t.name]
+
+
+def components(tables):
+    """Connected components by reference, each in declaration order"""
+    parent = {name: name for name in tables}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+    for child, target in _edges(tables):
+        parent[find(child)] = find(target)
+    groups = {}
+    for name in tables:
+        groups.setdefault(find(name), []).append(name)
+    return list(groups.values())
+
+
+def component_key(tables, names):
+    """Hash of everything the layout of one component depends on"""
+    digest = hashlib.sha256(f"layout-{LAYOUT_VERSION}".encode())
+    for name in sorted(names):
+        digest.update(json.dumps(tables[name].to_dict(), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def schema_key(tables):
+    digest = hashlib.sha256(f"schema-{LAYOUT_VERSION}".encode())
+    for name in tables:
+        digest.update(json.dumps(tables[name].to_dict(), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def _layers(names, edges):
+    """Longest-path layers with parents above children; cycles are broken where they stall"""
+    parents = {name: [] for name in names}
+    children = {name: [] for name in names}
+    for child, target in edges:
+        parents[child].append(target)
+        children[target].append(child)
+    pending = {name: len(set(parents[name])) for name in names}
+    layer = {}
+    ready = [name for name in names if pending[name] == 0]
+    while len(layer) < len(names):
+        if not ready:
+            # A reference cycle: release the stalled table with the fewest open parents
+            stalled = min((n for n in names if n not in layer), key=lambda n: pending[n])
+            ready = [stalled]
+            pending[stalled] = 0
+        following = []
+        for name in ready:
+            layer[name] = max([layer[p] + 1 for p in set(parents[name]) if p in layer],
+                              default=0)
+            for child in set(children[name]):
+                pending[child] -= 1
+                if pending[child] == 0 and child not in layer:
+                    following.append(child)
+        ready = following
+    return layer, parents, children
+
+
+def _order_layers(layer, parents, children, names):
+    """Barycenter sweeps: sort each layer by the mean position of its neighbours"""
+    n_layers = max(layer.values()) + 1
+    rows = [[] for _ in range(n_layers)]
+    for name in names:
+        rows[layer[name]].append(name)
+    position = {name: i for row in rows for i, name in enumerate(row)}
+    for sweep in range(SWEEPS):
+        downward = sweep % 2 == 0
+        order = range(1, n_layers) if downward else range(n_layers - 2, -1, -1)
+        neighbours = parents if downward else children
+        for index in order:
+            def barycenter(name):
+                adjacent = [position[n] for n in neighbours[name]
+                            if layer[n] == index + (-1 if downward else 1)]
+                return sum(adjacent) / len(adjacent) if adjacent else position[name]
+            rows[index].sort(key=barycenter)
+            for i, name in enumerate(rows[index]):
+                position[name] = i
+    return rows
+
+
+def layout_component(tables, names):
+    """{table: [x, y, width, height]} with the component's top-left corner at (0, 0)"""
+    edges = [(c, p) for c, p in _edges(tables) if c in names]
+    layer, parents, children = _layers(names, edges)
+    rows = _order_layers(layer, parents, children, names)
+    sizes = {name: tables[name].size for name in names}
+    widths = [sum(sizes[n][0] for n in row) + TABLE_GAP * (len(row) - 1) for row in rows]
+    total_width = max(widths)
+    boxes, top = {}, 0.0
+    for row, width in zip(rows, widths):
+        x = (total_width - width) / 2
+        for name in row:
+            w, h = sizes[name]
+            boxes[name] = [x, top, w, h]
+            x += w + TABLE_GAP
+        top += max(sizes[n][1] for n in row) + LAYER_GAP
+    return boxes
+
+
+class LayoutCache:
+    """Component layouts keyed by component hash, in memory and under cache_dir"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def component(self, tables, names):
+        key = component_key(tables, names)
+        if key in self._memory:
+            self.hits += 1
+            return self._memory[key]
+        path = os.path.join(self.cache_dir, key + '.json')
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path) as handle:
+                boxes = json.load(handle)
+        else:
+            self.misses += 1
+            boxes = layout_component(tables, names)
+            with open(path, 'w') as handle:
+                json.dump(boxes, handle)
+        self._memory[key] = boxes
+        return boxes
+
+    def layout(self, tables):
+        """{table: [x, y, width, height]} for the whole schema"""
+        return pack([self.component(tables, names) for names in components(tables)])
+
+
+def pack(component_boxes):
+    """Shelf-pack component layouts left to right in declaration order"""
+    extents = []
+    for boxes in component_boxes:
+        extents.append((max(x + w for x, _, w, _ in boxes.values()),
+                        max(y + h for _, y, _, h in boxes.values())))
+    area = sum((w + COMPONENT_GAP) * (h + COMPONENT_GAP) for w, h in extents)
+    shelf_width = max(max(w for w, _ in extents), (area * 2) ** 0.5)
+    placed, x, y, shelf_height = {}, 0.0, 0.0, 0.0
+    for boxes, (width, height) in zip(component_boxes, extents):
+        if x > 0 and x + width > shelf_width:
+            x, y, shelf_height = 0.0, y + shelf_height + COMPONENT_GAP, 0.0
+        for name, (bx, by, bw, bh) in boxes.items():
+            placed[name] = [x + bx, y + by, bw, bh]
+        x += width + COMPONENT_GAP
+        shelf_height = max(shelf_height, height)
+    return placed
+
+
+# ----------------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------------
+
+def render_er_diagram(tables, boxes, path, title=None):
+    """Draw tables as header + column boxes and references as arrows, y growing downwards"""
+    set_green_style()
+    width = max(x + w for x, _, w, _ in boxes.values())
+    height = max(y + h for _, y, _, h in boxes.values())
+    fig_width, fig_height = max(4, width * INCH_X + 1), max(3, height * INCH_Y + 1)
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height))
+    # Keep the unit scale when the minimum figure size is larger than the diagram
+    margin_x = max(1, ((fig_width - 1) / INCH_X - width) / 2)
+    ax.set_xlim(-margin_x, width + margin_x)
+    ax.set_ylim(height + 1, -3 if title else -1)
+    ax.axis('off')
+    # The limits already fit the diagram: bbox_inches='tight' would draw every label twice
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+    if title:
+        ax.text(width / 2, -1.8, title, ha='center', va='center', fontsize=12,
+                fontweight='bold', color=COLORS['primary'])
+
+    for name, (x, y, w, h) in boxes.items():
+        table = tables[name]
+        ax.add_patch(Rectangle((x, y), w, h, facecolor=COLORS['white'],
+                               edgecolor=COLORS['border'], linewidth=1.2, zorder=2))
+        ax.add_patch(Rectangle((x, y), w, 1.2, facecolor=COLORS['secondary'],
+                               edgecolor=COLORS['border'], linewidth=1.2, zorder=2))
+        ax.text(x + w / 2, y + 0.6, name, ha='center', va='center', fontsize=7,
+                fontweight='bold', color=COLORS['white'], family='monospace', zorder=3)
+        for i, (column, label) in enumerate(zip(table.columns, table.row_labels())):
+            key = column in table.primary_key
+            ax.text(x + 0.6, y + 1.85 + i, label, va='center', fontsize=6.5,
+                    family='monospace', fontweight='bold' if key else 'normal',
+                    color=COLORS['text'], zorder=3)
+
+    for table in tables.values():
+        for reference in table.references:
+            if reference.parent not in boxes:
+                continue
+            cx, cy, cw, _ = boxes[table.name]
+            px, py, pw, ph = boxes[reference.parent]
+            if reference.parent == table.name:
+                start, end = (cx + cw, cy + 0.6), (cx + cw, cy + 1.8)
+                style = 'arc3,rad=-0.8'
+            else:
+                start = (cx + cw / 2, cy) if cy > py else (cx + cw / 2, cy + boxes[table.name][3])
+                end = (px + pw / 2, py + ph) if cy > py else (px + pw / 2, py)
+                style = 'arc3,rad=0'
+            ax.add_patch(FancyArrowPatch(start, end, arrowstyle='-|>', mutation_scale=9,
+                                         connectionstyle=style, color=COLORS['accent'],
+                                         linewidth=1.0, linestyle='--' if reference.inferred else '-',
+                                         zorder=1))
+
+    dpi = min(150, int(12000 / max(fig_width, fig_height)))
+    plt.savefig(path, dpi=dpi, facecolor=COLORS['background'])
+    plt.close(fig)
+
+
+def render_schema(tables, title=None, cache=None):
+    """Path to the rendered PNG, keyed by the schema hash and title; renders only on a miss"""
+    cache = cache or LayoutCache()
+    key = schema_key(tables)
+    if title:
+        key += '_' + hashlib.sha256(title.encode()).hexdigest()[:8]
+    path = os.path.join(cache.cache_dir, f"er_{key}.png")
+    if not os.path.exists(path):
+        render_er_diagram(tables, cache.layout(tables), path, title)
+    return path
+
+
+# ----------------------------------------------------------------------------
+# Scaling demo
+# ----------------------------------------------------------------------------
+
+def synthetic_ddl(n_tables, seed=42):
+    """CREATE TABLE statements for clusters of tables referencing earlier tables of their cluster"""
+    import random
+    rng = random.Random(seed)
+    statements, cluster = [], []
+    for i in range(n_tables):
+        if not cluster or rng.random() < 0.06:
+            cluster = []
+        name = f"t{i:04d}"
+        lines = [f"{name}_id INTEGER PRIMARY KEY", f"label_{i} VARCHAR(40) NOT NULL"]
+        lines += [f"attr_{j} DECIMAL(10, 2)" for j in range(rng.randint(1, 6))]
+        for parent in rng.sample(cluster, min(len(cluster), rng.choice((1, 1, 1, 2)))):
+            lines.append(f"{parent}_id INTEGER REFERENCES {parent} ({parent}_id)")
+        statements.append(f"CREATE TABLE {name} ({', '.join(lines)})")
+        cluster.append(name)
+    return statements
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    """Diagram the sql/ examples and the Q2 model, then time layout caching on a large schema"""
+    from constraint_validator import Q2_SCHEMA
+
+    parser = argparse.ArgumentParser(description="Schema-driven ER diagrams")
+    parser.add_argument('--tables', type=int, default=500, help="tables in the synthetic schema")
+    parser.add_argument('--render-synthetic', action='store_true',
+                        help="also render the synthetic schema (slow for hundreds of tables)")
+    args = parser.parse_args()
+
+    print("Schema-driven ER diagrams")
+    print("=" * 80)
+    cache = LayoutCache()
+    examples = example_schema()
+    for table in examples.values():
+        for reference in table.references:
+            kind = 'inferred from JOIN' if reference.inferred else 'declared'
+            print(f"  {table.name}.{', '.join(reference.columns)} -> {reference.parent}"
+                  f"({', '.join(reference.parent_columns)})  [{kind}]")
+    path = render_schema(examples, "sql/ example tables", cache)
+    print(f"✓ {len(examples)} tables from sql/: {os.path.relpath(path)}")
+
+    q2 = parse_schema(Q2_SCHEMA[name].ddl(name) for name in Q2_SCHEMA)
+    expected = [('employee', ['dept_id'], 'department')]
+    found = [(t.name, r.columns, r.parent) for t in q2.values() for r in t.references]
+    path = render_schema(q2, "Q2 keys and constraints", cache)
+    print(f"{'✓' if found == expected else '✗'} Q2 model from constraint_validator DDL "
+          f"(employee.dept_id -> department): {os.path.relpath(path)}")
+
+    # Large schema in a scratch cache: cold, warm, then one added table
+    statements = synthetic_ddl(args.tables)
+    tables = parse_schema(statements)
+    scratch = tempfile.mkdtemp()
+    try:
+        big = LayoutCache(scratch)
+        groups = components(tables)
+        boxes, cold = _timed(lambda: big.layout(tables))
+        print()
+        print(f"Synthetic schema: {len(tables)} tables, {len(_edges(tables))} references, "
+              f"{len(groups)} components")
+        print(f"  cold layout            {cold * 1000:8.1f}ms  ({big.misses} components laid out)")
+        fresh = LayoutCache(scratch)
+        _, warm = _timed(lambda: fresh.layout(tables))
+        print(f"  warm (disk cache)      {warm * 1000:8.1f}ms  ({fresh.hits} cached, "
+              f"{fresh.misses} laid out)")
+
+        largest = max(groups, key=len)
+        grown = statements + [f"CREATE TABLE audit_log (audit_id INTEGER PRIMARY KEY, "
+                              f"{largest[0]}_id INTEGER REFERENCES {largest[0]} ({largest[0]}_id))"]
+        misses = fresh.misses
+        grown_tables = parse_schema(grown)
+        grown_boxes, incremental = _timed(lambda: fresh.layout(grown_tables))
+        _, full = _timed(lambda: LayoutCache(tempfile.mkdtemp(dir=scratch)).layout(grown_tables))
+        moved_inside = sum(1 for name in largest
+                           if [a - b for a, b in zip(grown_boxes[name][:2], grown_boxes[largest[0]][:2])]
+                           != [a - b for a, b in zip(boxes[name][:2], boxes[largest[0]][:2])])
+        print(f"  add one table          {incremental * 1000:8.1f}ms  "
+              f"({fresh.misses - misses} component re-laid out of {len(components(grown_tables))}; "
+              f"full re-layout {full * 1000:.1f}ms)")
+        overlaps = _overlaps(grown_boxes)
+        print(f"{'✓' if overlaps == 0 else '✗'} no overlapping tables; "
+              f"{moved_inside} of {len(largest)} tables moved within the grown component")
+        if args.render_synthetic:
+            path, seconds = _timed(lambda: render_schema(grown_tables, None, cache))
+            print(f"✓ rendered in {seconds:.1f}s: {os.path.relpath(path)}")
+    finally:
+        shutil.rmtree(scratch)
+    print("=" * 80)
+
+
+def _overlaps(boxes):
+    """Overlapping box pairs, via a sweep over x"""
+    items = sorted(boxes.values())
+    count = 0
+    for i, (x, y, w, h) in enumerate(items):
+        for ox, oy, ow, oh in items[i + 1:]:
+            if ox >= x + w:
+                break
+            if oy < y + h and y < oy + oh:
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    main()
@@ -15,12 +15,15 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, Image
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from datetime import datetime
 import os
 
+from plan_visualizer import render_query_plan
+
 class SQLResearchReport:
     def __init__(self, filename="SQL_Research_Q5_Q6.pdf"):
         self.filename = filename
@@ -378,6 +381,15 @@ class SQLResearchReport:
         )
         self.story.append(optimizer)
         
+        # Real SQLite plan for the SECTION 8 join query (cached by query hash)
+        plan_path = render_query_plan(
+            "SELECT e.name, d.dept_name, e.salary FROM employees e "
+            "JOIN departments d ON e.dept_id = d.dept_id "
+            "WHERE d.location = 'New York' ORDER BY e.salary DESC",
+            title="SQLite EXPLAIN QUERY PLAN: Q5 SECTION 8 join")
+        plan_width, plan_height = ImageReader(plan_path).getSize()
+        self.story.append(Image(plan_path, width=5*inch, height=5*inch * plan_height / plan_width))
+        
         self.story.append(PageBreak())
     
     def add_q6_content(self):
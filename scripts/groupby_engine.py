@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Vectorized GROUP BY Aggregation Engine for Q6
+Implements SUM, COUNT, AVG, MIN and MAX over columnar arrays with the exact
+NULL semantics described in SECTIONS 4-6 of sql/q6_groupby_examples.sql:
+- COUNT(*) counts rows, COUNT(col) counts non-NULL values
+- SUM/AVG/MIN/MAX ignore NULLs and return NULL when a group has no values
+- NULL keys form their own group
+- GROUP BY over an empty input returns 0 rows, a global aggregate returns 1 row
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from columnar import Column, DictionaryColumn, hash_factorize, table_length
+from operator_stats import bucket_collisions, nbytes, operator, sort_comparisons
+from scaled_data import create_sales_database, generate_sales
+
+AGGREGATE_FUNCTIONS = ('COUNT(*)', 'COUNT', 'COUNT_DISTINCT', 'SUM', 'AVG', 'MIN', 'MAX')
+# Integer keys spanning at most this many values per row are factorized without sorting
+DIRECT_RANGE_FACTOR = 4
+
+
+def factorize(column):
+    """Map a column to dense integer codes; every NULL shares the last code"""
+    if isinstance(column, DictionaryColumn):
+        return _factorize_codes(column)
+    codes = np.empty(len(column), dtype=np.int64)
+    present = column.values[column.valid]
+    if present.dtype.kind in 'iu' and len(present):
+        low, high = int(present.min()), int(present.max())
+        if high - low <= DIRECT_RANGE_FACTOR * len(present):
+            # Small integer range: rank the values by direct addressing instead of sorting
+            offsets = present - low
+            used = np.bincount(offsets, minlength=high - low + 1) > 0
+            codes[column.valid] = (np.cumsum(used) - 1)[offsets]
+            n_codes = int(np.count_nonzero(used))
+            codes[~column.valid] = n_codes
+            return codes, n_codes + 1
+    if present.dtype == object:
+        uniques, inverse = hash_factorize(present)
+    else:
+        uniques, inverse = np.unique(present, return_inverse=True)
+    codes[column.valid] = inverse
+    codes[~column.valid] = len(uniques)
+    return codes, len(uniques) + 1
+
+
+def _factorize_codes(column):
+    """Dictionary codes are already sorted-order integers; only densify if some are unused"""
+    n_codes = len(column.dictionary)
+    codes = column.codes.astype(np.int64)
+    used = np.bincount(codes[column.valid], minlength=n_codes) > 0
+    if not used.all():
+        codes = (np.cumsum(used) - 1)[codes]
+        n_codes = int(used.sum())
+    codes[~column.valid] = n_codes
+    return codes, n_codes + 1
+
+
+def compute_group_ids(key_columns, n_rows):
+    """
+    Assign every row a dense group id.
+
+    Keys are factorized one at a time and combined as mixed-radix integers,
+    re-densifying whenever the combined domain could overflow int64.
+    Returns (group_ids, n_groups, first_row_of_each_group).
+    """
+    if not key_columns:
+        # Global aggregate: exactly one group, even for an empty input
+        return np.zeros(n_rows, dtype=np.int64), 1, np.zeros(1, dtype=np.int64)
+
+    group_ids = np.zeros(n_rows, dtype=np.int64)
+    domain = 1
+    for column in key_columns:
+        codes, cardinality = factorize(column)
+        if domain * cardinality >= 2 ** 62:
+            _, group_ids = np.unique(group_ids, return_inverse=True)
+            domain = int(group_ids.max()) + 1 if n_rows else 1
+        group_ids = group_ids * cardinality + codes
+        domain *= cardinality
+    _, first_rows, group_ids = np.unique(group_ids, return_index=True, return_inverse=True)
+    return group_ids.reshape(-1), len(first_rows), first_rows
+
+
+def _numeric(values):
+    return values.dtype.kind in 'iufb'
+
+
+def _sum_values(group_ids, values, n_groups):
+    if values.dtype.kind in 'iub':
+        totals = np.zeros(n_groups, dtype=np.int64)
+        np.add.at(totals, group_ids, values.astype(np.int64))
+        return totals
+    return np.bincount(group_ids, weights=values, minlength=n_groups)
+
+
+def _extreme(group_ids, values, n_groups, func):
+    """MIN/MAX per group; numeric types use ufunc.at, others a stable sort"""
+    if _numeric(values) and len(values):
+        if func == 'MIN':
+            result = np.full(n_groups, values.max(), dtype=values.dtype)
+            np.minimum.at(result, group_ids, values)
+        else:
+            result = np.full(n_groups, values.min(), dtype=values.dtype)
+            np.maximum.at(result, group_ids, values)
+        return result
+    result = np.empty(n_groups, dtype=values.dtype)
+    if len(values):
+        order = np.argsort(values, kind='stable')
+        order = order[np.argsort(group_ids[order], kind='stable')]
+        sorted_groups = group_ids[order]
+        if func == 'MIN':
+            pick = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+        else:
+            pick = np.r_[sorted_groups[1:] != sorted_groups[:-1], True]
+        result[sorted_groups[pick]] = values[order[pick]]
+    return result
+
+
+def aggregate(func, column, group_ids, n_groups):
+    """Evaluate one aggregate function for every group"""
+    if func == 'COUNT(*)':
+        return Column(np.bincount(group_ids, minlength=n_groups).astype(np.int64))
+
+    present = group_ids[column.valid]
+    values = column.values[column.valid]
+    counts = np.bincount(present, minlength=n_groups).astype(np.int64)
+    has_values = counts > 0
+
+    if func == 'COUNT':
+        return Column(counts)
+    if func == 'COUNT_DISTINCT':
+        codes, cardinality = factorize(Column(values))
+        pairs = np.unique(present * cardinality + codes)
+        return Column(np.bincount(pairs // cardinality, minlength=n_groups).astype(np.int64))
+    if func == 'SUM':
+        return Column(_sum_values(present, values, n_groups), has_values)
+    if func == 'AVG':
+        totals = _sum_values(present, values, n_groups).astype(np.float64)
+        averages = np.divide(totals, counts, out=np.zeros(n_groups), where=has_values)
+        return Column(averages, has_values)
+    if func in ('MIN', 'MAX'):
+        return Column(_extreme(present, values, n_groups, func), has_values)
+    raise ValueError(f"Unsupported aggregate function: {func}")
+
+
+def group_by(table, keys, aggregates, labels=None):
+    """
+    Vectorized equivalent of SELECT keys..., aggregates... FROM table GROUP BY keys.
+
+    table: dict of column name -> Column
+    keys: list of column names (empty for a global aggregate)
+    aggregates: list of (alias, function, column) where column is a column
+                name, a Column expression, or None for COUNT(*)
+    labels: optional alias -> text naming an aggregate in the operator tree,
+            for aliases that are not part of the output (HAVING's)
+    Returns a dict of output column name -> Column, keys first.
+    """
+    n_rows = table_length(table)
+    key_columns = [table[k] for k in keys]
+    with operator('HashAggregate', ', '.join(keys)) as op:
+        with operator('GroupIds') as group_op:
+            group_ids, n_groups, first_rows = compute_group_ids(key_columns, n_rows)
+            if group_op.enabled:
+                # Distinct first rows stand in for the distinct keys when modelling collisions
+                group_op.count(rows_in=n_rows, rows_out=n_groups,
+                               collisions=bucket_collisions(first_rows),
+                               comparisons=sort_comparisons(n_rows),
+                               bytes=nbytes(group_ids, first_rows))
+
+        result = {}
+        for name, column in zip(keys, key_columns):
+            result[name] = column.take(first_rows)
+        for alias, func, source in aggregates:
+            column = table[source] if isinstance(source, str) else source
+            if labels and alias in labels:
+                detail = labels[alias]
+            elif isinstance(source, str):
+                detail = f'{func}({source}) AS {alias}'
+            else:
+                # An expression is known only by its alias
+                detail = f'{func} AS {alias}' if column is None else f'{func}({alias})'
+            with operator('Aggregate', detail) as agg_op:
+                result[alias] = aggregate(func, column, group_ids, n_groups)
+                agg_op.count(rows_in=n_rows, rows_out=n_groups,
+                             bytes=nbytes(result[alias].values, result[alias].valid))
+        op.count(rows_in=n_rows, rows_out=n_groups)
+    return result
+
+
+def result_rows(result):
+    """Convert a result dict into a list of row tuples (None for NULL)"""
+    columns = [c.to_list() for c in result.values()]
+    return list(zip(*columns))
+
+
+# ----------------------------------------------------------------------------
+# NULL semantics checks against the hand-written SECTION 5 / SECTION 7 examples
+# ----------------------------------------------------------------------------
+
+def check_null_semantics():
+    """Verify the documented results for test_nulls, all_nulls and empty_sales"""
+    test_nulls = {'value': Column.from_list([100, None, 200, None, 150])}
+    result = group_by(test_nulls, [], [
+        ('sum', 'SUM', 'value'), ('avg', 'AVG', 'value'),
+        ('count_all', 'COUNT(*)', None), ('count_value', 'COUNT', 'value'),
+        ('min', 'MIN', 'value'), ('max', 'MAX', 'value'),
+    ])
+    assert result_rows(result) == [(450, 150.0, 5, 3, 100, 200)]
+
+    all_nulls = {'value': Column.from_list([None, None, None], dtype=np.int64)}
+    result = group_by(all_nulls, [], [
+        ('sum', 'SUM', 'value'), ('avg', 'AVG', 'value'),
+        ('min', 'MIN', 'value'), ('max', 'MAX', 'value'),
+        ('count_value', 'COUNT', 'value'), ('count_all', 'COUNT(*)', None),
+    ])
+    assert result_rows(result) == [(None, None, None, None, 0, 3)]
+
+    empty_sales = {'product_id': Column.from_list([], dtype=np.int64),
+                   'quantity': Column.from_list([], dtype=np.int64)}
+    assert result_rows(group_by(empty_sales, ['product_id'], [('total', 'SUM', 'quantity')])) == []
+    assert result_rows(group_by(empty_sales, [], [('total', 'SUM', 'quantity')])) == [(None,)]
+
+    customers = {'customer_id': Column.from_list([1, None, 1, None, 2])}
+    grouped = result_rows(group_by(customers, ['customer_id'], [('n', 'COUNT(*)', None)]))
+    assert sorted(grouped, key=lambda r: (r[0] is None, r[0])) == [(1, 2), (2, 1), (None, 2)]
+
+
+# ----------------------------------------------------------------------------
+# Benchmark against SQLite on scaled sales data
+# ----------------------------------------------------------------------------
+
+def benchmark_queries(sales):
+    """Q6 queries as (label, SQL, engine callable) triples"""
+    revenue = sales['quantity'] * sales['unit_price']
+    return [
+        ("COUNT(*) by region",
+         "SELECT region, COUNT(*) FROM sales GROUP BY region",
+         lambda: group_by(sales, ['region'], [('total_sales', 'COUNT(*)', None)])),
+        ("Multi-aggregate by product",
+         "SELECT product_id, COUNT(*), SUM(quantity), AVG(unit_price), "
+         "MIN(unit_price), MAX(unit_price) FROM sales GROUP BY product_id",
+         lambda: group_by(sales, ['product_id'], [
+             ('num_sales', 'COUNT(*)', None), ('total_quantity', 'SUM', 'quantity'),
+             ('avg_price', 'AVG', 'unit_price'), ('min_price', 'MIN', 'unit_price'),
+             ('max_price', 'MAX', 'unit_price')])),
+        ("Revenue by region, product",
+         "SELECT region, product_id, COUNT(*), SUM(quantity * unit_price) "
+         "FROM sales GROUP BY region, product_id",
+         lambda: group_by(sales, ['region', 'product_id'], [
+             ('sales_count', 'COUNT(*)', None), ('total_revenue', 'SUM', revenue)])),
+        ("COUNT(col) data quality",
+         "SELECT product_id, COUNT(*), COUNT(quantity), COUNT(discount), "
+         "COUNT(customer_id) FROM sales GROUP BY product_id",
+         lambda: group_by(sales, ['product_id'], [
+             ('total_sales', 'COUNT(*)', None), ('with_quantity', 'COUNT', 'quantity'),
+             ('with_discount', 'COUNT', 'discount'), ('with_customer', 'COUNT', 'customer_id')])),
+        ("AVG/SUM of nullable discount",
+         "SELECT region, AVG(discount), SUM(discount) FROM sales GROUP BY region",
+         lambda: group_by(sales, ['region'], [
+             ('avg_discount', 'AVG', 'discount'), ('total_discount', 'SUM', 'discount')])),
+    ]
+
+
+def rows_match(expected, actual, n_keys):
+    """Compare result sets by key, allowing float rounding differences"""
+    if len(expected) != len(actual):
+        return False
+    by_key = {row[:n_keys]: row[n_keys:] for row in actual}
+    for row in expected:
+        other = by_key.get(row[:n_keys])
+        if other is None:
+            return False
+        for a, b in zip(row[n_keys:], other):
+            if (a is None) != (b is None):
+                return False
+            if a is not None and not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6):
+                return False
+    return True
+
+
+def time_call(func, repeat=3):
+    """Best-of-N wall clock time in seconds, plus the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(n_rows, repeat=3):
+    """Time every query in SQLite and in the vectorized engine"""
+    print(f"\nScale: {n_rows:,} sales rows")
+    print("-" * 78)
+    sales = generate_sales(n_rows)
+    conn = create_sales_database(n_rows)
+    print(f"{'Query':<32}{'SQLite (s)':>12}{'Engine (s)':>12}{'Speedup':>10}{'Match':>8}")
+    for label, sql, engine_query in benchmark_queries(sales):
+        sqlite_time, expected = time_call(lambda: conn.execute(sql).fetchall(), repeat)
+        engine_time, result = time_call(engine_query, repeat)
+        n_keys = sql.split('GROUP BY')[1].count(',') + 1
+        match = rows_match(expected, result_rows(result), n_keys)
+        print(f"{label:<32}{sqlite_time:>12.3f}{engine_time:>12.3f}"
+              f"{sqlite_time / engine_time:>9.1f}x{'✓' if match else '✗':>8}")
+    conn.close()
+
+
+def main():
+    """Check NULL semantics, then benchmark against SQLite"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000],
+                        help="sales row counts to benchmark (e.g. 1000000 10000000 100000000)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Vectorized GROUP BY engine")
+    print("=" * 78)
+    check_null_semantics()
+    print("✓ NULL semantics match SECTIONS 5-7 of q6_groupby_examples.sql")
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.repeat)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+ROLLUP / CUBE / GROUPING SETS for Q6 SECTION 9
+SQLite cannot execute GROUP BY ROLLUP(...), CUBE(...) or GROUPING SETS(...).
+This engine aggregates the finest grouping once, then derives every coarser
+grouping set by re-aggregating the partial aggregates (AVG is carried as a
+SUM/COUNT pair). Rolled-up key columns are NULL and GROUPING() flags tell them
+apart from genuine NULL keys.
+"""
+
+import argparse
+import itertools
+
+import numpy as np
+
+from columnar import Column, concat, null_column
+from groupby_engine import group_by, result_rows, rows_match, time_call
+from scaled_data import create_sales_database, generate_sales
+
+# How each aggregate is split into partials and merged back together
+DECOMPOSABLE = {
+    'COUNT(*)': [('COUNT(*)', 'SUM')],
+    'COUNT': [('COUNT', 'SUM')],
+    'SUM': [('SUM', 'SUM')],
+    'AVG': [('SUM', 'SUM'), ('COUNT', 'SUM')],
+    'MIN': [('MIN', 'MIN')],
+    'MAX': [('MAX', 'MAX')],
+}
+
+
+def rollup(*columns):
+    """ROLLUP(a, b) -> (a, b), (a), ()"""
+    return [tuple(columns[:i]) for i in range(len(columns), -1, -1)]
+
+
+def cube(*columns):
+    """CUBE(a, b) -> (a, b), (a), (b), ()"""
+    return [combo for size in range(len(columns), -1, -1)
+            for combo in itertools.combinations(columns, size)]
+
+
+def grouping_flag_name(column):
+    return f'GROUPING({column})'
+
+
+def split_aggregates(aggregates):
+    """Partial aggregate list for the base grouping plus per-alias merge plans"""
+    partials = []
+    plans = {}
+    for alias, func, source in aggregates:
+        if func not in DECOMPOSABLE:
+            raise ValueError(f"{func} cannot be derived from partial aggregates")
+        plan = []
+        for i, (partial_func, merge_func) in enumerate(DECOMPOSABLE[func]):
+            partial_alias = f'__{alias}_{i}'
+            partials.append((partial_alias, partial_func, source))
+            plan.append((partial_alias, merge_func))
+        plans[alias] = (func, plan)
+    return partials, plans
+
+
+def finalize_aggregate(func, merged):
+    """Turn merged partial columns into the final aggregate value"""
+    if func in ('COUNT(*)', 'COUNT'):
+        return merged[0].coalesce(0)
+    if func == 'AVG':
+        totals, counts = merged[0], merged[1].coalesce(0)
+        has_values = counts.values > 0
+        averages = np.divide(totals.values.astype(np.float64), counts.values,
+                             out=np.zeros(len(counts)), where=has_values)
+        return Column(averages, has_values & totals.valid)
+    return merged[0]
+
+
+def merge_partials(partials, keys, plans):
+    """Re-aggregate a table of partial aggregates by keys and finalize every output"""
+    merges = [(partial_alias, merge_func, partial_alias)
+              for _, plan in plans.values() for partial_alias, merge_func in plan]
+    merged = group_by(partials, list(keys), merges)
+    result = {key: merged[key] for key in keys}
+    for alias, (func, plan) in plans.items():
+        result[alias] = finalize_aggregate(func, [merged[p] for p, _ in plan])
+    return result
+
+
+def _assemble(set_results, table, all_keys, aggregate_aliases):
+    """UNION ALL the per-set results, NULL-filling rolled-up keys and adding GROUPING() flags"""
+    output = {}
+    for key in all_keys:
+        dtype = table[key].values.dtype
+        output[key] = concat([r[key] if key in s else null_column(_set_length(r), dtype)
+                              for s, r in set_results])
+    for alias in aggregate_aliases:
+        output[alias] = concat([r[alias] for _, r in set_results])
+    grouping_id = np.concatenate([
+        np.full(_set_length(r), _grouping_id(s, all_keys), dtype=np.int64)
+        for s, r in set_results])
+    for i, key in enumerate(all_keys):
+        bit = 1 << (len(all_keys) - 1 - i)
+        output[grouping_flag_name(key)] = Column((grouping_id & bit) // bit)
+    output['GROUPING_ID'] = Column(grouping_id)
+    return output
+
+
+def _set_length(result):
+    return len(next(iter(result.values())))
+
+
+def _grouping_id(grouping_set, all_keys):
+    """Bitmask with a 1 for every rolled-up column, most significant bit first"""
+    return sum(1 << (len(all_keys) - 1 - i)
+               for i, key in enumerate(all_keys) if key not in grouping_set)
+
+
+def grouping_sets(table, sets, aggregates):
+    """
+    GROUP BY GROUPING SETS (...) computed from a single base aggregation.
+
+    sets: list of tuples of key column names (use rollup()/cube() helpers)
+    aggregates: list of (alias, function, column) as for groupby_engine.group_by
+    """
+    all_keys = list(dict.fromkeys(key for s in sets for key in s))
+    partials, plans = split_aggregates(aggregates)
+    base = group_by(table, all_keys, partials)
+
+    set_results = [(s, merge_partials(base, s, plans)) for s in sets]
+    return _assemble(set_results, table, all_keys, list(plans))
+
+
+def naive_grouping_sets(table, sets, aggregates):
+    """Union-of-GROUP-BYs rewrite: one full scan of the input per grouping set"""
+    all_keys = list(dict.fromkeys(key for s in sets for key in s))
+    set_results = [(s, group_by(table, list(s), aggregates)) for s in sets]
+    return _assemble(set_results, table, all_keys, [alias for alias, _, _ in aggregates])
+
+
+def sqlite_union_rewrite(sets, select_list, all_keys):
+    """Portable SQL for a GROUPING SETS query as a UNION ALL of GROUP BYs"""
+    branches = []
+    for grouping_set in sets:
+        keys = [key if key in grouping_set else f'NULL AS {key}' for key in all_keys]
+        group_clause = f" GROUP BY {', '.join(grouping_set)}" if grouping_set else ''
+        branches.append(f"SELECT {_grouping_id(grouping_set, all_keys)} AS grouping_id, "
+                        f"{', '.join(keys)}, {select_list} FROM sales{group_clause}")
+    return '\nUNION ALL\n'.join(branches)
+
+
+def check_grouping_flags():
+    """A genuine NULL key keeps GROUPING() = 0; the rolled-up total gets GROUPING() = 1"""
+    sample = {
+        'customer_id': Column.from_list([1, 2, 1, 3, 2, 4, 1, 5, None, 4]),
+        'quantity': Column.from_list([5, 3, 2, 10, 7, None, 5, 8, 4, 6]),
+    }
+    result = grouping_sets(sample, rollup('customer_id'), [
+        ('total', 'SUM', 'quantity'), ('avg', 'AVG', 'quantity'), ('n', 'COUNT(*)', None)])
+    rows = result_rows({c: result[c] for c in
+                        ['customer_id', 'GROUPING(customer_id)', 'total', 'avg', 'n']})
+    assert (None, 0, 4, 4.0, 1) in rows
+    assert (None, 1, 50, 50 / 9, 10) in rows
+    assert (4, 0, 6, 6.0, 2) in rows
+
+
+# ----------------------------------------------------------------------------
+# Benchmark on the SECTION 9 queries
+# ----------------------------------------------------------------------------
+
+def _keyed_rows(result, all_keys, aliases):
+    columns = ['GROUPING_ID'] + all_keys + aliases
+    return result_rows({c: result[c] for c in columns})
+
+
+def run_benchmark(n_rows, repeat=3):
+    """Compare the single-base engine with the per-set rewrites"""
+    print(f"\nScale: {n_rows:,} sales rows")
+    print("-" * 86)
+    sales = generate_sales(n_rows)
+    conn = create_sales_database(n_rows)
+    revenue = sales['quantity'] * sales['unit_price']
+    aggregates = [('total_revenue', 'SUM', revenue), ('avg_quantity', 'AVG', 'quantity'),
+                  ('sales_count', 'COUNT(*)', None)]
+    select_list = "SUM(quantity * unit_price), AVG(quantity), COUNT(*)"
+    aliases = [alias for alias, _, _ in aggregates]
+    all_keys = ['region', 'product_id']
+    queries = [
+        ("ROLLUP(region, product_id)", rollup(*all_keys)),
+        ("CUBE(region, product_id)", cube(*all_keys)),
+        ("GROUPING SETS (4 sets)", [('region',), ('product_id',), ('region', 'product_id'), ()]),
+    ]
+
+    print(f"{'Query':<30}{'Single base':>13}{'Union engine':>14}{'Union SQLite':>14}"
+          f"{'Speedup':>9}{'Match':>6}")
+    for label, sets in queries:
+        base_time, result = time_call(lambda: grouping_sets(sales, sets, aggregates), repeat)
+        naive_time, naive = time_call(lambda: naive_grouping_sets(sales, sets, aggregates), repeat)
+        sql = sqlite_union_rewrite(sets, select_list, all_keys)
+        sqlite_time, expected = time_call(lambda: conn.execute(sql).fetchall(), repeat)
+        n_keys = 1 + len(all_keys)
+        match = (rows_match(expected, _keyed_rows(result, all_keys, aliases), n_keys)
+                 and rows_match(_keyed_rows(naive, all_keys, aliases),
+                                _keyed_rows(result, all_keys, aliases), n_keys))
+        print(f"{label:<30}{base_time:>12.3f}s{naive_time:>13.3f}s{sqlite_time:>13.3f}s"
+              f"{naive_time / base_time:>8.1f}x{'✓' if match else '✗':>6}")
+    conn.close()
+
+
+def main():
+    """Run the SECTION 9 grouping-set queries at scale"""
+    parser = argparse.ArgumentParser(description="ROLLUP / CUBE / GROUPING SETS engine")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Grouping sets from a single base aggregation")
+    print("=" * 86)
+    check_grouping_flags()
+    print("✓ GROUPING() separates rolled-up rows from NULL keys")
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.repeat)
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    main()
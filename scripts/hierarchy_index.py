@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Interval Index for the employees.manager_id Hierarchy
+SECTION 9 self-joins employees to their managers one level at a time; "all
+reports under X" needs WITH RECURSIVE, which re-walks the tree through the
+manager_id index on every call.
+
+HierarchyIndex numbers the tree in pre-order (nested sets): every employee
+gets a start position and a subtree size, and the subtree of X occupies the
+contiguous range order[start[X] : start[X] + size[X]]. Headcount and "is A
+above B" are O(1) arithmetic, listing reports is one slice, and the
+management chain is a walk over parent pointers (its own length).
+
+Hires, transfers and departures update the index in place instead of
+rebuilding it: the pre-order array is shifted with one memmove, and the
+position changes are logged as (lo, hi, delta) range shifts that single
+lookups apply on the fly until MAX_PENDING of them are folded into the
+start array in one vectorized pass.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from columnar import Column
+from scaled_data import create_hr_database
+
+ROOT = 0  # virtual root above every top-level employee (manager_id IS NULL)
+# Position shifts logged by updates before they are folded into the start array
+MAX_PENDING = 64
+
+
+class HierarchyIndex:
+    """Pre-order interval numbering of an employee_id -> manager_id tree"""
+
+    def __init__(self, employee_id, manager_id):
+        ids = np.asarray(employee_id.values, dtype=np.int64)
+        if len(ids) and ids.min() <= ROOT:
+            raise ValueError("employee_id must be positive integers")
+        capacity = int(ids.max()) + 1 if len(ids) else 1
+        managers = np.where(manager_id.valid, manager_id.values, ROOT).astype(np.int64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.parent[ROOT] = ROOT
+        self.parent[ids] = ROOT
+        if np.count_nonzero(self.parent >= 0) != len(ids) + 1:
+            raise ValueError("employee_id must be unique")
+        # Managers that are not employees (dangling keys) leave their reports at the top level
+        known = (managers > ROOT) & (managers < capacity)
+        known[known] = self.parent[managers[known]] >= 0
+        self.parent[ids[known]] = managers[known]
+
+        self.depth = self._depths()
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.start = np.full(capacity, -1, dtype=np.int64)
+        self._number(ids)
+
+    def _depths(self):
+        """Pointer doubling: log2(height) vectorized passes instead of a walk per employee"""
+        present = self.parent >= 0
+        jump = np.where(present, self.parent, ROOT)
+        depth = (jump != ROOT).astype(np.int64)
+        for _ in range(len(jump).bit_length() + 1):
+            if not (jump != ROOT).any():
+                depth[ROOT] = -1
+                return depth
+            depth = depth + np.where(jump != ROOT, depth[jump], 0)
+            jump = jump[jump]
+        raise ValueError("manager_id contains a cycle")
+
+    def _number(self, ids):
+        by_level = ids[np.argsort(self.depth[ids], kind='stable')]
+        bounds = np.searchsorted(self.depth[by_level], np.arange(self.depth[ids].max() + 2)
+                                 if len(ids) else [0])
+        levels = [by_level[a:b] for a, b in zip(bounds, bounds[1:])]
+
+        # Subtree sizes bottom-up, one level at a time
+        self.size[ids] = 1
+        self.size[ROOT] = 1
+        for level in reversed(levels):
+            np.add.at(self.size, self.parent[level], self.size[level])
+
+        # Each child starts after its parent and the subtrees of its earlier siblings
+        siblings = ids[np.lexsort((ids, self.parent[ids]))]
+        sizes = self.size[siblings]
+        before = np.cumsum(sizes) - sizes
+        first = np.r_[True, self.parent[siblings][1:] != self.parent[siblings][:-1]]
+        offset = np.zeros(len(self.parent), dtype=np.int64)
+        offset[siblings] = before - np.maximum.accumulate(np.where(first, before, 0))
+
+        self.start[ROOT] = 0
+        for level in levels:
+            self.start[level] = self.start[self.parent[level]] + 1 + offset[level]
+        self._order = np.empty(max(16, 2 * (len(ids) + 1)), dtype=np.int64)
+        self._used = len(ids) + 1
+        self._order[self.start[ids]] = ids
+        self._order[0] = ROOT
+        self._pending = []
+        self._fresh = {}
+
+    @classmethod
+    def from_table(cls, table):
+        return cls(table['employee_id'], table['manager_id'])
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @property
+    def order(self):
+        return self._order[:self._used]
+
+    def __contains__(self, employee_id):
+        return 0 < employee_id < len(self.parent) and self.parent[employee_id] >= 0
+
+    def __len__(self):
+        return self._used - 1
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.parent, self.depth, self.size, self.start, self._order))
+
+    def _check(self, employee_id):
+        if employee_id not in self:
+            raise KeyError(employee_id)
+
+    def _position(self, node):
+        """start[node] with the range shifts logged since it was last written applied"""
+        position = int(self.start[node])
+        for shifts in self._pending[self._fresh.get(node, 0):]:
+            for lo, hi, delta in shifts:
+                if lo <= position < hi:
+                    position += delta
+                    break
+        return position
+
+    def report_range(self, employee_id):
+        """Positions [lo, hi) in order holding everyone below employee_id"""
+        self._check(employee_id)
+        lo = self._position(employee_id) + 1
+        return lo, lo + int(self.size[employee_id]) - 1
+
+    def reports(self, employee_id):
+        """All direct and indirect reports, as employee ids in pre-order"""
+        lo, hi = self.report_range(employee_id)
+        return self._order[lo:hi].copy()
+
+    def headcount(self, employee_id):
+        """Number of direct and indirect reports"""
+        self._check(employee_id)
+        return int(self.size[employee_id]) - 1
+
+    def level(self, employee_id):
+        """0 for top-level employees, 1 for their direct reports, ..."""
+        self._check(employee_id)
+        return int(self.depth[employee_id])
+
+    def is_above(self, manager_id, employee_id):
+        """True where manager_id is a direct or indirect manager of employee_id (vectorized)"""
+        self._check(manager_id)
+        if np.ndim(employee_id):
+            self._flush()
+            position = self.start[employee_id]
+        else:
+            position = self._position(employee_id)
+        lo = self._position(manager_id)
+        return (position > lo) & (position < lo + self.size[manager_id])
+
+    def chain(self, employee_id):
+        """Managers of employee_id from the direct manager up to the top"""
+        self._check(employee_id)
+        managers = []
+        node = int(self.parent[employee_id])
+        while node != ROOT:
+            managers.append(node)
+            node = int(self.parent[node])
+        return managers
+
+    def to_table(self):
+        """The employee_id / manager_id columns the index currently describes"""
+        ids = self.order[1:].copy()
+        managers = self.parent[ids]
+        return {'employee_id': Column(ids), 'manager_id': Column(managers, managers != ROOT)}
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    def _grow(self, employee_id):
+        if employee_id >= len(self.parent):
+            extra = max(employee_id + 1, 2 * len(self.parent)) - len(self.parent)
+            self.parent = np.r_[self.parent, np.full(extra, -1, dtype=np.int64)]
+            self.depth = np.r_[self.depth, np.zeros(extra, dtype=np.int64)]
+            self.size = np.r_[self.size, np.zeros(extra, dtype=np.int64)]
+            self.start = np.r_[self.start, np.full(extra, -1, dtype=np.int64)]
+        if self._used == len(self._order):
+            self._order = np.r_[self._order, np.empty(len(self._order), dtype=np.int64)]
+
+    def _shift(self, *shifts):
+        """Log (lo, hi, delta) moves of positions; fold them into start once enough pile up"""
+        self._pending.append(shifts)
+        if len(self._pending) >= MAX_PENDING:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.start[self.order] = np.arange(self._used)
+            self._pending.clear()
+            self._fresh.clear()
+
+    def _resize_chain(self, node, delta):
+        """Add delta to the subtree size of node and everyone above it, including ROOT"""
+        while True:
+            self.size[node] += delta
+            if node == ROOT:
+                return
+            node = int(self.parent[node])
+
+    def _manager(self, manager_id):
+        if manager_id is None:
+            return ROOT
+        self._check(manager_id)
+        return manager_id
+
+    def add(self, employee_id, manager_id=None):
+        """INSERT: a new hire becomes the last report of manager_id"""
+        if employee_id <= ROOT or employee_id in self:
+            raise ValueError(f"employee {employee_id} already exists or is not a valid id")
+        manager = self._manager(manager_id)
+        self._grow(employee_id)
+        position = self._position(manager) + int(self.size[manager])
+        used = self._used
+        self._order[position + 1:used + 1] = self._order[position:used]
+        self._order[position] = employee_id
+        self._used += 1
+        self._shift((position, used, 1))
+
+        self.parent[employee_id] = manager
+        self.depth[employee_id] = self.depth[manager] + 1
+        self.start[employee_id] = position
+        if self._pending:
+            self._fresh[employee_id] = len(self._pending)
+        self.size[employee_id] = 1
+        self._resize_chain(manager, 1)
+
+    def remove(self, employee_id):
+        """DELETE: the employee's reports move up to the employee's own manager"""
+        self._check(employee_id)
+        position, size = self._position(employee_id), int(self.size[employee_id])
+        manager = int(self.parent[employee_id])
+        below = self._order[position + 1:position + size]
+        self.depth[below] -= 1
+        self.parent[below[self.parent[below] == employee_id]] = manager
+        # Promoting the reports keeps their pre-order, so only the slot is closed up
+        used = self._used
+        self._order[position:used - 1] = self._order[position + 1:used]
+        self._used -= 1
+        self._resize_chain(manager, -1)
+
+        self.parent[employee_id] = -1
+        self.start[employee_id] = -1
+        self.size[employee_id] = 0
+        self._fresh.pop(employee_id, None)
+        self._shift((position + 1, used, -1))
+
+    def move(self, employee_id, manager_id):
+        """UPDATE manager_id: the whole subtree moves under manager_id (None = top level)"""
+        self._check(employee_id)
+        manager = self._manager(manager_id)
+        if manager == employee_id or (manager != ROOT and self.is_above(employee_id, manager)):
+            raise ValueError(f"employee {manager} reports to {employee_id}; the move would "
+                             "create a cycle")
+        old = int(self.parent[employee_id])
+        if old == manager:
+            return
+        position, size = self._position(employee_id), int(self.size[employee_id])
+        end = position + size
+        block = self._order[position:end].copy()
+        target = self._position(manager) + int(self.size[manager])
+        # Only the positions between the old and new location shift
+        if target <= position:
+            self._order[target + size:end] = self._order[target:position]
+            self._order[target:target + size] = block
+            self._shift((target, position, size), (position, end, target - position))
+        else:
+            self._order[position:target - size] = self._order[end:target]
+            self._order[target - size:target] = block
+            self._shift((position, end, target - end), (end, target, -size))
+
+        self.depth[block] += self.depth[manager] + 1 - self.depth[employee_id]
+        self._resize_chain(old, -size)
+        self._resize_chain(manager, size)
+        self.parent[employee_id] = manager
+
+    def consistent(self):
+        """Same sizes and depths as a fresh build, and every subtree nested in its manager's"""
+        self._flush()
+        fresh = HierarchyIndex.from_table(self.to_table())
+        ids = self.order[1:]
+        if not (np.array_equal(fresh.size[ids], self.size[ids])
+                and np.array_equal(fresh.depth[ids], self.depth[ids])
+                and np.array_equal(self.start[ids], np.arange(1, self._used))):
+            return False
+        parent = self.parent[ids]
+        return bool(np.all((self.start[parent] < self.start[ids])
+                           & (self.start[ids] + self.size[ids]
+                              <= self.start[parent] + self.size[parent])))
+
+
+# ----------------------------------------------------------------------------
+# Recursive CTE baselines (SQLite)
+# ----------------------------------------------------------------------------
+
+REPORTS_SQL = """
+    WITH RECURSIVE reports(employee_id) AS (
+        SELECT employee_id FROM employees WHERE manager_id = ?
+        UNION ALL
+        SELECT e.employee_id FROM employees e JOIN reports r ON e.manager_id = r.employee_id
+    )
+    SELECT employee_id FROM reports"""
+
+HEADCOUNT_SQL = """
+    WITH RECURSIVE reports(employee_id) AS (
+        SELECT employee_id FROM employees WHERE manager_id = ?
+        UNION ALL
+        SELECT e.employee_id FROM employees e JOIN reports r ON e.manager_id = r.employee_id
+    )
+    SELECT COUNT(*), SUM(e.salary) FROM reports r JOIN employees e USING (employee_id)"""
+
+CHAIN_SQL = """
+    WITH RECURSIVE chain(employee_id, manager_id, distance) AS (
+        SELECT employee_id, manager_id, 0 FROM employees WHERE employee_id = ?
+        UNION ALL
+        SELECT e.employee_id, e.manager_id, c.distance + 1 FROM employees e JOIN chain c
+            ON e.employee_id = c.manager_id
+    )
+    SELECT employee_id FROM chain WHERE distance > 0 ORDER BY distance"""
+
+MANAGER_INDEX = "CREATE INDEX IF NOT EXISTS idx_employees_manager ON employees(manager_id)"
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _best(func, repeat):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        elapsed, result = _timed(func)
+        best = min(best, elapsed)
+    return best, result
+
+
+def _same(expected, actual):
+    """SQLite rows against the index result for the same query"""
+    if isinstance(actual, np.ndarray):
+        return sorted(r[0] for r in expected) == sorted(actual.tolist())
+    return expected[0] == actual[0] and math.isclose(expected[1] or 0.0, actual[1])
+
+
+def read_employees(conn):
+    rows = conn.execute("SELECT employee_id, manager_id, salary FROM employees "
+                        "ORDER BY employee_id").fetchall()
+    ids, managers, salaries = zip(*rows)
+    table = {'employee_id': Column.from_list(list(ids)),
+             'manager_id': Column.from_list(list(managers))}
+    salary = np.zeros(max(ids) + 1)
+    salary[list(ids)] = salaries
+    return table, salary
+
+
+def random_updates(index, n_updates, protected, seed=42):
+    """A mix of hires, transfers and departures against the current tree"""
+    rng = np.random.default_rng(seed)
+    employees = index.order[1:].tolist()
+    alive = set(employees)
+    next_id = len(index.parent)
+    updates = []
+    while len(updates) < n_updates:
+        kind = rng.choice(['hire', 'transfer', 'leave'], p=[0.5, 0.3, 0.2])
+        employee = employees[rng.integers(len(employees))]
+        if employee not in alive:
+            continue
+        if kind == 'hire':
+            updates.append(('hire', next_id, employee))
+            employees.append(next_id)
+            alive.add(next_id)
+            next_id += 1
+        elif employee in protected:
+            continue
+        elif kind == 'leave':
+            updates.append(('leave', employee, None))
+            alive.discard(employee)
+        else:
+            manager = employees[rng.integers(len(employees))]
+            if manager not in alive:
+                continue
+            updates.append(('transfer', employee, manager))
+    return updates
+
+
+def apply_to_index(index, updates):
+    applied = []
+    for kind, employee, manager in updates:
+        if kind == 'hire':
+            index.add(employee, manager)
+        elif kind == 'leave':
+            index.remove(employee)
+        else:
+            try:
+                index.move(employee, manager)
+            except ValueError:
+                continue  # the new manager reports to the employee
+        applied.append((kind, employee, manager))
+    return applied
+
+
+def apply_to_sqlite(conn, updates):
+    for kind, employee, manager in updates:
+        if kind == 'hire':
+            conn.execute("INSERT INTO employees (employee_id, name, salary, manager_id) "
+                         "VALUES (?, ?, 50000, ?)", (employee, f'Employee {employee}', manager))
+        elif kind == 'leave':
+            conn.execute("UPDATE employees SET manager_id = (SELECT manager_id FROM employees "
+                         "WHERE employee_id = ?) WHERE manager_id = ?", (employee, employee))
+            conn.execute("DELETE FROM employees WHERE employee_id = ?", (employee,))
+        else:
+            conn.execute("UPDATE employees SET manager_id = ? WHERE employee_id = ?",
+                         (manager, employee))
+    conn.commit()
+
+
+def check_against_sqlite(conn, index, managers, employee):
+    for manager in managers:
+        expected = sorted(r[0] for r in conn.execute(REPORTS_SQL, (manager,)))
+        if expected != sorted(index.reports(manager).tolist()):
+            return False
+    return [r[0] for r in conn.execute(CHAIN_SQL, (employee,))] == index.chain(employee)
+
+
+def run_benchmark(n_employees, n_updates, repeat):
+    print(f"\nScale: {n_employees:,} employees")
+    print("-" * 84)
+    conn = create_hr_database(n_employees)
+    conn.execute(MANAGER_INDEX)
+    table, salary = read_employees(conn)
+    build_time, index = _timed(lambda: HierarchyIndex.from_table(table))
+    height = int(index.depth[index.order[1:]].max()) + 1
+    print(f"Index build: {build_time * 1000:.0f}ms for a tree {height} levels deep "
+          f"({index.nbytes / 2 ** 20:.0f} MB of int64 arrays)")
+
+    managers = [m for m in (1, 10, 1_000, 100_000) if m in index]
+    deepest = int(index.order[1:][np.argmax(index.depth[index.order[1:]])])
+    print(f"\n{'Query':<40}{'WITH RECURSIVE':>16}{'Index':>12}{'Speedup':>10}")
+    for manager in managers:
+        headcount = index.headcount(manager)
+        cases = [
+            (f"reports under {manager} ({headcount:,})",
+             lambda: conn.execute(REPORTS_SQL, (manager,)).fetchall(),
+             lambda: index.reports(manager)),
+            (f"headcount, SUM(salary) under {manager}",
+             lambda: conn.execute(HEADCOUNT_SQL, (manager,)).fetchone(),
+             lambda: (index.headcount(manager), salary[index.reports(manager)].sum())),
+        ]
+        for label, recursive, indexed in cases:
+            sql_time, expected = _best(recursive, 1 if headcount > 10_000 else repeat)
+            index_time, actual = _best(indexed, repeat)
+            print(f"{label:<40}{sql_time * 1000:>14.2f}ms{index_time * 1000:>10.3f}ms"
+                  f"{sql_time / index_time:>9.0f}x {'✓' if _same(expected, actual) else '✗'}")
+    sql_time, expected = _best(lambda: [r[0] for r in conn.execute(CHAIN_SQL, (deepest,))],
+                               repeat)
+    index_time, actual = _best(lambda: index.chain(deepest), repeat)
+    print(f"{f'management chain of {deepest} ({len(actual)})':<40}{sql_time * 1000:>14.2f}ms"
+          f"{index_time * 1000:>10.3f}ms{sql_time / index_time:>9.0f}x "
+          f"{'✓' if expected == actual else '✗'}")
+    employees = index.order[1:]
+    index_time, above = _best(lambda: index.is_above(managers[-1], employees), repeat)
+    print(f"is {managers[-1]} above each employee?  {len(employees):,} O(1) checks in "
+          f"{index_time * 1000:.2f}ms ({int(above.sum()):,} true "
+          f"{'✓' if above.sum() == index.headcount(managers[-1]) else '✗'})")
+
+    updates = random_updates(index, n_updates, protected=set(managers) | {deepest})
+    update_time, applied = _timed(lambda: apply_to_index(index, updates))
+    rebuild_time, _ = _timed(lambda: HierarchyIndex.from_table(index.to_table()))
+    print(f"\n{len(applied):,} hires/transfers/departures applied incrementally in "
+          f"{update_time * 1000:.0f}ms ({update_time / len(applied) * 1000:.2f}ms each); "
+          f"one rebuild takes {rebuild_time * 1000:.0f}ms")
+    apply_to_sqlite(conn, applied)
+    print(f"{'✓' if index.consistent() else '✗'} maintained numbering equals a fresh build")
+    ok = check_against_sqlite(conn, index, managers, deepest)
+    print(f"{'✓' if ok else '✗'} reports and chains match WITH RECURSIVE after the same updates")
+    conn.close()
+
+
+def main():
+    """Compare interval-index hierarchy queries with recursive CTEs in SQLite"""
+    parser = argparse.ArgumentParser(description="Manager hierarchy interval index")
+    parser.add_argument('--employees', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--updates', type=int, default=1_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Manager hierarchy index")
+    print("=" * 84)
+    for n_employees in args.employees:
+        run_benchmark(n_employees, args.updates, args.repeat)
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
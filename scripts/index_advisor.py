@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for the Q5 & Q6 Example Workload
+Replays the SQLite-runnable queries from sql/ on scaled data, reads their
+EXPLAIN QUERY PLAN output, and tests candidate single-column and composite
+indexes derived from the JOIN/WHERE/GROUP BY/ORDER BY columns. Each candidate
+is ranked by measured workload speedup minus its write and storage cost, and
+the recommended set is printed as CREATE INDEX DDL.
+
+The hand-picked indexes from SECTION 8 of q5_join_examples.sql and SECTION 11
+of q6_groupby_examples.sql are always evaluated so they can be compared.
+"""
+
+import argparse
+import itertools
+import re
+import sqlite3
+import time
+
+from scaled_data import create_example_database
+from sql_workload import index_statements, runnable_queries
+
+CLAUSE_PATTERN = re.compile(
+    r'\b(ON|WHERE|GROUP BY|ORDER BY)\b(.*?)'
+    r'(?=\b(?:LEFT|RIGHT|INNER|FULL|CROSS|JOIN|WHERE|GROUP BY|HAVING|ORDER BY|UNION|LIMIT)\b|$)',
+    re.I)
+SOURCE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+KEYWORDS = {'LEFT', 'RIGHT', 'INNER', 'FULL', 'CROSS', 'JOIN', 'ON', 'WHERE',
+            'GROUP', 'ORDER', 'OUTER', 'UNION', 'AS', 'HAVING', 'LIMIT'}
+# Equality/join columns lead composite indexes, then grouping, then ordering
+CLAUSE_PRIORITY = {'ON': 0, 'WHERE': 0, 'GROUP BY': 1, 'ORDER BY': 2}
+
+
+class Candidate:
+    """One candidate index and its measured costs and benefits"""
+
+    def __init__(self, table, columns, source='derived'):
+        self.table = table
+        self.columns = tuple(columns)
+        self.source = source
+        self.create_seconds = 0.0
+        self.storage_bytes = 0
+        self.write_overhead = 0.0
+        self.saved_seconds = 0.0
+        self.baseline_seconds = 0.0
+        self.used_by = []
+        self.net_benefit = 0.0
+
+    @property
+    def name(self):
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def ddl(self):
+        return f"CREATE INDEX {self.name} ON {self.table}({', '.join(self.columns)});"
+
+
+def table_columns(conn):
+    """Indexable columns per table (the INTEGER PRIMARY KEY is already the rowid)"""
+    columns = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        columns[table] = [row[1] for row in info
+                          if not (row[5] == 1 and row[2].upper() == 'INTEGER')]
+    return columns
+
+
+def referenced_columns(sql, schema):
+    """Map table -> columns used in ON/WHERE/GROUP BY/ORDER BY, most selective clause first"""
+    aliases = {}
+    for table, alias in SOURCE_PATTERN.findall(sql):
+        if table in schema:
+            aliases[table] = table
+            if alias and alias.upper() not in KEYWORDS:
+                aliases[alias] = table
+    tables = set(aliases.values())
+
+    found = []
+    for clause, body in CLAUSE_PATTERN.findall(sql):
+        priority = CLAUSE_PRIORITY[' '.join(clause.upper().split())]
+        for match in re.finditer(r'(?:(\w+)\.)?(\w+)', body):
+            qualifier, column = match.groups()
+            if qualifier:
+                owners = [aliases[qualifier]] if qualifier in aliases else []
+            else:
+                owners = [t for t in tables if column in schema[t]]
+            if len(owners) == 1 and column in schema[owners[0]]:
+                found.append((priority, len(found), owners[0], column))
+
+    by_table = {}
+    for _, _, table, column in sorted(found):
+        columns = by_table.setdefault(table, [])
+        if column not in columns:
+            columns.append(column)
+    return by_table
+
+
+def derive_candidates(queries, schema):
+    """Single columns plus ordered pairs of the first three columns per query and table"""
+    candidates = {}
+    touches = {}
+    for query in queries:
+        for table, columns in referenced_columns(query.sql, schema).items():
+            touches.setdefault(table, []).append(query)
+            combos = [(c,) for c in columns] + list(itertools.combinations(columns[:3], 2))
+            for combo in combos:
+                candidates.setdefault((table, combo), Candidate(table, combo))
+    return candidates, touches
+
+
+def intuition_candidates(schema):
+    """The CREATE INDEX statements written by hand in the sql/ files"""
+    pattern = re.compile(r'CREATE INDEX (\w+) ON (\w+)\s*\(([^)]*)\)', re.I)
+    found = {}
+    for statement in index_statements():
+        match = pattern.match(statement.sql)
+        if not match:
+            continue
+        _, table, columns = match.groups()
+        columns = tuple(c.strip() for c in columns.split(','))
+        if table in schema and all(c in schema[table] for c in columns):
+            found[(table, columns)] = Candidate(table, columns, source=statement.label)
+    return found
+
+
+def run_query(conn, sql, budget):
+    """Execute and drain a query; None if it exceeds the time budget"""
+    deadline = time.perf_counter() + budget
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+    start = time.perf_counter()
+    try:
+        for _ in conn.execute(sql):
+            pass
+        return time.perf_counter() - start
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def best_time(conn, sql, repeat, budget):
+    times = [run_query(conn, sql, budget) for _ in range(repeat)]
+    return None if None in times else min(times)
+
+
+def insert_seconds(conn, table, schema, n_rows, repeat=3):
+    """Time inserting n_rows copies of existing rows, rolled back afterwards"""
+    columns = ', '.join(schema[table])
+    best = float('inf')
+    for _ in range(repeat):
+        conn.execute("BEGIN")
+        start = time.perf_counter()
+        conn.execute(f"INSERT INTO {table} ({columns}) "
+                     f"SELECT {columns} FROM {table} LIMIT {n_rows}")
+        best = min(best, time.perf_counter() - start)
+        conn.execute("ROLLBACK")
+    return best
+
+
+def database_bytes(conn):
+    """Bytes in use, excluding free pages left behind by dropped indexes"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (pages - free) * page_size
+
+
+def plan_uses(conn, sql, index_name):
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return any(index_name in row[-1] for row in plan)
+
+
+def evaluate(conn, candidate, queries, baseline, base_insert, schema, args):
+    """Build the index, measure every affected query and the write/storage cost, then drop it"""
+    before = database_bytes(conn)
+    start = time.perf_counter()
+    conn.execute(candidate.ddl)
+    candidate.create_seconds = time.perf_counter() - start
+    candidate.storage_bytes = database_bytes(conn) - before
+    try:
+        for query in queries:
+            if query.label not in baseline or not plan_uses(conn, query.sql, candidate.name):
+                continue
+            elapsed = best_time(conn, query.sql, args.repeat, args.budget)
+            if elapsed is not None:
+                candidate.saved_seconds += baseline[query.label] - elapsed
+                candidate.baseline_seconds += baseline[query.label]
+                candidate.used_by.append(query.label)
+        with_index = insert_seconds(conn, candidate.table, schema, args.write_rows)
+        candidate.write_overhead = max(0.0, with_index - base_insert[candidate.table])
+    finally:
+        conn.execute(f"DROP INDEX {candidate.name}")
+    storage_cost = candidate.storage_bytes / 2 ** 20 * args.storage_weight
+    candidate.net_benefit = (candidate.saved_seconds * args.runs_per_write
+                             - candidate.write_overhead - storage_cost)
+
+
+def recommend(ranked, min_gain):
+    """
+    Greedy pick of positive candidates.
+
+    A candidate must speed up the queries it is used by by at least min_gain
+    (a fraction) so timing noise is not mistaken for a win. Of two indexes on
+    the same table where one's columns are a prefix of the other's, only the
+    longer is kept: SQLite seeks (a, b) on a alone as well as on a and b, so
+    (a) adds nothing. (a, b) cannot seek on b alone.
+    """
+    chosen = []
+    for candidate in ranked:
+        if candidate.net_benefit <= 0 or not candidate.used_by:
+            continue
+        if candidate.saved_seconds < min_gain * candidate.baseline_seconds:
+            continue
+        if any(_is_prefix(candidate, c) for c in chosen):
+            continue
+        chosen = [c for c in chosen if not _is_prefix(c, candidate)]
+        chosen.append(candidate)
+    return chosen
+
+
+def _is_prefix(shorter, longer):
+    """True if shorter's columns lead longer's on the same table"""
+    n = len(shorter.columns)
+    return shorter.table == longer.table and longer.columns[:n] == shorter.columns
+
+
+def main():
+    """Rank candidate indexes for the example workload and print recommended DDL"""
+    parser = argparse.ArgumentParser(description="Index advisor for the example workload")
+    parser.add_argument('--sales', type=int, default=200_000)
+    parser.add_argument('--employees', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--budget', type=float, default=5.0,
+                        help="seconds before a query is dropped from the workload")
+    parser.add_argument('--write-rows', type=int, default=10_000,
+                        help="rows inserted to measure write overhead")
+    parser.add_argument('--runs-per-write', type=float, default=1.0,
+                        help="workload executions per write batch")
+    parser.add_argument('--storage-weight', type=float, default=0.01,
+                        help="cost in seconds charged per MB of index")
+    parser.add_argument('--min-gain', type=float, default=0.05,
+                        help="minimum fractional speedup of the queries an index is used by")
+    parser.add_argument('--output', help="write the recommended DDL to this file")
+    args = parser.parse_args()
+
+    print("Index advisor")
+    print("=" * 96)
+    conn = create_example_database(args.sales, args.employees)
+    conn.isolation_level = None
+    schema = table_columns(conn)
+
+    queries = runnable_queries(conn)
+    baseline = {}
+    for query in queries:
+        elapsed = best_time(conn, query.sql, args.repeat, args.budget)
+        if elapsed is not None:
+            baseline[query.label] = elapsed
+    print(f"Workload: {len(baseline)} runnable queries "
+          f"({len(queries) - len(baseline)} over the {args.budget:.0f}s budget), "
+          f"{sum(baseline.values()):.3f}s total")
+
+    candidates, touches = derive_candidates(queries, schema)
+    candidates.update(intuition_candidates(schema))
+    base_insert = {table: insert_seconds(conn, table, schema, args.write_rows)
+                   for table in touches}
+    for candidate in candidates.values():
+        evaluate(conn, candidate, touches.get(candidate.table, []), baseline,
+                 base_insert, schema, args)
+
+    ranked = sorted(candidates.values(), key=lambda c: c.net_benefit, reverse=True)
+    print(f"\n{'Candidate':<44}{'Saved':>9}{'Write+':>9}{'Size':>9}{'Net':>9}{'Used':>6}  Source")
+    print("-" * 96)
+    for c in ranked:
+        print(f"{c.name:<44}{c.saved_seconds:>8.3f}s{c.write_overhead:>8.3f}s"
+              f"{c.storage_bytes / 2 ** 20:>7.1f}MB{c.net_benefit:>8.3f}s{len(c.used_by):>6}  {c.source}")
+
+    chosen = recommend(ranked, args.min_gain)
+    ddl = '\n'.join(c.ddl for c in chosen)
+    print("\nRecommended indexes:")
+    print(ddl or "-- none: no candidate pays for its write and storage cost")
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(ddl + '\n')
+        print(f"✓ DDL written to {args.output}")
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Columnar Equi-Join Engine for Q5
+Vectorized versions of the three algorithms discussed in section 5.3 of the
+report. Each operator takes the join key columns of two inputs and returns
+matching (left_row, right_row) index pairs; NULL keys never match, because
+NULL = NULL is UNKNOWN (SECTION 6 of q5_join_examples.sql).
+
+- nested_loop_join: compares blocks of left keys against every right key
+- hash_join: groups the build side by key once, then probes it
+- merge_join: sorts both sides (unless already sorted) and merges ranges
+
+Intermediate results are kept as row-index arrays per relation (late
+materialization) so multi-way joins only gather the columns they need.
+Dictionary-encoded string keys are joined on their integer codes. Operators
+report EXPLAIN ANALYZE counters through operator_stats when collection is on.
+"""
+
+import numpy as np
+
+from columnar import Column, DictionaryColumn
+from operator_stats import bucket_collisions, nbytes, operator, search_comparisons, sort_comparisons
+
+ALGORITHMS = ('nested_loop', 'hash', 'merge')
+
+
+def _non_null(column):
+    rows = np.flatnonzero(column.valid)
+    return rows, column.values[rows]
+
+
+def _expand(probe_rows, starts, counts, build_rows):
+    """Turn per-probe-row match ranges into flat (probe, build) index pairs"""
+    total = int(counts.sum())
+    probe_out = np.repeat(probe_rows, counts)
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    build_out = build_rows[np.arange(total) + offsets]
+    return probe_out, build_out
+
+
+def nested_loop_join(left, right, block_size=2048):
+    """Block nested loop: every left key compared with every right key"""
+    with operator('NestedLoopJoin') as op:
+        left_rows, left_keys = _non_null(left)
+        right_rows, right_keys = _non_null(right)
+        left_parts, right_parts = [], []
+        for start in range(0, len(left_keys), block_size):
+            block = left_keys[start:start + block_size]
+            li, ri = np.nonzero(block[:, None] == right_keys[None, :])
+            left_parts.append(left_rows[start + li])
+            right_parts.append(right_rows[ri])
+        if left_parts:
+            left_out, right_out = np.concatenate(left_parts), np.concatenate(right_parts)
+        else:
+            left_out, right_out = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        op.count(rows_in=len(left) + len(right), rows_out=len(left_out),
+                 comparisons=len(left_keys) * len(right_keys), bytes=nbytes(left_out, right_out))
+        return left_out, right_out
+
+
+def hash_join(left, right, build='right'):
+    """Build a key -> rows table on one side, probe it with the other"""
+    if build == 'left':
+        right_out, left_out = hash_join(right, left, build='right')
+        return left_out, right_out
+    with operator('HashJoin'):
+        probe_rows, probe_keys = _non_null(left)
+        build_rows, build_keys = _non_null(right)
+        # Build: bucket the build rows by distinct key (CSR layout)
+        with operator('HashBuild') as op:
+            if len(build_keys) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            uniques, bucket = np.unique(build_keys, return_inverse=True)
+            order = np.argsort(bucket, kind='stable')
+            bucket_sizes = np.bincount(bucket, minlength=len(uniques))
+            bucket_starts = np.cumsum(bucket_sizes) - bucket_sizes
+            if op.enabled:
+                op.count(rows_in=len(right), rows_out=len(uniques),
+                         collisions=bucket_collisions(uniques),
+                         comparisons=sort_comparisons(len(build_keys)),
+                         bytes=nbytes(uniques, bucket, order, bucket_sizes, bucket_starts))
+        # Probe: look up each probe key's bucket
+        with operator('HashProbe') as op:
+            slot = np.minimum(np.searchsorted(uniques, probe_keys), len(uniques) - 1)
+            counts = np.where(uniques[slot] == probe_keys, bucket_sizes[slot], 0)
+            left_out, right_out = _expand(probe_rows, bucket_starts[slot], counts,
+                                          build_rows[order])
+            op.count(rows_in=len(left), rows_out=len(left_out),
+                     comparisons=search_comparisons(len(probe_keys), len(uniques)),
+                     bytes=nbytes(slot, counts, left_out, right_out))
+        return left_out, right_out
+
+
+def merge_join(left, right, left_sorted=False, right_sorted=False):
+    """Sort-merge join; pass *_sorted=True to skip the sort of an ordered input"""
+    with operator('MergeJoin'):
+        left_rows, left_keys = _non_null(left)
+        right_rows, right_keys = _non_null(right)
+        if not left_sorted:
+            left_rows, left_keys = _sort_rows(left_rows, left_keys, 'left')
+        if not right_sorted:
+            right_rows, right_keys = _sort_rows(right_rows, right_keys, 'right')
+        with operator('Merge') as op:
+            starts = np.searchsorted(right_keys, left_keys, side='left')
+            counts = np.searchsorted(right_keys, left_keys, side='right') - starts
+            left_out, right_out = _expand(left_rows, starts, counts, right_rows)
+            op.count(rows_in=len(left_keys) + len(right_keys), rows_out=len(left_out),
+                     comparisons=2 * search_comparisons(len(left_keys), len(right_keys)),
+                     bytes=nbytes(starts, counts, left_out, right_out))
+        return left_out, right_out
+
+
+def _sort_rows(rows, keys, side):
+    with operator('Sort', side) as op:
+        order = np.argsort(keys, kind='stable')
+        rows, keys = rows[order], keys[order]
+        op.count(rows_in=len(keys), rows_out=len(keys), comparisons=sort_comparisons(len(keys)),
+                 bytes=nbytes(order, rows, keys))
+        return rows, keys
+
+
+def _code_keys(left, right):
+    """Integer join keys for dictionary-encoded inputs, in the left dictionary's code space"""
+    if not isinstance(left, DictionaryColumn):
+        right_keys, left_keys = _code_keys(right, left)
+        return left_keys, right_keys
+    if not isinstance(right, DictionaryColumn):
+        codes = _lookup(left.dictionary, right.values)
+    elif right.dictionary is left.dictionary:
+        codes = right.codes
+    else:
+        codes = right.recode(left.dictionary)
+    # A value missing from the left dictionary cannot match, just like NULL
+    return Column(left.codes, left.valid), Column(codes, right.valid & (codes >= 0))
+
+
+def _lookup(dictionary, values):
+    """Codes of plain values in a sorted dictionary, -1 where a value is missing"""
+    if len(dictionary) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    position = np.minimum(np.searchsorted(dictionary, values), len(dictionary) - 1)
+    return np.where(dictionary[position] == values, position, -1)
+
+
+def equi_join(left, right, algorithm='hash', **options):
+    """Dispatch to one of the physical join algorithms"""
+    if isinstance(left, DictionaryColumn) or isinstance(right, DictionaryColumn):
+        left, right = _code_keys(left, right)
+    if algorithm == 'nested_loop':
+        return nested_loop_join(left, right)
+    if algorithm == 'hash':
+        return hash_join(left, right, **options)
+    if algorithm == 'merge':
+        return merge_join(left, right, **options)
+    raise ValueError(f"Unknown join algorithm: {algorithm}")
+
+
+class JoinResult:
+    """Row-index arrays per relation alias; columns are gathered on demand"""
+
+    def __init__(self, relations, indices):
+        self.relations = relations
+        self.indices = indices
+
+    @classmethod
+    def scan(cls, relations, alias, rows=None):
+        table = relations[alias]
+        with operator('Scan', alias) as op:
+            n_rows = len(next(iter(table.values())))
+            if rows is None:
+                rows = np.arange(n_rows, dtype=np.int64)
+            op.count(rows_in=n_rows, rows_out=len(rows), bytes=rows.nbytes)
+        return cls(relations, {alias: rows})
+
+    def __len__(self):
+        return len(next(iter(self.indices.values())))
+
+    def column(self, ref):
+        """Gather 'alias.column' for every result row"""
+        alias, name = ref.split('.')
+        return self.relations[alias][name].take(self.indices[alias])
+
+    def combine(self, other, left_pos, right_pos):
+        indices = {a: rows[left_pos] for a, rows in self.indices.items()}
+        indices.update({a: rows[right_pos] for a, rows in other.indices.items()})
+        return JoinResult(self.relations, indices)
+
+    def filter(self, mask):
+        return JoinResult(self.relations, {a: rows[mask] for a, rows in self.indices.items()})
+
+    def materialize(self, refs):
+        """Build an output table of the requested 'alias.column' references"""
+        with operator('Project', ', '.join(refs)) as op:
+            table = {ref: self.column(ref) for ref in refs}
+            op.count(rows_in=len(self), rows_out=len(self),
+                     bytes=sum(nbytes(c.values, c.valid) for c in table.values()))
+            return table
+
+
+def join_results(left, right, conditions, algorithm='hash', **options):
+    """
+    Join two JoinResults on a list of (left_ref, right_ref) equality conditions.
+
+    The first condition drives the physical join; the rest are applied as
+    residual filters on the matched pairs.
+    """
+    first_left, first_right = conditions[0]
+    with operator('Join', f'{first_left} = {first_right}') as op:
+        left_pos, right_pos = equi_join(left.column(first_left), right.column(first_right),
+                                        algorithm, **options)
+        joined = left.combine(right, left_pos, right_pos)
+        op.count(rows_in=len(left) + len(right), rows_out=len(joined))
+    for left_ref, right_ref in conditions[1:]:
+        with operator('Filter', f'{left_ref} = {right_ref}') as op:
+            a, b = joined.column(left_ref), joined.column(right_ref)
+            rows_in = len(joined)
+            joined = joined.filter(a.valid & b.valid & (a.values == b.values))
+            op.count(rows_in=rows_in, rows_out=len(joined), comparisons=rows_in)
+    return joined
+
+
+def check_null_semantics():
+    """The SECTION 1 and SECTION 6 examples: Eve (NULL dept) and Frank (dept 40) do not join"""
+    employees = {'dept_id': Column.from_list([10, 20, 10, 30, None, 40])}
+    departments = {'dept_id': Column.from_list([10, 20, 30, 50])}
+    for algorithm in ALGORITHMS:
+        left, right = equi_join(employees['dept_id'], departments['dept_id'], algorithm)
+        assert sorted(zip(left.tolist(), right.tolist())) == [(0, 0), (1, 1), (2, 0), (3, 2)]
+        # Self-join on dept_id: NULL = NULL is not TRUE, so Eve never pairs with herself
+        left, right = equi_join(employees['dept_id'], employees['dept_id'], algorithm)
+        assert 4 not in left.tolist() and len(left) == 7
+
+
+def main():
+    """Check that all three algorithms follow SQL NULL semantics"""
+    check_null_semantics()
+    print("✓ nested loop, hash and merge joins agree on the SECTION 1 / SECTION 6 examples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Cost-Based Join-Order Optimizer for the Q5 Join Engine
+A small Selinger-style dynamic program over subsets of relations. For every
+connected subset it keeps the cheapest plan, choosing both the join order
+(bushy trees allowed) and the physical algorithm from join_engine.py:
+nested loop, hash (building on the smaller input) or merge (skipping the sort
+of inputs already ordered on the key).
+
+Cardinalities use the textbook estimate |R join S| = |R| |S| / max(NDV) per
+equivalence class of join columns, discounted by NULL fractions because NULL
+keys never match. Equivalence classes also add implied predicates, e.g.
+e.dept_id = d.dept_id AND d.dept_id = p.dept_id lets e join p directly.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from join_engine import JoinResult, join_results
+from scaled_data import (generate_customers, generate_departments, generate_employees,
+                         generate_products, generate_projects, generate_sales)
+
+# Cost model constants: nanoseconds per element, calibrated against join_engine's operators
+SORT_COST = 5.0
+NESTED_LOOP_PAIR_COST = 5.5
+PROBE_COST = 10.0
+MERGE_STEP_COST = 16.0
+OUTPUT_COST = 40.0
+GATHER_COST = 5.0
+
+
+class ColumnStats:
+    """Row count, distinct count and NULL fraction of one column"""
+
+    def __init__(self, column):
+        present = column.values[column.valid]
+        self.rows = len(column)
+        self.ndv = max(1, len(np.unique(present)))
+        self.null_fraction = 1 - len(present) / self.rows if self.rows else 0.0
+        self.is_sorted = bool(len(present) == self.rows
+                              and np.all(present[1:] >= present[:-1]))
+
+
+class PlanNode:
+    """A scan of one relation or a join of two sub-plans"""
+
+    def __init__(self, aliases, rows, cost, sorted_on=(), left=None, right=None,
+                 algorithm=None, conditions=(), options=None):
+        self.aliases = aliases
+        self.rows = rows
+        self.cost = cost
+        self.sorted_on = frozenset(sorted_on)
+        self.left = left
+        self.right = right
+        self.algorithm = algorithm
+        self.conditions = list(conditions)
+        self.options = options or {}
+
+    @property
+    def is_scan(self):
+        return self.left is None
+
+    def describe(self, indent=0):
+        pad = '  ' * indent
+        if self.is_scan:
+            return f"{pad}SCAN {next(iter(self.aliases))} (~{self.rows:,.0f} rows)"
+        on = ' AND '.join(f"{a} = {b}" for a, b in self.conditions)
+        lines = [f"{pad}{self.algorithm.upper()} JOIN ON {on} (~{self.rows:,.0f} rows, "
+                 f"cost {self.cost / 1e6:,.1f})"]
+        lines.append(self.left.describe(indent + 1))
+        lines.append(self.right.describe(indent + 1))
+        return '\n'.join(lines)
+
+
+class JoinQuery:
+    """Relations (alias -> table), equality predicates and per-relation filters"""
+
+    def __init__(self, relations, predicates, filters=None):
+        self.aliases = list(relations)
+        filters = filters or {}
+        self.base_rows = {}
+        self.relations = {}
+        for alias, table in relations.items():
+            if alias in filters:
+                rows = np.flatnonzero(filters[alias](table))
+                table = {name: column.take(rows) for name, column in table.items()}
+            self.relations[alias] = table
+        self.classes = self._equivalence_classes(predicates)
+        self.stats = {ref: ColumnStats(self.column(ref)) for cls in self.classes for ref in cls}
+
+    def column(self, ref):
+        alias, name = ref.split('.')
+        return self.relations[alias][name]
+
+    def rows(self, alias):
+        return len(next(iter(self.relations[alias].values())))
+
+    @staticmethod
+    def _equivalence_classes(predicates):
+        parent = {}
+
+        def find(ref):
+            parent.setdefault(ref, ref)
+            while parent[ref] != ref:
+                parent[ref] = parent[parent[ref]]
+                ref = parent[ref]
+            return ref
+
+        for a, b in predicates:
+            parent[find(a)] = find(b)
+        classes = {}
+        for ref in list(parent):
+            classes.setdefault(find(ref), []).append(ref)
+        return [sorted(members) for members in classes.values()]
+
+    def conditions(self, left_aliases, right_aliases):
+        """One equality per equivalence class that spans both sides"""
+        found = []
+        for members in self.classes:
+            left = [m for m in members if m.split('.')[0] in left_aliases]
+            right = [m for m in members if m.split('.')[0] in right_aliases]
+            if left and right:
+                found.append((left[0], right[0]))
+        return found
+
+    def cardinality(self, aliases):
+        """Estimated rows of joining every relation in aliases"""
+        rows = math.prod(self.rows(a) for a in aliases)
+        for members in self.classes:
+            present = [self.stats[m] for m in members if m.split('.')[0] in aliases]
+            if len(present) < 2:
+                continue
+            ndvs = sorted(s.ndv for s in present)
+            for ndv in ndvs[1:]:
+                rows /= ndv
+            for s in present:
+                rows *= 1 - s.null_fraction
+        return max(rows, 1.0)
+
+
+def _sort_cost(rows):
+    return SORT_COST * rows * math.log2(rows + 2)
+
+
+def join_cost(query, left, right, conditions, algorithm, out_rows):
+    """Cost of joining two sub-plans with one algorithm, plus its output properties"""
+    l, r = left.rows, right.rows
+    left_key, right_key = conditions[0]
+    options = {}
+    sorted_on = set()
+    if algorithm == 'nested_loop':
+        cost = NESTED_LOOP_PAIR_COST * l * r
+        sorted_on = set(left.sorted_on)
+    elif algorithm == 'hash':
+        build, probe = (r, l) if r <= l else (l, r)
+        options['build'] = 'right' if r <= l else 'left'
+        ndv = query.stats[right_key if r <= l else left_key].ndv
+        cost = _sort_cost(build) + PROBE_COST * probe * math.log2(min(ndv, build) + 2)
+        sorted_on = set((left if r <= l else right).sorted_on)
+    else:
+        options['left_sorted'] = left_key in left.sorted_on
+        options['right_sorted'] = right_key in right.sorted_on
+        cost = (0 if options['left_sorted'] else _sort_cost(l)) \
+            + (0 if options['right_sorted'] else _sort_cost(r)) \
+            + MERGE_STEP_COST * l * math.log2(r + 2)
+        members = next(m for m in query.classes if left_key in m)
+        sorted_on = set(members)
+    n_aliases = len(left.aliases) + len(right.aliases)
+    cost += OUTPUT_COST * out_rows + GATHER_COST * out_rows * n_aliases
+    return cost, options, sorted_on
+
+
+def _scan(query, alias):
+    sorted_on = [ref for cls in query.classes for ref in cls
+                 if ref.split('.')[0] == alias and query.stats[ref].is_sorted]
+    return PlanNode(frozenset([alias]), float(query.rows(alias)), 0.0, sorted_on)
+
+
+def _best_join(query, left, right, algorithms):
+    conditions = query.conditions(left.aliases, right.aliases)
+    if not conditions:
+        return None
+    aliases = left.aliases | right.aliases
+    out_rows = query.cardinality(aliases)
+    best = None
+    for algorithm in algorithms:
+        cost, options, sorted_on = join_cost(query, left, right, conditions, algorithm, out_rows)
+        total = left.cost + right.cost + cost
+        if best is None or total < best.cost:
+            best = PlanNode(aliases, out_rows, total, sorted_on, left, right,
+                            algorithm, conditions, options)
+    return best
+
+
+def optimize(query, algorithms=('nested_loop', 'hash', 'merge')):
+    """Dynamic programming over connected subsets; returns the cheapest full plan"""
+    aliases = query.aliases
+    best = {1 << i: _scan(query, alias) for i, alias in enumerate(aliases)}
+    full = (1 << len(aliases)) - 1
+    for mask in sorted(range(1, full + 1), key=lambda m: bin(m).count('1')):
+        if mask in best:
+            continue
+        sub = (mask - 1) & mask
+        while sub:
+            other = mask ^ sub
+            if sub in best and other in best:
+                candidate = _best_join(query, best[sub], best[other], algorithms)
+                if candidate and (mask not in best or candidate.cost < best[mask].cost):
+                    best[mask] = candidate
+            sub = (sub - 1) & mask
+    if full not in best:
+        raise ValueError("Join graph is disconnected; cross products are not planned")
+    return best[full]
+
+
+def textual_plan(query, algorithm='hash'):
+    """Left-deep plan in the order the relations are written, building on each new table"""
+    plan = _scan(query, query.aliases[0])
+    for alias in query.aliases[1:]:
+        right = _scan(query, alias)
+        conditions = query.conditions(plan.aliases, right.aliases)
+        if not conditions:
+            raise ValueError(f"{alias} has no join condition with the preceding tables")
+        aliases = plan.aliases | right.aliases
+        out_rows = query.cardinality(aliases)
+        cost, _, sorted_on = join_cost(query, plan, right, conditions, algorithm, out_rows)
+        options = {'build': 'right'} if algorithm == 'hash' else {}
+        plan = PlanNode(aliases, out_rows, plan.cost + cost, sorted_on, plan, right,
+                        algorithm, conditions, options)
+    return plan
+
+
+def execute(query, plan):
+    """Run a plan bottom-up, returning a JoinResult of row indices per alias"""
+    if plan.is_scan:
+        return JoinResult.scan(query.relations, next(iter(plan.aliases)))
+    left = execute(query, plan.left)
+    right = execute(query, plan.right)
+    return join_results(left, right, plan.conditions, plan.algorithm, **plan.options)
+
+
+# ----------------------------------------------------------------------------
+# Benchmark on skewed synthetic data
+# ----------------------------------------------------------------------------
+
+def _fingerprint(result, query):
+    """Order-independent summary of a join result for cross-checking plans"""
+    return len(result), tuple(int(result.indices[a].sum()) for a in query.aliases)
+
+
+def benchmark_queries(n_employees, n_sales, skew):
+    n_departments = max(4, n_employees // 500)
+    employees = generate_employees(n_employees, n_departments, skew=skew)
+    departments = generate_departments(n_departments)
+    projects = generate_projects(n_departments * 5, n_departments, skew=skew)
+    sales = generate_sales(n_sales)
+    customers = generate_customers()
+    products = generate_products()
+
+    boston = {'d': lambda t: t['location'].valid & (t['location'].values == 'Boston')}
+    garden = {'p': lambda t: t['category'].values == 'Garden',
+              'c': lambda t: ~t['email'].valid}
+    return [
+        ("SECTION 1 order: e, d, p",
+         JoinQuery({'e': employees, 'd': departments, 'p': projects},
+                   [('e.dept_id', 'd.dept_id'), ('d.dept_id', 'p.dept_id')], boston)),
+        ("Projects first: e, p, d",
+         JoinQuery({'e': employees, 'p': projects, 'd': departments},
+                   [('e.dept_id', 'p.dept_id'), ('p.dept_id', 'd.dept_id')], boston)),
+        ("SECTION 10 style: s, c, p",
+         JoinQuery({'s': sales, 'c': customers, 'p': products},
+                   [('s.customer_id', 'c.customer_id'), ('s.product_id', 'p.product_id')],
+                   garden)),
+    ]
+
+
+def _timed_execute(query, plan, repeat):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = execute(query, plan)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    """Compare optimized plans with textual join order on skewed data"""
+    parser = argparse.ArgumentParser(description="Cost-based join-order optimizer")
+    parser.add_argument('--employees', type=int, default=200_000)
+    parser.add_argument('--sales', type=int, default=1_000_000)
+    parser.add_argument('--skew', type=float, default=1.2,
+                        help="Zipf exponent for department sizes (0 = uniform)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Join-order optimizer")
+    print("=" * 78)
+    for label, query in benchmark_queries(args.employees, args.sales, args.skew):
+        start = time.perf_counter()
+        optimized = optimize(query)
+        planning = time.perf_counter() - start
+        textual = textual_plan(query)
+        textual_time, textual_result = _timed_execute(query, textual, args.repeat)
+        optimized_time, optimized_result = _timed_execute(query, optimized, args.repeat)
+        match = _fingerprint(textual_result, query) == _fingerprint(optimized_result, query)
+        print(f"\n{label}  (planning {planning * 1000:.1f} ms)")
+        print("-" * 78)
+        print("Textual order:")
+        print(textual.describe(1))
+        print("Optimized:")
+        print(optimized.describe(1))
+        print(f"Textual {textual_time:.3f}s | Optimized {optimized_time:.3f}s | "
+              f"Speedup {textual_time / optimized_time:.1f}x | "
+              f"Rows {len(optimized_result):,} (estimated {optimized.rows:,.0f}) "
+              f"{'✓' if match else '✗'}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Concurrent Workload Driver for the Q5 & Q6 Queries
+Single-shot timings say nothing about many clients at once. This driver
+replays a weighted mix of the runnable sql/ example queries, point lookups
+and small writes from N closed-loop client threads that share a fixed pool
+of SQLite connections in WAL mode, and reports per concurrency level:
+
+- throughput (operations per second)
+- p50 / p95 / p99 latency, overall and for writes, measured from request
+  to result so time spent waiting for a pooled connection is included
+- p99 wait for a pooled connection once clients outnumber connections
+- busy retries per write: writes open with BEGIN IMMEDIATE and a zero busy
+  timeout, so every time another writer holds the lock is counted and
+  retried with a short backoff instead of hiding inside SQLite
+
+Python's sqlite3 releases the GIL while a statement runs, so threads give
+real concurrency inside SQLite. WAL lets readers proceed while one writer
+commits; the report shows the concurrency at which writers start to queue.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from scaled_data import create_example_database
+from sql_workload import runnable_queries
+
+# Share of operations per class; each class's share is split evenly over its statements
+MIXES = {
+    'read-mostly': {'q5': 0.35, 'q6': 0.35, 'lookup': 0.2, 'write': 0.1},
+    'write-heavy': {'q5': 0.1, 'q6': 0.1, 'lookup': 0.2, 'write': 0.6},
+}
+LOOKUPS = [
+    "SELECT name, salary, dept_id FROM employees WHERE employee_id = ?",
+    "SELECT product_id, quantity, unit_price FROM sales WHERE sale_id = ?",
+]
+WRITES = [
+    "INSERT INTO sales (product_id, customer_id, sale_date, quantity, unit_price, discount, "
+    "region) VALUES (101, ?, '2024-06-01', 2, 19.99, NULL, 'North')",
+    "UPDATE employees SET salary = salary + 1 WHERE employee_id = ?",
+]
+BACKOFF_SECONDS = 0.0005
+
+
+class _Waiter:
+    def __init__(self):
+        self.ready = threading.Event()
+        self.conn = None
+
+
+class ConnectionPool:
+    """
+    A fixed set of WAL connections, handed out first come, first served.
+
+    A released connection goes straight to the longest-waiting client. With a
+    plain queue.Queue the releasing thread, which still holds the GIL, usually
+    takes the connection straight back and starves the waiters (p99 pool waits
+    near the full run time once clients outnumber connections).
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._waiters = deque()
+        for _ in range(size):
+            # Autocommit (isolation_level=None) and no busy timeout: lock waits stay visible
+            conn = sqlite3.connect(path, timeout=0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._idle.append(conn)
+
+    def acquire(self):
+        with self._lock:
+            if self._idle and not self._waiters:
+                return self._idle.pop()
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+        waiter.ready.wait()
+        return waiter.conn
+
+    def release(self, conn):
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.ready.set()
+            else:
+                self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self.acquire().close()
+
+
+class Operation:
+    def __init__(self, kind, sql, weight, max_id=None):
+        self.kind = kind
+        self.sql = sql
+        self.weight = weight
+        self.max_id = max_id
+
+    def run(self, conn, rng):
+        """Execute once; returns the number of busy retries"""
+        params = (rng.randint(1, self.max_id),) if self.max_id else ()
+        retries = 0
+        while True:
+            try:
+                if self.kind == 'write':
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        conn.execute(self.sql, params)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                else:
+                    conn.execute(self.sql, params).fetchall()
+                return retries
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error) and 'busy' not in str(error):
+                    raise
+                retries += 1
+                time.sleep(BACKOFF_SECONDS * min(retries, 20))
+
+
+def workload_statements(conn, n_employees, n_sales, max_query_ms):
+    """(kind, sql, max_id) per class; example queries slower than max_query_ms are left out"""
+    groups = {'q5': [], 'q6': [], 'lookup': [], 'write': []}
+    for statement in runnable_queries(conn):
+        start = time.perf_counter()
+        conn.execute(statement.sql).fetchall()
+        if (time.perf_counter() - start) * 1000 <= max_query_ms:
+            groups[statement.source].append((statement.sql, None))
+    groups['lookup'] = [(LOOKUPS[0], n_employees), (LOOKUPS[1], n_sales)]
+    groups['write'] = [(WRITES[0], 10_000), (WRITES[1], n_employees)]
+    return groups
+
+
+def build_mix(groups, mix):
+    """Weighted operations for one mix"""
+    return [Operation(kind, sql, share / len(groups[kind]), max_id)
+            for kind, share in mix.items() for sql, max_id in groups[kind]]
+
+
+def run_level(pool, operations, n_clients, seconds, seed):
+    """Closed-loop clients for a fixed duration; returns per-operation samples"""
+    samples = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(n_clients + 1)
+    stop = threading.Event()
+    weights = [op.weight for op in operations]
+
+    def client(client_id):
+        rng = random.Random(seed * 1000 + client_id)
+        local = []
+        start_barrier.wait()
+        for operation in itertools.cycle(rng.choices(operations, weights, k=4096)):
+            if stop.is_set():
+                break
+            requested = time.perf_counter()
+            with pool.connection() as conn:
+                acquired = time.perf_counter()
+                retries = operation.run(conn, rng)
+            local.append((operation.kind == 'write', time.perf_counter() - requested,
+                          acquired - requested, retries))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    began = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - began
+
+
+def summarize(samples, elapsed):
+    is_write = np.array([s[0] for s in samples], dtype=bool)
+    latency = np.array([s[1] for s in samples]) * 1000
+    wait = np.array([s[2] for s in samples]) * 1000
+    retries = np.array([s[3] for s in samples])
+    p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+    writes = latency[is_write]
+    return {
+        'throughput': len(samples) / elapsed,
+        'p50': p50, 'p95': p95, 'p99': p99,
+        'write_p99': float(np.percentile(writes, 99)) if len(writes) else 0.0,
+        'wait_p99': float(np.percentile(wait, 99)),
+        'retries_per_write': float(retries[is_write].mean()) if len(writes) else 0.0,
+        'retried_writes': float((retries[is_write] > 0).mean()) if len(writes) else 0.0,
+    }
+
+
+def main():
+    """Sweep client concurrency over a pooled WAL database and report latency percentiles"""
+    parser = argparse.ArgumentParser(description="Concurrent Q5/Q6 workload driver")
+    parser.add_argument('--sales', type=int, default=20_000)
+    parser.add_argument('--employees', type=int, default=2_000)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--pool', type=int, default=8, help="pooled connections")
+    parser.add_argument('--seconds', type=float, default=1.5, help="duration per level")
+    parser.add_argument('--max-query-ms', type=float, default=50.0)
+    parser.add_argument('--mix', choices=sorted(MIXES), nargs='+', default=list(MIXES))
+    parser.add_argument('--contention', type=float, default=0.01,
+                        help="share of writes that must hit a busy lock to call it contention")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'load.db')
+    setup = create_example_database(args.sales, args.employees, path)
+    setup.execute("PRAGMA journal_mode=WAL")
+    groups = workload_statements(setup, args.employees, args.sales, args.max_query_ms)
+    setup.close()
+    pool = ConnectionPool(path, args.pool)
+
+    print("Concurrent workload driver")
+    print("=" * 110)
+    print(f"{len(groups['q5'])} q5 and {len(groups['q6'])} q6 example queries under "
+          f"{args.max_query_ms:.0f}ms, point lookups and writes; {args.pool} pooled WAL "
+          f"connections, {os.cpu_count()} CPU(s)")
+    for name in args.mix:
+        mix = MIXES[name]
+        operations = build_mix(groups, mix)
+        print(f"\n{name}: {', '.join(f'{share:.0%} {kind}' for kind, share in mix.items())}")
+        print(f"{'Clients':>8}{'Ops/s':>10}{'p50':>11}{'p95':>11}{'p99':>11}{'Write p99':>12}"
+              f"{'Pool wait p99':>15}{'Busy/write':>12}{'Retried':>9}")
+        print("-" * 110)
+        contention_at = None
+        for n_clients in args.clients:
+            samples, elapsed = run_level(pool, operations, n_clients, args.seconds, args.seed)
+            s = summarize(samples, elapsed)
+            print(f"{n_clients:>8}{s['throughput']:>10.0f}{s['p50']:>9.2f}ms{s['p95']:>9.2f}ms"
+                  f"{s['p99']:>9.2f}ms{s['write_p99']:>10.2f}ms{s['wait_p99']:>13.2f}ms"
+                  f"{s['retries_per_write']:>12.2f}{s['retried_writes']:>9.1%}")
+            if contention_at is None and s['retried_writes'] >= args.contention:
+                contention_at = n_clients
+        if contention_at is None:
+            print(f"No writer contention up to {max(args.clients)} clients "
+                  f"(fewer than {args.contention:.0%} of writes found the write lock held)")
+        else:
+            print(f"Writer contention begins at {contention_at} clients: "
+                  f"{args.contention:.0%}+ of writes found the write lock held")
+    pool.close()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+    print("=" * 110)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Incrementally Maintained v_regional_sales for SQLite
+SECTION 11 of q6_groupby_examples.sql defines v_regional_sales as a SQL Server
+indexed view. This script builds a portable equivalent: a summary table kept
+up to date by AFTER INSERT/UPDATE/DELETE triggers on sales, exposed through a
+view with the same columns.
+
+NULL semantics are preserved by keeping a non-NULL count next to every SUM:
+SUM(quantity) is NULL for a group whose quantities are all NULL, and a group
+disappears when its last sale is deleted.
+"""
+
+import argparse
+import math
+import sqlite3
+import time
+
+from groupby_engine import rows_match
+from scaled_data import create_sales_database
+
+SUMMARY_DDL = """
+CREATE TABLE mv_regional_sales (
+    region TEXT,
+    product_id INTEGER,
+    sales_count INTEGER NOT NULL,
+    total_quantity INTEGER NOT NULL,
+    quantity_count INTEGER NOT NULL,
+    total_revenue REAL NOT NULL,
+    revenue_count INTEGER NOT NULL
+);
+CREATE INDEX idx_mv_regional_sales ON mv_regional_sales(region, product_id);
+CREATE VIEW v_regional_sales AS
+SELECT
+    region,
+    product_id,
+    sales_count,
+    CASE WHEN quantity_count > 0 THEN total_quantity END AS total_quantity,
+    CASE WHEN revenue_count > 0 THEN total_revenue END AS total_revenue
+FROM mv_regional_sales;
+"""
+
+# Groups are matched with IS so a NULL region or product_id is still one group
+_ADD_ROW = """
+    UPDATE mv_regional_sales SET
+        sales_count = sales_count + 1,
+        total_quantity = total_quantity + COALESCE(NEW.quantity, 0),
+        quantity_count = quantity_count + (NEW.quantity IS NOT NULL),
+        total_revenue = total_revenue + COALESCE(NEW.quantity * NEW.unit_price, 0),
+        revenue_count = revenue_count + (NEW.quantity * NEW.unit_price IS NOT NULL)
+    WHERE region IS NEW.region AND product_id IS NEW.product_id;
+    INSERT INTO mv_regional_sales
+    SELECT NEW.region, NEW.product_id, 1,
+           COALESCE(NEW.quantity, 0), NEW.quantity IS NOT NULL,
+           COALESCE(NEW.quantity * NEW.unit_price, 0),
+           NEW.quantity * NEW.unit_price IS NOT NULL
+    WHERE NOT EXISTS (SELECT 1 FROM mv_regional_sales
+                      WHERE region IS NEW.region AND product_id IS NEW.product_id);
+"""
+
+_REMOVE_ROW = """
+    UPDATE mv_regional_sales SET
+        sales_count = sales_count - 1,
+        total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+        quantity_count = quantity_count - (OLD.quantity IS NOT NULL),
+        total_revenue = total_revenue - COALESCE(OLD.quantity * OLD.unit_price, 0),
+        revenue_count = revenue_count - (OLD.quantity * OLD.unit_price IS NOT NULL)
+    WHERE region IS OLD.region AND product_id IS OLD.product_id;
+    DELETE FROM mv_regional_sales
+    WHERE region IS OLD.region AND product_id IS OLD.product_id AND sales_count = 0;
+"""
+
+TRIGGER_DDL = f"""
+CREATE TRIGGER trg_mv_regional_sales_insert AFTER INSERT ON sales
+BEGIN {_ADD_ROW} END;
+CREATE TRIGGER trg_mv_regional_sales_delete AFTER DELETE ON sales
+BEGIN {_REMOVE_ROW} END;
+CREATE TRIGGER trg_mv_regional_sales_update
+AFTER UPDATE OF region, product_id, quantity, unit_price ON sales
+BEGIN {_REMOVE_ROW} {_ADD_ROW} END;
+"""
+
+REFRESH_SQL = """
+DELETE FROM mv_regional_sales;
+INSERT INTO mv_regional_sales
+SELECT region, product_id, COUNT(*),
+       COALESCE(SUM(quantity), 0), COUNT(quantity),
+       COALESCE(SUM(quantity * unit_price), 0), COUNT(quantity * unit_price)
+FROM sales
+GROUP BY region, product_id;
+"""
+
+# The GROUP BY that the view replaces
+RECOMPUTE_SQL = """
+SELECT
+    region,
+    product_id,
+    COUNT(*) AS sales_count,
+    SUM(quantity) AS total_quantity,
+    SUM(quantity * unit_price) AS total_revenue
+FROM sales
+GROUP BY region, product_id
+"""
+
+MAINTENANCE_TRIGGERS = ['trg_mv_regional_sales_insert', 'trg_mv_regional_sales_delete',
+                        'trg_mv_regional_sales_update']
+
+
+def create_materialized_view(conn):
+    """Create the summary table, view and triggers, then populate from sales"""
+    conn.executescript(SUMMARY_DDL)
+    conn.executescript(TRIGGER_DDL)
+    refresh(conn)
+
+
+def refresh(conn):
+    """Full rebuild of the summary table from sales"""
+    conn.executescript(REFRESH_SQL)
+    conn.commit()
+
+
+def bulk_write(conn, sql):
+    """
+    Apply a large write with the maintenance triggers dropped, then recreate
+    them and rebuild the summary once. One transaction, so readers never see
+    the view out of step with sales. A failing write is rolled back, triggers
+    included, and re-raised.
+    """
+    drops = ''.join(f"DROP TRIGGER {name};\n" for name in MAINTENANCE_TRIGGERS)
+    try:
+        conn.executescript(f"BEGIN;\n{drops}{sql};\n{TRIGGER_DDL}{REFRESH_SQL}COMMIT;")
+    except BaseException:
+        # executescript stops at the failing statement and leaves BEGIN open
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def view_matches_recompute(conn):
+    """True if v_regional_sales equals a fresh GROUP BY over sales"""
+    expected = conn.execute(RECOMPUTE_SQL).fetchall()
+    actual = conn.execute("SELECT * FROM v_regional_sales").fetchall()
+    return rows_match(expected, actual, n_keys=2)
+
+
+def check_failed_bulk_write():
+    """A bulk write that fails keeps the triggers, so later writes still maintain the view"""
+    conn = create_sales_database(2_000)
+    create_materialized_view(conn)
+    try:
+        bulk_write(conn, "UPDATE sales SET quantity = 1; "
+                         "INSERT INTO sales (no_such_column) VALUES (1)")
+    except sqlite3.OperationalError:
+        pass
+    else:
+        return False
+    triggers = {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    conn.execute(WRITE_WORKLOADS[1][1].format(n=100))
+    conn.commit()
+    ok = (not conn.in_transaction and triggers >= set(MAINTENANCE_TRIGGERS)
+          and view_matches_recompute(conn))
+    conn.close()
+    return ok
+
+
+# ----------------------------------------------------------------------------
+# Benchmark: query latency and write overhead
+# ----------------------------------------------------------------------------
+
+WRITE_WORKLOADS = [
+    ("INSERT", "INSERT INTO sales (product_id, customer_id, sale_date, quantity, "
+               "unit_price, discount, region) SELECT product_id, customer_id, sale_date, "
+               "quantity, unit_price, discount, region FROM sales WHERE sale_id <= {n}"),
+    ("UPDATE quantity", "UPDATE sales SET quantity = quantity + 1 WHERE sale_id <= {n}"),
+    ("UPDATE region", "UPDATE sales SET region = 'North' WHERE sale_id <= {n}"),
+    ("DELETE", "DELETE FROM sales WHERE sale_id <= {n}"),
+]
+
+READ_QUERIES = [
+    ("One region (SECTION 11)",
+     "SELECT * FROM v_regional_sales WHERE region = 'North' ORDER BY total_revenue DESC",
+     f"SELECT * FROM ({RECOMPUTE_SQL}) WHERE region = 'North' ORDER BY total_revenue DESC"),
+    ("Whole view", "SELECT * FROM v_regional_sales", RECOMPUTE_SQL),
+]
+
+
+def _best(conn, sql, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _write_time(conn, sql):
+    """Run one write batch inside a transaction that is rolled back afterwards"""
+    conn.execute("BEGIN")
+    start = time.perf_counter()
+    conn.execute(sql)
+    elapsed = time.perf_counter() - start
+    conn.execute("ROLLBACK")
+    return elapsed
+
+
+def run_benchmark(n_rows, batch, repeat):
+    print(f"\nScale: {n_rows:,} sales rows, write batches of {batch:,} rows")
+    print("-" * 72)
+    plain = create_sales_database(n_rows)
+    maintained = create_sales_database(n_rows)
+    create_materialized_view(maintained)
+    plain.isolation_level = None
+    maintained.isolation_level = None
+
+    print(f"{'Read':<28}{'Recompute':>12}{'View':>12}{'Speedup':>10}")
+    for label, view_sql, recompute_sql in READ_QUERIES:
+        recompute = _best(plain, recompute_sql, repeat)
+        view = _best(maintained, view_sql, repeat)
+        print(f"{label:<28}{recompute * 1000:>10.2f}ms{view * 1000:>10.2f}ms"
+              f"{recompute / view:>9.0f}x")
+
+    print(f"\n{'Write':<28}{'No view':>12}{'Triggers':>12}{'Overhead':>10}")
+    for label, template in WRITE_WORKLOADS:
+        sql = template.format(n=batch)
+        base = min(_write_time(plain, sql) for _ in range(repeat))
+        with_view = min(_write_time(maintained, sql) for _ in range(repeat))
+        print(f"{label:<28}{base * 1000:>10.1f}ms{with_view * 1000:>10.1f}ms"
+              f"{with_view / base:>9.1f}x")
+
+    # Large loads are cheaper with the triggers dropped and one rebuild at the end
+    bulk = WRITE_WORKLOADS[0][1].format(n=batch * 10)
+    with_triggers = min(_write_time(maintained, bulk) for _ in range(repeat))
+    start = time.perf_counter()
+    bulk_write(maintained, bulk)
+    rebuilt = time.perf_counter() - start
+    print(f"{'Bulk INSERT, drop + refresh':<28}{'':>12}{with_triggers * 1000:>10.1f}ms"
+          f"{rebuilt * 1000:>10.1f}ms rebuilt")
+
+    # Apply every write for real and check the view is still exact
+    for _, template in WRITE_WORKLOADS:
+        maintained.execute(template.format(n=batch))
+    print(f"\n{'✓' if view_matches_recompute(maintained) else '✗'} "
+          "v_regional_sales matches GROUP BY after bulk rebuild and INSERT/UPDATE/DELETE")
+    plain.close()
+    maintained.close()
+
+
+def main():
+    """Compare the trigger-maintained view with recomputing the GROUP BY"""
+    parser = argparse.ArgumentParser(description="Incrementally maintained v_regional_sales")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Materialized aggregate: v_regional_sales")
+    print("=" * 72)
+    print(f"{'✓' if check_failed_bulk_write() else '✗'} "
+          "A failed bulk write is rolled back with its trigger drops")
+    for n_rows in args.rows:
+        run_benchmark(n_rows, args.batch, args.repeat)
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
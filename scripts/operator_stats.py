@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN ANALYZE-Style Operator Counters
+Every physical operator in the columnar engines (scan, filter, hash build and
+probe, sort, merge, aggregate) opens an operator node while it runs and
+records:
+
+- rows in and rows out
+- batches: how many times the operator ran under the same parent
+- hash collisions: distinct keys that share a bucket when hashed into a
+  power-of-two table sized to the key count (the 64-bit hashes of
+  table_stats.py), i.e. what a chained hash table would see
+- comparisons: exact for nested loops, n log2 n for sorts and log2 n per
+  binary-search probe
+- bytes allocated for the operator's output and main intermediate arrays
+- wall time, inclusive of children; self time excludes them
+
+Nodes nest by call order, so a query run inside collect() comes back as an
+annotated plan tree that prints as indented text or JSON. Outside collect()
+operator() returns a shared no-op node: one function call and a list check
+per operator invocation, never per row, so the hooks stay in production code.
+"""
+
+import json
+import math
+import time
+
+import numpy as np
+
+from table_stats import distinct_hashes
+
+COUNTERS = ('rows_in', 'rows_out', 'batches', 'collisions', 'comparisons', 'bytes')
+# Open operator nodes, innermost last; empty when collection is off
+_STACK = []
+
+
+class OperatorNode:
+    """One operator in the plan tree with its accumulated counters"""
+
+    enabled = True
+
+    def __init__(self, name, detail=''):
+        self.name = name
+        self.detail = detail
+        self.children = []
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.seconds = 0.0
+        self._start = None
+
+    def __enter__(self):
+        self.counters['batches'] += 1
+        _STACK.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds += time.perf_counter() - self._start
+        _STACK.pop()
+        return False
+
+    def child(self, name, detail=''):
+        """The child operator with this name and detail, created on first use"""
+        for node in self.children:
+            if node.name == name and node.detail == detail:
+                return node
+        node = OperatorNode(name, detail)
+        self.children.append(node)
+        return node
+
+    def count(self, **counters):
+        for name, value in counters.items():
+            self.counters[name] += int(value)
+
+    @property
+    def self_seconds(self):
+        return max(0.0, self.seconds - sum(c.seconds for c in self.children))
+
+    def to_dict(self):
+        return {'operator': self.name, 'detail': self.detail,
+                'seconds': self.seconds, 'self_seconds': self.self_seconds,
+                **self.counters, 'children': [c.to_dict() for c in self.children]}
+
+    def explain(self, format='text'):
+        """The plan tree as indented text (EXPLAIN ANALYZE) or JSON"""
+        if format == 'json':
+            return json.dumps(self.to_dict(), indent=2)
+        if format != 'text':
+            raise ValueError(f"Unknown explain format: {format}")
+        lines = []
+        self._explain_lines(lines, 0)
+        return '\n'.join(lines)
+
+    def _explain_lines(self, lines, depth):
+        label = f"{self.name} {self.detail}".strip()
+        parts = [f"time={self.seconds * 1000:.2f}ms"]
+        if self.children:
+            parts.append(f"self={self.self_seconds * 1000:.2f}ms")
+        c = self.counters
+        if c['rows_in'] or c['rows_out']:
+            parts.append(f"rows={c['rows_in']:,}->{c['rows_out']:,}")
+        if c['batches'] > 1:
+            parts.append(f"batches={c['batches']:,}")
+        if c['collisions']:
+            parts.append(f"collisions={c['collisions']:,}")
+        if c['comparisons']:
+            parts.append(f"comparisons={_short(c['comparisons'])}")
+        if c['bytes']:
+            parts.append(f"memory={c['bytes'] / 2 ** 20:.1f}MB")
+        prefix = '  ' * (depth - 1) + '-> ' if depth else ''
+        lines.append(f"{prefix}{label}  ({' '.join(parts)})")
+        for node in self.children:
+            node._explain_lines(lines, depth + 1)
+
+
+class _DisabledNode:
+    """Stand-in returned while collection is off; every hook is a no-op"""
+
+    enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, **counters):
+        pass
+
+
+DISABLED = _DisabledNode()
+
+
+def _short(n):
+    for unit, size in (('G', 1e9), ('M', 1e6), ('K', 1e3)):
+        if n >= size:
+            return f"{n / size:.1f}{unit}"
+    return str(n)
+
+
+def operator(name, detail=''):
+    """Node for one operator invocation: use as `with operator('HashBuild') as op:`"""
+    if not _STACK:
+        return DISABLED
+    return _STACK[-1].child(name, detail)
+
+
+class collect:
+    """
+    Collect operator counters for everything run inside the block:
+
+        with collect('Q5 join') as plan:
+            ...
+        print(plan.explain())
+
+    collect(enabled=False) runs the block with collection off.
+    """
+
+    def __init__(self, name='Query', enabled=True):
+        self.root = OperatorNode(name) if enabled else DISABLED
+        self._outer = None
+
+    def __enter__(self):
+        if not self.root.enabled:
+            # Switch collection off even inside an enclosing collect()
+            self._outer = _STACK[:]
+            _STACK.clear()
+            return self.root
+        return self.root.__enter__()
+
+    def __exit__(self, *exc_info):
+        if not self.root.enabled:
+            _STACK.extend(self._outer)
+            return False
+        return self.root.__exit__(*exc_info)
+
+
+# ----------------------------------------------------------------------------
+# Counter helpers for the instrumented engines (call only when op.enabled)
+# ----------------------------------------------------------------------------
+
+def bucket_collisions(keys):
+    """Distinct keys sharing a bucket of a power-of-two table with one slot per key"""
+    hashes = distinct_hashes(np.asarray(keys))
+    if len(hashes) < 2:
+        return 0
+    n_slots = 1 << math.ceil(math.log2(len(hashes)))
+    return len(hashes) - len(np.unique(hashes & np.uint64(n_slots - 1)))
+
+
+def sort_comparisons(n):
+    return int(n * math.log2(n)) if n > 1 else 0
+
+
+def search_comparisons(n_probes, n_sorted):
+    return n_probes * math.ceil(math.log2(n_sorted + 1))
+
+
+def nbytes(*arrays):
+    return sum(a.nbytes for a in arrays if isinstance(a, np.ndarray))
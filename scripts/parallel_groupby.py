@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Parallel Partitioned Hash Aggregation for Q6
+Splits the scaled sales table into row chunks that worker processes read
+directly from shared-memory column buffers. Each worker builds partial
+aggregates for its chunk and hash-partitions them by group key; partition p
+of every worker is then merged by a single task, so merges also run in parallel.
+
+String keys are dictionary-encoded to integer codes before sharing and decoded
+after the merge. COUNT(DISTINCT ...) is not decomposable into partials and is
+left out of the parallel SECTION 10 queries.
+"""
+
+import argparse
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from columnar import Column, concat, table_length
+from groupby_engine import factorize, group_by, result_rows, rows_match, time_call
+from grouping_sets import merge_partials, split_aggregates
+from scaled_data import generate_products, generate_sales
+
+# Set in each worker by _attach_worker
+_WORKER_TABLE = {}
+_WORKER_SEGMENTS = []
+
+
+class SharedTable:
+    """Numeric columns copied once into named shared-memory blocks"""
+
+    def __init__(self, table):
+        self.segments = []
+        self.spec = {}
+        self.dictionaries = {}
+        self.n_rows = table_length(table)
+        for name, column in table.items():
+            values = column.values
+            if values.dtype == object:
+                codes, _ = factorize(column)
+                self.dictionaries[name] = column.take(self._first_rows(codes))
+                values = codes
+            elif np.issubdtype(values.dtype, np.datetime64):
+                self.dictionaries[name] = values.dtype
+                values = values.view(np.int64)
+            self.spec[name] = (self._share(values), self._share(column.valid),
+                               values.dtype.str)
+
+    @staticmethod
+    def _first_rows(codes):
+        _, first_rows = np.unique(codes, return_index=True)
+        return first_rows
+
+    def _share(self, array):
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+        self.segments.append(segment)
+        return segment.name
+
+    def decode(self, name, column):
+        """Map shared integer codes back to the original values"""
+        dictionary = self.dictionaries.get(name)
+        if dictionary is None:
+            return column
+        if isinstance(dictionary, np.dtype):
+            return Column(column.values.view(dictionary), column.valid)
+        # Codes index the sorted dictionary; NULL rows are masked so any code will do
+        safe = np.where(column.valid, column.values, 0)
+        return Column(dictionary.values[safe], column.valid)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def _attach_worker(spec, n_rows):
+    """Pool initializer: map every shared column as a zero-copy NumPy view"""
+    for name, (values_name, valid_name, dtype) in spec.items():
+        values_segment = shared_memory.SharedMemory(name=values_name)
+        valid_segment = shared_memory.SharedMemory(name=valid_name)
+        _WORKER_SEGMENTS.extend([values_segment, valid_segment])
+        values = np.ndarray((n_rows,), dtype=np.dtype(dtype), buffer=values_segment.buf)
+        valid = np.ndarray((n_rows,), dtype=bool, buffer=valid_segment.buf)
+        _WORKER_TABLE[name] = Column(values, valid)
+
+
+def hash_partition(key_columns, n_partitions):
+    """Partition number for every row, from a multiplicative hash of the integer keys"""
+    n_rows = len(key_columns[0]) if key_columns else 0
+    h = np.zeros(n_rows, dtype=np.uint64)
+    for column in key_columns:
+        mixed = np.where(column.valid, column.values.astype(np.uint64), np.uint64(0x9E3779B9))
+        h = (h ^ mixed) * np.uint64(0x100000001B3)
+    h ^= h >> np.uint64(29)
+    return (h % np.uint64(n_partitions)).astype(np.int64)
+
+
+def _aggregate_chunk(task):
+    """Worker: partial aggregates for rows [start, stop), split into hash partitions"""
+    start, stop, keys, partials, n_partitions = task
+    chunk = {name: column.take(slice(start, stop)) for name, column in _WORKER_TABLE.items()}
+    result = group_by(chunk, keys, partials)
+    partition = hash_partition([result[k] for k in keys], n_partitions)
+    return [{name: column.filter(partition == p) for name, column in result.items()}
+            for p in range(n_partitions)]
+
+
+def _merge_partition(task):
+    """Worker: merge one hash partition's partials from every chunk"""
+    pieces, keys, plans = task
+    merged = {name: concat([piece[name] for piece in pieces]) for name in pieces[0]}
+    return merge_partials(merged, keys, plans)
+
+
+def parallel_group_by(shared, keys, aggregates, n_workers, pool=None, chunks_per_worker=4):
+    """
+    GROUP BY keys over a SharedTable using n_workers processes.
+
+    aggregates: list of (alias, function, column name); functions must be
+    decomposable (COUNT(*), COUNT, SUM, AVG, MIN, MAX).
+    """
+    partials, plans = split_aggregates(aggregates)
+    n_partitions = n_workers
+    n_chunks = max(1, n_workers * chunks_per_worker)
+    bounds = np.linspace(0, shared.n_rows, n_chunks + 1).astype(int)
+    tasks = [(int(a), int(b), keys, partials, n_partitions)
+             for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    owns_pool = pool is None
+    if owns_pool:
+        pool = Pool(n_workers, initializer=_attach_worker, initargs=(shared.spec, shared.n_rows))
+    try:
+        chunk_results = pool.map(_aggregate_chunk, tasks)
+        merge_tasks = [([chunk[p] for chunk in chunk_results], keys, plans)
+                       for p in range(n_partitions)]
+        merged = pool.map(_merge_partition, merge_tasks)
+    finally:
+        if owns_pool:
+            pool.close()
+            pool.join()
+
+    result = {name: concat([m[name] for m in merged]) for name in merged[0]}
+    return {name: shared.decode(name, column) for name, column in result.items()}
+
+
+# ----------------------------------------------------------------------------
+# SECTION 10 business queries and scaling curve
+# ----------------------------------------------------------------------------
+
+def prepare_sales(n_rows):
+    """Scaled sales with the SECTION 10 derived columns precomputed"""
+    sales = generate_sales(n_rows)
+    products = generate_products()
+    # products.product_id is 101..N, so the join is a positional lookup
+    sales['category'] = products['category'].take(sales['product_id'].values - 101)
+    sales['revenue'] = sales['quantity'] * sales['unit_price']
+    sales['discount_or_zero'] = sales['discount'].coalesce(0.0)
+    return sales
+
+
+BUSINESS_QUERIES = [
+    ("Ex1: region x category", ['region', 'category'], [
+        ('num_sales', 'COUNT(*)', None), ('total_units_sold', 'SUM', 'quantity'),
+        ('gross_revenue', 'SUM', 'revenue'), ('total_discounts', 'SUM', 'discount_or_zero'),
+        ('avg_order_value', 'AVG', 'revenue')]),
+    ("Ex3: product performance", ['product_id'], [
+        ('times_sold', 'COUNT(*)', None), ('total_units_sold', 'SUM', 'quantity'),
+        ('total_revenue', 'SUM', 'revenue'), ('avg_sale_value', 'AVG', 'revenue')]),
+    ("Ex4: daily revenue", ['sale_date'], [
+        ('daily_sales', 'COUNT(*)', None), ('daily_units', 'SUM', 'quantity'),
+        ('daily_revenue', 'SUM', 'revenue'), ('avg_order_value', 'AVG', 'revenue')]),
+    ("region x product_id", ['region', 'product_id'], [
+        ('sales_count', 'COUNT(*)', None), ('total_quantity', 'SUM', 'quantity'),
+        ('total_revenue', 'SUM', 'revenue'), ('max_quantity', 'MAX', 'quantity')]),
+]
+
+
+def run_scaling_curve(n_rows, worker_counts, repeat=3):
+    """Time each business query serially and with increasing worker counts"""
+    print(f"\nScale: {n_rows:,} sales rows, workers {worker_counts}")
+    print("-" * 78)
+    sales = prepare_sales(n_rows)
+    columns = ['region', 'category', 'product_id', 'sale_date', 'quantity',
+               'revenue', 'discount_or_zero']
+    shared = SharedTable({name: sales[name] for name in columns})
+    try:
+        header = f"{'Query':<28}{'Serial':>9}" + ''.join(f"{f'{w}w':>9}" for w in worker_counts)
+        print(header + f"{'Match':>7}")
+        pools = {w: Pool(w, initializer=_attach_worker, initargs=(shared.spec, shared.n_rows))
+                 for w in worker_counts}
+        for label, keys, aggregates in BUSINESS_QUERIES:
+            serial_time, expected = time_call(lambda: group_by(sales, keys, aggregates), repeat)
+            line = f"{label:<28}{serial_time:>8.3f}s"
+            match = True
+            for workers in worker_counts:
+                elapsed, result = time_call(
+                    lambda: parallel_group_by(shared, keys, aggregates, workers, pools[workers]),
+                    repeat)
+                line += f"{serial_time / elapsed:>8.2f}x"
+                match &= rows_match(result_rows(expected), result_rows(result), len(keys))
+            print(line + f"{'✓' if match else '✗':>7}")
+        for pool in pools.values():
+            pool.close()
+            pool.join()
+    finally:
+        shared.close()
+    print("Speedups are relative to the single-process engine")
+
+
+def main():
+    """Report the 1..N worker scaling curve on the SECTION 10 queries"""
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, 16, 32, cpu_count} & set(range(1, cpu_count + 1)))
+    parser = argparse.ArgumentParser(description="Parallel partitioned hash aggregation")
+    parser.add_argument('--rows', type=int, nargs='+', default=[2_000_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Parallel partitioned hash aggregation")
+    print("=" * 78)
+    print(f"CPU cores available: {cpu_count}")
+    for n_rows in args.rows:
+        run_scaling_curve(n_rows, args.workers, args.repeat)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Partition-Wise Parallel Hash Join for Q5/Q6 Star Joins
+Joins the scaled sales table to products and customers with worker
+processes that never receive row data through pickling:
+
+1. Share: the join key columns are copied once into shared-memory blocks
+2. Partition: one pass per input. Workers hash their row chunk on the join
+   key (the multiplicative hash of parallel_groupby.py), write row ids and
+   keys grouped by partition into the chunk's region of one shared buffer
+   and return only a histogram. NULL keys are dropped here, since they
+   never match
+3. Join: partition p of the left input can only match partition p of the
+   right input, so each worker gathers partition p's piece from every chunk
+   region, runs join_engine.hash_join on the pair and writes its
+   (left_row, right_row) pairs into a shared block of its own, returning
+   only the block's name and length
+4. Concatenate: the parent copies the blocks into the final index arrays
+   with one memcpy each and unlinks them
+
+Keys must be integers; dictionary-encode string keys first. The speedup curve
+by worker count is reported against the single-process hash join.
+"""
+
+import argparse
+import os
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+import numpy as np
+
+from columnar import Column
+from groupby_engine import time_call
+from join_engine import JoinResult, hash_join, join_results
+from operator_stats import operator
+from parallel_groupby import hash_partition
+from scaled_data import generate_customers, generate_products, generate_sales
+
+
+class SharedArrays:
+    """Shared-memory NumPy arrays owned (and eventually unlinked) by the parent"""
+
+    def __init__(self):
+        self.segments = []
+
+    def create(self, length, dtype):
+        """A new shared array and the (name, dtype, length) spec workers attach with"""
+        dtype = np.dtype(dtype)
+        segment = shared_memory.SharedMemory(create=True, size=max(length * dtype.itemsize, 1))
+        self.segments.append(segment)
+        return (segment.name, dtype.str, length), np.ndarray((length,), dtype, segment.buf)
+
+    def share(self, array):
+        spec, shared = self.create(len(array), array.dtype)
+        shared[:] = array
+        return spec
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+class _Attached:
+    """Worker-side views of shared arrays, detached when the task ends"""
+
+    def __init__(self):
+        self.segments = []
+
+    def __call__(self, spec):
+        name, dtype, length = spec
+        segment = shared_memory.SharedMemory(name=name)
+        self.segments.append(segment)
+        return np.ndarray((length,), np.dtype(dtype), segment.buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for segment in self.segments:
+            segment.close()
+        return False
+
+
+def _scatter(task):
+    """
+    Worker: hash one chunk's non-NULL rows on the key and write row ids and
+    keys, grouped by partition, into the chunk's region of the shared buffers;
+    returns how many rows went to each partition
+    """
+    key_spec, valid_spec, start, stop, base, n_partitions, rows_spec, keys_spec = task
+    with _Attached() as attach:
+        rows = start + np.flatnonzero(attach(valid_spec)[start:stop])
+        keys = attach(key_spec)[rows]
+        partition = hash_partition([Column(keys)], n_partitions)
+        # NumPy's stable sort is a radix sort for 16-bit integers
+        order = np.argsort(partition.astype(np.uint16), kind='stable')
+        attach(rows_spec)[base:base + len(rows)] = rows[order]
+        attach(keys_spec)[base:base + len(rows)] = keys[order]
+        del keys
+        return np.bincount(partition, minlength=n_partitions)
+
+
+def _gather(attach, specs, pieces):
+    """One partition's row ids and keys from its piece in every chunk region"""
+    return [np.concatenate([attach(spec)[a:b] for a, b in pieces]) for spec in specs]
+
+
+def _join_partition(task):
+    """Worker: hash join one partition pair into a new shared block of row pairs"""
+    left_specs, left_pieces, right_specs, right_pieces = task
+    with _Attached() as attach:
+        left_rows, left_keys = _gather(attach, left_specs, left_pieces)
+        right_rows, right_keys = _gather(attach, right_specs, right_pieces)
+        left_pos, right_pos = hash_join(Column(left_keys), Column(right_keys))
+        n_pairs = len(left_pos)
+        segment = shared_memory.SharedMemory(create=True, size=max(2 * n_pairs * 8, 1))
+        pairs = np.ndarray((2, n_pairs), np.int64, segment.buf)
+        pairs[0] = left_rows[left_pos]
+        pairs[1] = right_rows[right_pos]
+        del pairs
+        segment.close()
+        return segment.name, n_pairs
+
+
+def worker_pool(n_workers):
+    """
+    A Pool whose workers share the parent's resource tracker: started first,
+    so forked workers do not each start their own and try to unlink blocks
+    the parent still owns when they exit
+    """
+    resource_tracker.ensure_running()
+    return Pool(n_workers)
+
+
+def partition(column, n_partitions, pool, arrays, n_chunks):
+    """
+    Hash-partition a key column into shared row-id and key buffers in one
+    pass. Returns the buffer specs and, per partition, its (start, stop)
+    piece in every chunk's region.
+    """
+    key_spec = arrays.share(column.values)
+    valid_spec = arrays.share(column.valid)
+    bounds = np.linspace(0, len(column), n_chunks + 1).astype(int)
+    counts = [int(np.count_nonzero(column.valid[a:b])) for a, b in zip(bounds[:-1], bounds[1:])]
+    bases = np.concatenate([[0], np.cumsum(counts)])
+    rows_spec, _ = arrays.create(int(bases[-1]), np.int64)
+    keys_spec, _ = arrays.create(int(bases[-1]), column.values.dtype)
+    histograms = pool.map(_scatter, [(key_spec, valid_spec, int(bounds[i]), int(bounds[i + 1]),
+                                      int(bases[i]), n_partitions, rows_spec, keys_spec)
+                                     for i in range(n_chunks)])
+    pieces = [[] for _ in range(n_partitions)]
+    for base, histogram in zip(bases, histograms):
+        starts = base + np.cumsum(histogram) - histogram
+        for p in range(n_partitions):
+            pieces[p].append((int(starts[p]), int(starts[p] + histogram[p])))
+    return (rows_spec, keys_spec), pieces
+
+
+def parallel_hash_join(left, right, n_workers, pool=None, partitions_per_worker=4,
+                       chunks_per_worker=2):
+    """
+    (left_rows, right_rows) pairs of an equi-join of two integer key Columns,
+    computed partition-wise by n_workers processes. Pairs come out grouped by
+    partition rather than in hash_join's order.
+    """
+    n_partitions = min(max(1, n_workers * partitions_per_worker), 2 ** 16)
+    n_chunks = max(1, n_workers * chunks_per_worker)
+    arrays = SharedArrays()
+    owns_pool = pool is None
+    if owns_pool:
+        pool = worker_pool(n_workers)
+    blocks = []
+    try:
+        with operator('ParallelHashJoin', f'{n_workers} workers') as op:
+            with operator('Partition'):
+                left_specs, left_pieces = partition(left, n_partitions, pool, arrays, n_chunks)
+                right_specs, right_pieces = partition(right, n_partitions, pool, arrays, n_chunks)
+            with operator('JoinPartitions'):
+                # Largest partitions first so stragglers do not serialize the tail
+                sizes = [sum(b - a for a, b in left_pieces[p] + right_pieces[p])
+                         for p in range(n_partitions)]
+                tasks = [(left_specs, left_pieces[p], right_specs, right_pieces[p])
+                         for p in np.argsort(sizes, kind='stable')[::-1]]
+                _collect(pool.imap_unordered(_join_partition, tasks, chunksize=1), blocks)
+            with operator('Concatenate'):
+                left_out, right_out = _concatenate(blocks)
+            op.count(rows_in=len(left) + len(right), rows_out=len(left_out))
+    except BaseException:
+        _discard(blocks)
+        raise
+    finally:
+        arrays.close()
+        if owns_pool:
+            pool.close()
+            pool.join()
+    return left_out, right_out
+
+
+def _concatenate(blocks):
+    """Copy every worker's shared pair block into two index arrays and unlink the blocks"""
+    total = sum(n for _, n in blocks)
+    left_out = np.empty(total, dtype=np.int64)
+    right_out = np.empty(total, dtype=np.int64)
+    position = 0
+    for name, n_pairs in blocks:
+        segment = shared_memory.SharedMemory(name=name)
+        pairs = np.ndarray((2, n_pairs), np.int64, segment.buf)
+        left_out[position:position + n_pairs] = pairs[0]
+        right_out[position:position + n_pairs] = pairs[1]
+        position += n_pairs
+        del pairs
+        segment.close()
+        segment.unlink()
+    return left_out, right_out
+
+
+def _collect(results, blocks):
+    """
+    Append every task's pair block to blocks as it finishes, then re-raise the
+    first task error: the tasks still running after a failure create blocks
+    too, and each must be on the list for _discard to unlink
+    """
+    failure = None
+    while True:
+        try:
+            blocks.append(next(results))
+        except StopIteration:
+            break
+        except Exception as error:
+            failure = failure or error
+    if failure is not None:
+        raise failure
+
+
+def _discard(blocks):
+    """Unlink whichever pair blocks _concatenate has not already unlinked"""
+    for name, _ in blocks:
+        try:
+            segment = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
+
+
+def parallel_join_results(left, right, conditions, n_workers, pool=None):
+    """join_engine.join_results with the first condition joined partition-wise in parallel"""
+    first_left, first_right = conditions[0]
+    with operator('Join', f'{first_left} = {first_right}') as op:
+        left_pos, right_pos = parallel_hash_join(left.column(first_left),
+                                                 right.column(first_right), n_workers, pool)
+        joined = left.combine(right, left_pos, right_pos)
+        op.count(rows_in=len(left) + len(right), rows_out=len(joined))
+    for left_ref, right_ref in conditions[1:]:
+        with operator('Filter', f'{left_ref} = {right_ref}') as op:
+            a, b = joined.column(left_ref), joined.column(right_ref)
+            rows_in = len(joined)
+            joined = joined.filter(a.valid & b.valid & (a.values == b.values))
+            op.count(rows_in=rows_in, rows_out=len(joined), comparisons=rows_in)
+    return joined
+
+
+# ----------------------------------------------------------------------------
+# Star join over the scaled sales schema and scaling curve
+# ----------------------------------------------------------------------------
+
+def star_join(relations, join):
+    """sales s JOIN products p ON s.product_id = p.product_id
+    JOIN customers c ON s.customer_id = c.customer_id"""
+    joined = join(JoinResult.scan(relations, 's'), JoinResult.scan(relations, 'p'),
+                  [('s.product_id', 'p.product_id')])
+    return join(joined, JoinResult.scan(relations, 'c'), [('s.customer_id', 'c.customer_id')])
+
+
+def _triples(joined):
+    """Result rows as (sales, product, customer) index triples in a canonical order"""
+    rows = np.stack([joined.indices[a] for a in ('s', 'p', 'c')])
+    return rows[:, np.lexsort(rows[::-1])]
+
+
+def run_scaling_curve(n_rows, n_customers, worker_counts, repeat):
+    relations = {'s': generate_sales(n_rows, n_customers=n_customers),
+                 'p': generate_products(),
+                 'c': generate_customers(n_customers)}
+    serial, expected = time_call(lambda: star_join(relations, join_results), repeat)
+    expected = _triples(expected)
+    print(f"\nScale: {n_rows:,} sales x {len(relations['p']['product_id']):,} products x "
+          f"{n_customers:,} customers -> {expected.shape[1]:,} rows")
+    print(f"{'Workers':>8}{'Time':>10}{'Speedup':>10}{'Efficiency':>12}{'Match':>7}")
+    print("-" * 78)
+    print(f"{'serial':>8}{serial:>9.3f}s{1:>9.2f}x{'':>12}{'':>7}")
+    for workers in worker_counts:
+        pool = worker_pool(workers)
+        try:
+            elapsed, joined = time_call(
+                lambda: star_join(relations, lambda l, r, c: parallel_join_results(l, r, c, workers,
+                                                                                   pool)),
+                repeat)
+        finally:
+            pool.close()
+            pool.join()
+        match = np.array_equal(_triples(joined), expected)
+        speedup = serial / elapsed
+        print(f"{workers:>8}{elapsed:>9.3f}s{speedup:>9.2f}x{speedup / workers:>11.0%}"
+              f"{'✓' if match else '✗':>7}")
+
+
+def main():
+    """Report the worker-count speedup curve of the partition-wise sales star join"""
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, 16, 32, cpu_count} & set(range(1, cpu_count + 1)))
+    parser = argparse.ArgumentParser(description="Partition-wise parallel hash join")
+    parser.add_argument('--rows', type=int, nargs='+', default=[5_000_000])
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Partition-wise parallel hash join")
+    print("=" * 78)
+    print(f"CPU cores available: {cpu_count}")
+    for n_rows in args.rows:
+        run_scaling_curve(n_rows, args.customers, args.workers, args.repeat)
+    print("=" * 78)
+    print("Speedups are relative to the single-process hash join")
+    if max(args.workers) > cpu_count:
+        print(f"Only {cpu_count} core(s): extra workers time-share them, so those points show "
+              f"partitioning overhead rather than parallel speedup")
+
+
+if __name__ == "__main__":
+    main()
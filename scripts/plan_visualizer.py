@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Query Plan Visualizer (Green Theme)
+Captures SQLite EXPLAIN QUERY PLAN trees for the example queries in sql/ and
+renders them with the green diagram style from generate_sql_diagrams.py.
+
+Plan captures (JSON) and rendered images (PNG) are cached under
+output/plan_cache/ keyed by a hash of the query text, the scaled schema and
+the capture options, so regenerating a report with dozens of plans only
+builds the scaled database when something is missing.
+
+Timings: Python's sqlite3 module does not expose per-operator counters
+(sqlite3_stmt_scanstatus), so a timed capture records wall time and row count
+for the statement as a whole and shows them on the root node.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.patches import FancyBboxPatch
+
+from generate_sql_diagrams import COLORS, set_green_style
+from scaled_data import SQLITE_DDL, create_example_database
+from sql_workload import is_runnable, select_statements
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'plan_cache')
+RENDERER_VERSION = 1
+
+# Fill colour per operator family: index access is good news, full scans are not
+OPERATOR_COLORS = {
+    'SEARCH': COLORS['highlight'],
+    'SCAN': COLORS['light'],
+    'USE TEMP B-TREE': COLORS['accent'],
+    'COMPOUND': COLORS['secondary'],
+}
+
+
+class PlanNode:
+    """One EXPLAIN QUERY PLAN row and its children"""
+
+    def __init__(self, node_id, detail):
+        self.node_id = node_id
+        self.detail = detail
+        self.children = []
+
+    def to_dict(self):
+        return {'id': self.node_id, 'detail': self.detail,
+                'children': [c.to_dict() for c in self.children]}
+
+    @classmethod
+    def from_dict(cls, data):
+        node = cls(data['id'], data['detail'])
+        node.children = [cls.from_dict(c) for c in data['children']]
+        return node
+
+
+def capture_plan(conn, sql, timed=False):
+    """EXPLAIN QUERY PLAN as a tree, optionally with measured time and row count"""
+    root = PlanNode(0, 'QUERY')
+    nodes = {0: root}
+    for node_id, parent, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        node = PlanNode(node_id, detail)
+        nodes[node_id] = node
+        nodes.get(parent, root).children.append(node)
+    capture = {'sql': sql, 'plan': root.to_dict()}
+    if timed:
+        start = time.perf_counter()
+        rows = sum(1 for _ in conn.execute(sql))
+        capture['seconds'] = time.perf_counter() - start
+        capture['rows'] = rows
+    return capture
+
+
+def plan_key(sql, timed, scale):
+    """Cache key: query text, the scaled schema, data size and capture options"""
+    digest = hashlib.sha256()
+    digest.update(' '.join(sql.split()).encode())
+    digest.update(json.dumps(SQLITE_DDL, sort_keys=True).encode())
+    digest.update(json.dumps({'timed': timed, 'scale': scale,
+                              'renderer': RENDERER_VERSION}).encode())
+    return digest.hexdigest()[:16]
+
+
+def _operator_color(detail):
+    for prefix, color in OPERATOR_COLORS.items():
+        if detail.startswith(prefix):
+            return color
+    return COLORS['white']
+
+
+def _layout(node, depth, next_leaf, positions):
+    """Leaves get consecutive x slots; parents are centred over their children"""
+    if not node.children:
+        positions[id(node)] = (next_leaf, depth)
+        return next_leaf + 1
+    for child in node.children:
+        next_leaf = _layout(child, depth + 1, next_leaf, positions)
+    xs = [positions[id(c)][0] for c in node.children]
+    positions[id(node)] = ((min(xs) + max(xs)) / 2, depth)
+    return next_leaf
+
+
+def _wrap(text, width=30):
+    words, lines, line = text.split(), [], ''
+    for word in words:
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f'{line} {word}'.strip()
+    lines.append(line)
+    return '\n'.join(lines)
+
+
+def render_plan(capture, path, title=None):
+    """Draw a captured plan tree as a green-themed PNG"""
+    set_green_style()
+    root = PlanNode.from_dict(capture['plan'])
+    positions = {}
+    n_leaves = _layout(root, 0, 0, positions)
+    depth = max(y for _, y in positions.values()) + 1
+
+    fig, ax = plt.subplots(figsize=(max(6, 3.2 * n_leaves), 1.2 + 1.6 * depth))
+    ax.set_xlim(-0.6, n_leaves - 0.4)
+    ax.set_ylim(-depth + 0.3, 0.8)
+    ax.axis('off')
+    if title:
+        ax.set_title(title, color=COLORS['primary'], fontsize=12, fontweight='bold')
+
+    def draw(node):
+        x, y = positions[id(node)]
+        for child in node.children:
+            cx, cy = positions[id(child)]
+            ax.plot([x, cx], [-y - 0.25, -cy + 0.25], color=COLORS['border'], linewidth=1.5, zorder=1)
+            draw(child)
+        label = node.detail
+        if node is root and 'seconds' in capture:
+            label += f"\n{capture['seconds'] * 1000:.1f} ms, {capture['rows']:,} rows"
+        ax.add_patch(FancyBboxPatch((x - 0.45, -y - 0.25), 0.9, 0.5, boxstyle="round,pad=0.05",
+                                    facecolor=_operator_color(node.detail),
+                                    edgecolor=COLORS['border'], linewidth=1.5, zorder=2))
+        ax.text(x, -y, _wrap(label), ha='center', va='center', fontsize=7,
+                color=COLORS['text'], zorder=3)
+
+    draw(root)
+    plt.savefig(path, dpi=150, bbox_inches='tight', facecolor=COLORS['background'])
+    plt.close(fig)
+
+
+class PlanCache:
+    """Cached capture + render; the scaled database is built only on a miss"""
+
+    def __init__(self, cache_dir=CACHE_DIR, n_sales=20000, n_employees=2000):
+        self.cache_dir = cache_dir
+        self.scale = (n_sales, n_employees)
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = create_example_database(*self.scale)
+        return self._conn
+
+    def capture(self, sql, timed=False):
+        path = os.path.join(self.cache_dir, plan_key(sql, timed, self.scale) + '.json')
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path) as handle:
+                return json.load(handle)
+        self.misses += 1
+        capture = capture_plan(self.conn, sql, timed)
+        with open(path, 'w') as handle:
+            json.dump(capture, handle, indent=1)
+        return capture
+
+    def runnable(self, sql):
+        """is_runnable, remembering statements SQLite rejects so warm runs skip the build"""
+        marker = os.path.join(self.cache_dir, plan_key(sql, False, self.scale) + '.unrunnable')
+        if os.path.exists(marker):
+            return False
+        if is_runnable(self.conn, sql):
+            return True
+        open(marker, 'w').close()
+        return False
+
+    def path(self, sql, timed=False, title=None):
+        """Where the rendered PNG for sql is cached"""
+        key = plan_key(sql, timed, self.scale)
+        if title:
+            # The title is drawn into the image, but not into the captured plan
+            key += '_' + hashlib.sha256(title.encode()).hexdigest()[:8]
+        return os.path.join(self.cache_dir, key + '.png')
+
+    def image(self, sql, timed=False, title=None):
+        """Path to the rendered PNG, rendering only when it is not cached"""
+        path = self.path(sql, timed, title)
+        if not os.path.exists(path):
+            render_plan(self.capture(sql, timed), path, title)
+        else:
+            self.hits += 1
+        return path
+
+
+def render_query_plan(sql, timed=False, title=None, cache=None):
+    """Convenience wrapper used by the report generator"""
+    return (cache or PlanCache()).image(sql, timed, title)
+
+
+def main():
+    """Render plans for every SQLite-runnable example query (or those matching --match)"""
+    parser = argparse.ArgumentParser(description="Render EXPLAIN QUERY PLAN diagrams")
+    parser.add_argument('--match', default='', help="only labels containing this text, e.g. 'q5 SECTION 8'")
+    parser.add_argument('--timed', action='store_true', help="also execute and time each query")
+    parser.add_argument('--sales', type=int, default=20000)
+    parser.add_argument('--employees', type=int, default=2000)
+    args = parser.parse_args()
+
+    print("Query plan visualizer")
+    print("=" * 70)
+    cache = PlanCache(n_sales=args.sales, n_employees=args.employees)
+    start = time.perf_counter()
+    rendered = 0
+    for statement in select_statements():
+        if args.match not in statement.label:
+            continue
+        cached = os.path.exists(cache.path(statement.sql, args.timed, statement.label))
+        if not cached and not cache.runnable(statement.sql):
+            continue
+        path = cache.image(statement.sql, args.timed, statement.label)
+        rendered += 1
+        print(f"✓ {statement.label:<22} {os.path.relpath(path)}")
+    print("=" * 70)
+    print(f"{rendered} plans in {time.perf_counter() - start:.2f}s "
+          f"({cache.hits} cache hits, {cache.misses} captures)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,827 @@
+#!/usr/bin/env python3
+"""
+Vectorized Predicate Compiler for WHERE and HAVING
+Parses SQL expressions such as
+
+    e.salary > 50000 AND d.location = 'New York'
+    COALESCE(discount, 0) > 10 OR quantity IS NULL
+    CASE WHEN quantity >= 10 THEN 'bulk' ELSE 'single' END = 'bulk'
+    COUNT(*) > 2 AND AVG(quantity) > 4 AND SUM(quantity * unit_price) > 1000
+
+and compiles them once into nested NumPy operations over a columnar batch.
+Every intermediate result is a (values, valid) pair, so SQL's three-valued
+logic falls out of mask algebra:
+
+- comparisons and arithmetic are UNKNOWN (NULL) if any operand is NULL
+- FALSE AND UNKNOWN is FALSE, TRUE OR UNKNOWN is TRUE, NOT UNKNOWN is UNKNOWN
+- x IN (1, NULL) is TRUE on a match and UNKNOWN otherwise, so NOT IN with a
+  NULL in the list never returns a row
+- WHERE and HAVING keep only rows that are TRUE
+
+Supported: = <> != < <= > >=, + - * / (SQLite integer division, x / 0 is
+NULL), AND OR NOT, IS [NOT] NULL, [NOT] IN (...), [NOT] BETWEEN, [NOT] LIKE,
+COALESCE, NULLIF, ABS, LENGTH, searched and simple CASE, and in HAVING the
+aggregates COUNT(*), COUNT([DISTINCT] x), SUM, AVG, MIN and MAX.
+"""
+
+import argparse
+import datetime
+import math
+import re
+import sqlite3
+import time
+from operator import add, eq, ge, gt, le, lt, mul, ne, sub
+
+import numpy as np
+
+from columnar import Column, DictionaryColumn, dictionary_encode, hash_factorize, table_length
+from groupby_engine import group_by, result_rows, rows_match
+from join_engine import JoinResult, join_results
+from operator_stats import operator
+from scaled_data import (generate_departments, generate_employees, generate_sales,
+                         load_into_sqlite)
+
+KEYWORDS = {'AND', 'OR', 'NOT', 'IS', 'NULL', 'IN', 'BETWEEN', 'LIKE', 'CASE', 'WHEN', 'THEN',
+            'ELSE', 'END', 'TRUE', 'FALSE', 'DISTINCT'}
+AGGREGATES = {'COUNT', 'SUM', 'AVG', 'MIN', 'MAX'}
+FUNCTIONS = {'COALESCE', 'NULLIF', 'ABS', 'LENGTH'} | AGGREGATES
+TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<number>\d+\.\d*|\.\d+|\d+)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<name>[A-Za-z_][A-Za-z_0-9]*(?:\.[A-Za-z_][A-Za-z_0-9]*)?)
+    | (?P<op><=|>=|<>|!=|==|[=<>+\-*/(),])
+    )""", re.VERBOSE)
+COMPARISONS = {'=': np.equal, '==': np.equal, '<>': np.not_equal, '!=': np.not_equal,
+               '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+
+# ----------------------------------------------------------------------------
+# Parser: SQL text -> tuple AST
+# ----------------------------------------------------------------------------
+
+def tokenize(text, spans=None):
+    """(kind, value) tokens; spans, if given, receives each token's (start, end) in text"""
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unexpected character at {position}: {text[position:position + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'name' and value.upper() in KEYWORDS | FUNCTIONS:
+            value = value.upper()
+            kind = 'keyword' if value in KEYWORDS else 'name'
+        tokens.append((kind, value))
+        if spans is not None:
+            spans.append(match.span(match.lastgroup))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent, lowest precedence first: OR, AND, NOT, comparison, + -, * /"""
+
+    def __init__(self, text):
+        self.text = text
+        self.spans = []
+        self.tokens = tokenize(text, self.spans)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def accept(self, *values):
+        if self.peek()[1] in values and self.peek()[0] != 'string':
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value):
+        if not self.accept(value):
+            raise ValueError(f"Expected {value!r}, found {self.peek()[1]!r}")
+
+    def parse(self):
+        node = self.disjunction()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def disjunction(self):
+        node = self.conjunction()
+        while self.accept('OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept('AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept('NOT'):
+            return ('not', self.negation())
+        return self.comparison()
+
+    def comparison(self):
+        node = self.additive()
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value in COMPARISONS:
+                self.position += 1
+                node = ('cmp', value, node, self.additive())
+            elif self.accept('IS'):
+                negate = self.accept('NOT')
+                self.expect('NULL')
+                node = ('isnull', node, negate)
+            elif value in ('NOT', 'IN', 'BETWEEN', 'LIKE') and kind == 'keyword':
+                negate = self.accept('NOT')
+                if self.accept('IN'):
+                    self.expect('(')
+                    items = [self.additive()]
+                    while self.accept(','):
+                        items.append(self.additive())
+                    self.expect(')')
+                    node = ('in', node, items)
+                elif self.accept('BETWEEN'):
+                    low = self.additive()
+                    self.expect('AND')
+                    node = ('between', node, low, self.additive())
+                elif self.accept('LIKE'):
+                    node = ('like', node, self.additive())
+                else:
+                    raise ValueError(f"Expected IN, BETWEEN or LIKE after NOT")
+                if negate:
+                    node = ('not', node)
+            else:
+                return node
+
+    def additive(self):
+        node = self.multiplicative()
+        while self.peek()[0] == 'op' and self.peek()[1] in '+-':
+            op = self.tokens[self.position][1]
+            self.position += 1
+            node = ('arith', op, node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.unary()
+        while self.peek()[0] == 'op' and self.peek()[1] in '*/':
+            op = self.tokens[self.position][1]
+            self.position += 1
+            node = ('arith', op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ('op', '-'):
+            self.position += 1
+            return ('arith', '-', ('lit', 0), self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.peek()
+        self.position += 1
+        if kind == 'number':
+            return ('lit', float(value) if '.' in value else int(value))
+        if kind == 'string':
+            return ('lit', value[1:-1].replace("''", "'"))
+        if value == 'NULL':
+            return ('lit', None)
+        if value in ('TRUE', 'FALSE'):
+            return ('lit', value == 'TRUE')
+        if value == '(' and kind == 'op':
+            node = self.disjunction()
+            self.expect(')')
+            return node
+        if value == 'CASE':
+            return self.case()
+        if kind == 'name' and value in FUNCTIONS and self.peek() == ('op', '('):
+            return self.call(value)
+        if kind == 'name':
+            return ('col', value)
+        raise ValueError(f"Unexpected {value!r}")
+
+    def _source(self, start):
+        """The text from token start through the last token consumed"""
+        return self.text[self.spans[start][0]:self.spans[self.position - 1][1]]
+
+    def call(self, name):
+        start = self.position - 1
+        self.expect('(')
+        if name == 'COUNT' and self.accept('*'):
+            self.expect(')')
+            return ('agg', 'COUNT(*)', None, self._source(start))
+        distinct = name in AGGREGATES and self.accept('DISTINCT')
+        args = [self.disjunction()]
+        while self.accept(','):
+            args.append(self.disjunction())
+        self.expect(')')
+        if name in AGGREGATES:
+            if len(args) != 1 or (distinct and name != 'COUNT'):
+                raise ValueError(f"Unsupported aggregate call {name}")
+            return ('agg', 'COUNT_DISTINCT' if distinct else name, args[0], self._source(start))
+        return ('func', name, args)
+
+    def case(self):
+        base = None if self.peek()[1] == 'WHEN' else self.disjunction()
+        branches = []
+        while self.accept('WHEN'):
+            condition = self.disjunction()
+            if base is not None:
+                condition = ('cmp', '=', base, condition)
+            self.expect('THEN')
+            branches.append((condition, self.disjunction()))
+        if not branches:
+            raise ValueError("CASE needs at least one WHEN")
+        otherwise = self.disjunction() if self.accept('ELSE') else ('lit', None)
+        self.expect('END')
+        return ('case', branches, otherwise)
+
+
+def parse(text):
+    return _Parser(text).parse()
+
+
+# ----------------------------------------------------------------------------
+# Compiler: AST -> closures over (values, valid) pairs
+# ----------------------------------------------------------------------------
+
+def _column(batch, name):
+    """Resolve a column reference in a dict table or a JoinResult ('alias.column')"""
+    if isinstance(batch, JoinResult):
+        return batch.column(name)
+    if name in batch:
+        return batch[name]
+    if '.' in name and name.split('.', 1)[1] in batch:
+        return batch[name.split('.', 1)[1]]
+    raise KeyError(f"Unknown column: {name}")
+
+
+def _coerce(a, b):
+    """Compare dates with 'YYYY-MM-DD' literals the way SQLite compares date strings"""
+    if isinstance(b, str) and isinstance(a, np.ndarray) and a.dtype.kind == 'M':
+        return a, np.datetime64(b)
+    if isinstance(a, str) and isinstance(b, np.ndarray) and b.dtype.kind == 'M':
+        return np.datetime64(a), b
+    return a, b
+
+
+def _truth(values, valid):
+    """(TRUE, FALSE) masks of a boolean result"""
+    values = np.asarray(values, dtype=bool)
+    return values & valid, ~values & valid
+
+
+def _choose(condition, a, b):
+    """np.where that tolerates NULL literals (None) on either side"""
+    if a is None:
+        a = b
+    if b is None:
+        b = a
+    return None if a is None else np.where(condition, a, b)
+
+
+def _divide(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    safe = np.where(b == 0, 1, b)
+    if a.dtype.kind in 'iu' and b.dtype.kind in 'iu':
+        # SQLite truncates integer division toward zero
+        quotient = np.abs(a) // np.abs(safe)
+        return np.where((a < 0) != (safe < 0), -quotient, quotient)
+    return a / safe
+
+
+ARITHMETIC = {'+': np.add, '-': np.subtract, '*': np.multiply}
+ROW_ARITHMETIC = {'+': add, '-': sub, '*': mul}
+
+
+def _like_regex(pattern):
+    """SQLite LIKE: % and _ wildcards, case-insensitive for ASCII"""
+    parts = ('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class CompiledExpression:
+    """A SQL expression compiled into NumPy operations; call it on a batch to get a Column"""
+
+    def __init__(self, text):
+        self.text = text
+        self.aggregates = []
+        self._calls = []
+        self.columns = set()
+        self._evaluate = self._compile(parse(text))
+
+    def __call__(self, batch):
+        n_rows = len(batch) if isinstance(batch, JoinResult) else table_length(batch)
+        values, valid = self._evaluate(batch)
+        values = np.broadcast_to(0 if values is None else values, n_rows)
+        valid = np.broadcast_to(np.asarray(valid, dtype=bool), n_rows)
+        return Column(values, valid)
+
+    def mask(self, batch):
+        """Rows where the predicate is TRUE (FALSE and UNKNOWN are both filtered out)"""
+        result = self(batch)
+        return np.asarray(result.values, dtype=bool) & result.valid
+
+    def _compile(self, node):
+        kind = node[0]
+        if kind == 'lit':
+            value = node[1]
+            # NULL is (None, False); operators treat a None value as an all-NULL operand
+            return lambda batch: (value, value is not None)
+        if kind == 'col':
+            name = node[1]
+            self.columns.add(name)
+
+            def column(batch):
+                col = _column(batch, name)
+                return col.values, col.valid
+            return column
+        if kind == 'agg':
+            # HAVING: each distinct aggregate call becomes a hidden column of the
+            # grouped result, named in plans by its SQL text
+            if node[:3] in self._calls:
+                alias = self.aggregates[self._calls.index(node[:3])][0]
+            else:
+                alias = f'__agg{len(self.aggregates)}'
+                argument = None if node[2] is None else self._compile(node[2])
+                self.aggregates.append((alias, node[1], argument, node[3]))
+                self._calls.append(node[:3])
+            return self._compile(('col', alias))
+        if kind == 'cmp':
+            return self._comparison(node)
+        if kind in ('and', 'or'):
+            left, right = self._compile(node[1]), self._compile(node[2])
+
+            def logical(batch):
+                a_true, a_false = _truth(*left(batch))
+                b_true, b_false = _truth(*right(batch))
+                if kind == 'and':
+                    true, false = a_true & b_true, a_false | b_false
+                else:
+                    true, false = a_true | b_true, a_false & b_false
+                return true, true | false
+            return logical
+        if kind == 'not':
+            operand = self._compile(node[1])
+
+            def negation(batch):
+                values, valid = operand(batch)
+                return ~np.asarray(values, dtype=bool), valid
+            return negation
+        if kind == 'isnull':
+            operand, negate = self._compile(node[1]), node[2]
+
+            def is_null(batch):
+                _, valid = operand(batch)
+                return (valid if negate else ~np.asarray(valid, dtype=bool)), True
+            return is_null
+        if kind == 'in':
+            return self._membership(node)
+        if kind == 'between':
+            _, operand, low, high = node
+            return self._compile(('and', ('cmp', '>=', operand, low), ('cmp', '<=', operand, high)))
+        if kind == 'like':
+            return self._like(node)
+        if kind == 'arith':
+            return self._arithmetic(node)
+        if kind == 'func':
+            return self._function(node)
+        if kind == 'case':
+            return self._case(node)
+        raise ValueError(f"Cannot compile {kind}")
+
+    def _comparison(self, node):
+        _, op, left_node, right_node = node
+        left, right = self._compile(left_node), self._compile(right_node)
+        compare = COMPARISONS[op]
+        # Dictionary columns compare codes against a literal's code instead of strings
+        if op in ('=', '==', '<>', '!=') and left_node[0] == 'col' and right_node[0] == 'lit':
+            name, literal = left_node[1], right_node[1]
+
+            def dictionary_compare(batch):
+                col = _column(batch, name)
+                if isinstance(col, DictionaryColumn) and isinstance(literal, str):
+                    return compare(col.codes, col.code_of(literal)), col.valid
+                if literal is None:
+                    return False, False
+                a, b = _coerce(col.values, literal)
+                return compare(a, b), col.valid
+            return dictionary_compare
+
+        def comparison(batch):
+            a, a_valid = left(batch)
+            b, b_valid = right(batch)
+            if a is None or b is None:
+                return False, False
+            a, b = _coerce(a, b)
+            return compare(a, b), a_valid & b_valid
+        return comparison
+
+    def _membership(self, node):
+        _, operand_node, items = node
+        literals = [item[1] for item in items if item[0] == 'lit']
+        if len(literals) < len(items):
+            # General form: x IN (a, b) is x = a OR x = b, with the same NULL rules
+            chain = ('cmp', '=', operand_node, items[0])
+            for item in items[1:]:
+                chain = ('or', chain, ('cmp', '=', operand_node, item))
+            return self._compile(chain)
+        values = [v for v in literals if v is not None]
+        has_null = len(values) < len(literals)
+        operand = self._compile(operand_node)
+
+        def membership(batch):
+            if operand_node[0] == 'col':
+                col = _column(batch, operand_node[1])
+                if isinstance(col, DictionaryColumn):
+                    codes = [col.code_of(v) for v in values]
+                    found = np.isin(col.codes, [c for c in codes if c >= 0])
+                    return found, col.valid & (found | (not has_null))
+            a, a_valid = operand(batch)
+            if a is None:
+                return False, False
+            targets = [_coerce(a, v)[1] for v in values]
+            found = np.isin(a, targets) if targets else np.zeros(np.shape(a), dtype=bool)
+            return found, a_valid & (found | (not has_null))
+        return membership
+
+    def _like(self, node):
+        _, operand_node, pattern_node = node
+        if pattern_node[0] != 'lit' or not isinstance(pattern_node[1], str):
+            raise ValueError("LIKE needs a string literal pattern")
+        regex = _like_regex(pattern_node[1])
+        operand = self._compile(operand_node)
+
+        def like(batch):
+            if operand_node[0] == 'col':
+                col = _column(batch, operand_node[1])
+                if isinstance(col, DictionaryColumn):
+                    matches = np.array([bool(regex.fullmatch(v)) for v in col.dictionary.tolist()],
+                                       dtype=bool)
+                    return matches[col.codes], col.valid
+            values, valid = operand(batch)
+            if values is None:
+                return False, False
+            # Match each distinct string once
+            uniques, inverse = hash_factorize(np.asarray(values, dtype=object))
+            matches = np.array([bool(regex.fullmatch(str(v))) for v in uniques.tolist()],
+                               dtype=bool)
+            return matches[inverse], valid
+        return like
+
+    def _arithmetic(self, node):
+        _, op, left_node, right_node = node
+        left, right = self._compile(left_node), self._compile(right_node)
+
+        def arithmetic(batch):
+            a, a_valid = left(batch)
+            b, b_valid = right(batch)
+            if a is None or b is None:
+                return None, False
+            if op == '/':
+                return _divide(a, b), a_valid & b_valid & (np.asarray(b) != 0)
+            return ARITHMETIC[op](a, b), a_valid & b_valid
+        return arithmetic
+
+    def _function(self, node):
+        _, name, arg_nodes = node
+        args = [self._compile(arg) for arg in arg_nodes]
+        if name == 'COALESCE':
+            def coalesce(batch):
+                values, valid = args[-1](batch)
+                for arg in reversed(args[:-1]):
+                    a, a_valid = arg(batch)
+                    values = _choose(a_valid, a, values)
+                    valid = a_valid | valid
+                return values, valid
+            return coalesce
+        if name == 'NULLIF':
+            if len(args) != 2:
+                raise ValueError("NULLIF takes two arguments")
+            equal = self._compile(('cmp', '=', arg_nodes[0], arg_nodes[1]))
+
+            def nullif(batch):
+                values, valid = args[0](batch)
+                same, same_valid = equal(batch)
+                return values, valid & ~(np.asarray(same, dtype=bool) & same_valid)
+            return nullif
+        if name == 'ABS':
+            def absolute(batch):
+                values, valid = args[0](batch)
+                return (None, False) if values is None else (np.abs(values), valid)
+            return absolute
+        if name == 'LENGTH':
+            return self._length(arg_nodes[0], args[0])
+        raise ValueError(f"Unsupported function {name}")
+
+    def _length(self, operand_node, operand):
+        """LENGTH in characters; dictionary columns measure each distinct string once"""
+        def length(batch):
+            if operand_node[0] == 'col':
+                col = _column(batch, operand_node[1])
+                if isinstance(col, DictionaryColumn):
+                    sizes = np.char.str_len(col.dictionary.astype(str)) if len(col.dictionary) \
+                        else np.zeros(1, dtype=np.int64)
+                    return sizes[col.codes], col.valid
+            values, valid = operand(batch)
+            if values is None:
+                return None, False
+            return np.char.str_len(np.asarray(values).astype(str)), valid
+        return length
+
+    def _case(self, node):
+        _, branches, otherwise = node
+        compiled = [(self._compile(c), self._compile(v)) for c, v in branches]
+        default = self._compile(otherwise)
+
+        def case(batch):
+            values, valid = default(batch)
+            # Later branches first, so the first matching WHEN wins
+            for condition, result in reversed(compiled):
+                chosen, _ = _truth(*condition(batch))
+                a, a_valid = result(batch)
+                values = _choose(chosen, a, values)
+                valid = np.where(chosen, a_valid, valid)
+            return values, valid
+        return case
+
+
+def compile_expression(text):
+    return CompiledExpression(text)
+
+
+def where(table, predicate):
+    """SELECT * FROM table WHERE predicate; predicate is SQL text or a CompiledExpression"""
+    if isinstance(predicate, str):
+        predicate = compile_expression(predicate)
+    with operator('Filter', predicate.text) as op:
+        mask = predicate.mask(table)
+        op.count(rows_in=len(mask), rows_out=np.count_nonzero(mask), bytes=mask.nbytes)
+        if isinstance(table, JoinResult):
+            return table.filter(mask)
+        return {name: column.filter(mask) for name, column in table.items()}
+
+
+def having(table, keys, aggregates, predicate):
+    """group_by(table, keys, aggregates) filtered by a HAVING predicate over aggregate calls"""
+    if isinstance(predicate, str):
+        predicate = compile_expression(predicate)
+    hidden, labels = [], {}
+    for alias, func, argument, text in predicate.aggregates:
+        source = None
+        if argument is not None:
+            values, valid = argument(table)
+            n_rows = table_length(table)
+            source = Column(np.broadcast_to(values, n_rows),
+                            np.broadcast_to(np.asarray(valid, dtype=bool), n_rows))
+        hidden.append((alias, func, source))
+        labels[alias] = text
+    result = group_by(table, keys, aggregates + hidden, labels)
+    with operator('Filter', f'HAVING {predicate.text}') as op:
+        mask = predicate.mask(result)
+        op.count(rows_in=len(mask), rows_out=np.count_nonzero(mask), bytes=mask.nbytes)
+        return {name: column.filter(mask) for name, column in result.items()
+                if not name.startswith('__agg')}
+
+
+# ----------------------------------------------------------------------------
+# Row-at-a-time reference interpreter
+# ----------------------------------------------------------------------------
+
+ROW_COMPARISONS = {'=': eq, '==': eq, '<>': ne, '!=': ne, '<': lt, '<=': le, '>': gt, '>=': ge}
+
+
+def _row_compare(op, a, b):
+    if a is None or b is None:
+        return None
+    if isinstance(a, datetime.date) and isinstance(b, str):
+        b = datetime.date.fromisoformat(b)
+    elif isinstance(b, datetime.date) and isinstance(a, str):
+        a = datetime.date.fromisoformat(a)
+    return ROW_COMPARISONS[op](a, b)
+
+
+def evaluate_row(node, row):
+    """Evaluate the AST for one row (dict of Python values, None = NULL)"""
+    kind = node[0]
+    if kind == 'lit':
+        return node[1]
+    if kind == 'col':
+        name = node[1]
+        return row[name] if name in row else row[name.split('.', 1)[1]]
+    if kind == 'cmp':
+        return _row_compare(node[1], evaluate_row(node[2], row), evaluate_row(node[3], row))
+    if kind == 'and':
+        a, b = evaluate_row(node[1], row), evaluate_row(node[2], row)
+        if a is False or b is False:
+            return False
+        return None if a is None or b is None else True
+    if kind == 'or':
+        a, b = evaluate_row(node[1], row), evaluate_row(node[2], row)
+        if a is True or b is True:
+            return True
+        return None if a is None or b is None else False
+    if kind == 'not':
+        a = evaluate_row(node[1], row)
+        return None if a is None else not a
+    if kind == 'isnull':
+        return (evaluate_row(node[1], row) is None) != node[2]
+    if kind == 'in':
+        a = evaluate_row(node[1], row)
+        items = [evaluate_row(item, row) for item in node[2]]
+        if a is None:
+            return None
+        if a in [i for i in items if i is not None]:
+            return True
+        return None if None in items else False
+    if kind == 'between':
+        a = evaluate_row(node[1], row)
+        return evaluate_row(('and', ('cmp', '>=', ('lit', a), node[2]),
+                             ('cmp', '<=', ('lit', a), node[3])), row)
+    if kind == 'like':
+        a = evaluate_row(node[1], row)
+        return None if a is None else bool(_like_regex(node[2][1]).fullmatch(str(a)))
+    if kind == 'arith':
+        a, b = evaluate_row(node[2], row), evaluate_row(node[3], row)
+        if a is None or b is None or (node[1] == '/' and b == 0):
+            return None
+        if node[1] == '/':
+            return int(a / b) if isinstance(a, int) and isinstance(b, int) else a / b
+        return ROW_ARITHMETIC[node[1]](a, b)
+    if kind == 'func':
+        args = [evaluate_row(arg, row) for arg in node[2]]
+        if node[1] == 'COALESCE':
+            return next((a for a in args if a is not None), None)
+        if node[1] == 'NULLIF':
+            return None if _row_compare('=', *args) else args[0]
+        if node[1] == 'LENGTH':
+            return None if args[0] is None else len(str(args[0]))
+        return None if args[0] is None else abs(args[0])
+    if kind == 'case':
+        for condition, result in node[1]:
+            if evaluate_row(condition, row) is True:
+                return evaluate_row(result, row)
+        return evaluate_row(node[2], row)
+    raise ValueError(f"Cannot evaluate {kind} row by row")
+
+
+def where_rows(table, text):
+    """The row-by-row baseline: evaluate the predicate once per row in Python"""
+    node = parse(text)
+    names = list(table)
+    columns = [c.to_list() for c in table.values()]
+    return [i for i, values in enumerate(zip(*columns))
+            if evaluate_row(node, dict(zip(names, values))) is True]
+
+
+# ----------------------------------------------------------------------------
+# Checks and benchmark
+# ----------------------------------------------------------------------------
+
+def check_three_valued_logic():
+    """Every predicate over NULL-heavy rows matches SQLite and the row interpreter"""
+    table = {
+        'a': Column.from_list([1, None, 3, 0, None, 5, -7]),
+        'b': Column.from_list([None, 2.5, 3.0, 0.0, None, 1.0, 2.0]),
+        's': Column.from_list(['New York', 'Boston', None, 'new york', 'Newark', 'York', None]),
+    }
+    predicates = [
+        "a > 1 AND b < 3", "a > 1 OR b < 3", "NOT (a > 1)", "a IS NULL OR b IS NOT NULL",
+        "a IN (1, 3)", "a IN (1, NULL)", "a NOT IN (1, NULL)", "a NOT IN (1, 3)",
+        "b BETWEEN 1 AND 2.5", "a NOT BETWEEN 0 AND 3", "s LIKE 'new%'", "s NOT LIKE '%York'",
+        "COALESCE(a, 0) + COALESCE(b, 0) > 2", "NULLIF(a, 3) IS NULL", "a / 2 = 0",
+        "a / 0 IS NULL", "-a > 0", "ABS(a) > 4", "LENGTH(s) > 4", "LENGTH(a) = 1",
+        "CASE WHEN a > 2 THEN 'big' WHEN a IS NULL THEN NULL ELSE 'small' END = 'small'",
+        "CASE s WHEN 'Boston' THEN 1 WHEN 'York' THEN 2 END IS NOT NULL",
+        "s = 'New York' AND NOT (b > 2 OR a IS NULL)", "(a > 0) = (b > 2)",
+    ]
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (a INTEGER, b REAL, s TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                     zip(*(c.to_list() for c in table.values())))
+    encoded = dict(table, s=dictionary_encode(table['s']))
+    for text in predicates:
+        expected = [r[0] - 1 for r in conn.execute(f"SELECT rowid FROM t WHERE {text}")]
+        for batch in (table, encoded):
+            actual = np.flatnonzero(compile_expression(text).mask(batch)).tolist()
+            assert actual == expected, (text, actual, expected)
+        assert where_rows(table, text) == expected, text
+    conn.close()
+    return len(predicates)
+
+
+def _timed(func, repeat=1):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+SALES_PREDICATES = [
+    "COALESCE(discount, 0) > 10 OR quantity IS NULL",
+    "region IN ('North', 'East') AND sale_date >= '2024-01-18' "
+    "AND NOT discount BETWEEN 5 AND 20",
+    "CASE WHEN quantity >= 10 THEN 'bulk' WHEN quantity IS NULL THEN NULL "
+    "ELSE 'single' END = 'bulk' AND quantity * unit_price > 1000",
+    "customer_id NOT IN (1, 2, NULL)",
+    "region LIKE 'No%' AND NULLIF(quantity, 1) / 2 > 3",
+]
+
+HAVING_QUERIES = [
+    (['product_id'], [('total_sales', 'SUM', 'revenue')],
+     "SUM(quantity * unit_price) > 500",
+     "SELECT product_id, SUM(quantity * unit_price) FROM sales GROUP BY product_id "
+     "HAVING SUM(quantity * unit_price) > 500"),
+    (['product_id'], [('num_sales', 'COUNT(*)', None), ('avg_quantity', 'AVG', 'quantity')],
+     "COUNT(*) > 2 AND AVG(quantity) > 10 AND SUM(quantity * unit_price) > 1000",
+     "SELECT product_id, COUNT(*), AVG(quantity) FROM sales GROUP BY product_id "
+     "HAVING COUNT(*) > 2 AND AVG(quantity) > 10 AND SUM(quantity * unit_price) > 1000"),
+    (['region'], [('sales_count', 'COUNT(*)', None)],
+     "COUNT(*) > 1 AND AVG(unit_price) > 80 AND COUNT(DISTINCT customer_id) > 100",
+     "SELECT region, COUNT(*) FROM sales GROUP BY region "
+     "HAVING COUNT(*) > 1 AND AVG(unit_price) > 80 AND COUNT(DISTINCT customer_id) > 100"),
+]
+
+
+def run_benchmark(n_rows, row_sample, repeat):
+    sales = generate_sales(n_rows)
+    sales['revenue'] = sales['quantity'] * sales['unit_price']
+    conn = sqlite3.connect(':memory:')
+    load_into_sqlite(conn, 'sales', {k: v for k, v in sales.items() if k != 'revenue'})
+    encoded = dict(sales, region=dictionary_encode(sales['region']))
+    sample = {name: column.take(slice(0, row_sample)) for name, column in sales.items()}
+
+    print(f"\nScale: {n_rows:,} sales rows (row-by-row timed on {row_sample:,} and scaled)")
+    print(f"{'WHERE':<54}{'Rows/Python':>12}{'SQLite':>10}{'Compiled':>10}{'Speedup':>9}")
+    print("-" * 100)
+    for text in SALES_PREDICATES:
+        expression = compile_expression(text)
+        compiled_time, mask = _timed(lambda: expression.mask(encoded), repeat)
+        row_time, row_hits = _timed(lambda: where_rows(sample, text))
+        row_time *= n_rows / row_sample
+        sql = f"SELECT sale_id FROM sales WHERE {text}"
+        sqlite_time, sqlite_rows = _timed(lambda: conn.execute(sql).fetchall())
+        ok = (np.flatnonzero(mask[:row_sample]).tolist() == row_hits
+              and sorted(r[0] for r in sqlite_rows) == (sales['sale_id'].values[mask]).tolist())
+        label = text if len(text) <= 52 else text[:49] + '...'
+        print(f"{label:<54}{row_time:>11.2f}s{sqlite_time * 1000:>8.0f}ms"
+              f"{compiled_time * 1000:>8.1f}ms{row_time / compiled_time:>8.0f}x "
+              f"{'✓' if ok else '✗'} {int(mask.sum()):,}")
+
+    print(f"\n{'HAVING':<76}{'SQLite':>10}{'Compiled':>10}")
+    print("-" * 100)
+    for keys, aggregates, text, sql in HAVING_QUERIES:
+        compiled_time, result = _timed(lambda: having(encoded, keys, aggregates, text), repeat)
+        sqlite_time, expected = _timed(lambda: conn.execute(sql).fetchall())
+        ok = rows_match(expected, result_rows(result), n_keys=len(keys))
+        label = text if len(text) <= 74 else text[:71] + '...'
+        print(f"{label:<76}{sqlite_time * 1000:>8.0f}ms{compiled_time * 1000:>8.1f}ms "
+              f"{'✓' if ok else '✗'} {len(expected):,} groups")
+    conn.close()
+
+
+def run_join_filter(n_employees, repeat):
+    """The SECTION 1/10 filters over employees JOIN departments, on the lazy join result"""
+    n_departments = max(4, n_employees // 50)
+    relations = {'e': generate_employees(n_employees, n_departments),
+                 'd': generate_departments(n_departments)}
+    joined = join_results(JoinResult.scan(relations, 'e'), JoinResult.scan(relations, 'd'),
+                          [('e.dept_id', 'd.dept_id')])
+    text = "e.salary > 50000 AND d.location = 'New York'"
+    expression = compile_expression(text)
+    compiled_time, filtered = _timed(lambda: where(joined, expression), repeat)
+    salary, location = joined.column('e.salary'), joined.column('d.location')
+    expected = (salary.values > 50000) & (location.values == 'New York')
+    print(f"\n{text} over {len(joined):,} joined rows: {compiled_time * 1000:.1f}ms, "
+          f"gathering only {sorted(expression.columns)} "
+          f"{'✓' if len(filtered) == expected.sum() else '✗'} {len(filtered):,} rows")
+
+
+def main():
+    """Check three-valued logic against SQLite, then time compiled WHERE/HAVING"""
+    parser = argparse.ArgumentParser(description="Vectorized predicate compiler")
+    parser.add_argument('--rows', type=int, nargs='+', default=[2_000_000])
+    parser.add_argument('--row-sample', type=int, default=100_000)
+    parser.add_argument('--employees', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Predicate compiler")
+    print("=" * 100)
+    n_checks = check_three_valued_logic()
+    print(f"✓ {n_checks} predicates over NULL rows match SQLite, the row interpreter and "
+          "dictionary-encoded input")
+    for n_rows in args.rows:
+        run_benchmark(n_rows, min(args.row_sample, n_rows), args.repeat)
+    run_join_filter(args.employees, args.repeat)
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
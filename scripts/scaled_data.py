@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Scaled Synthetic Data for the Q5 & Q6 Example Schemas
+Generates columnar versions of the tables in sql/q5_join_examples.sql and
+sql/q6_groupby_examples.sql at arbitrary row counts (with realistic NULL
+fractions and orphaned keys) and loads them into SQLite, either without
+secondary indexes, inserting into the indexes from sql/ as rows arrive, or
+deferring those indexes until every batch is in
+"""
+
+import re
+import sqlite3
+
+import numpy as np
+
+from columnar import Column, table_length
+from sql_workload import index_statements
+
+REGIONS = np.array(['North', 'South', 'East', 'West'], dtype=object)
+CATEGORIES = np.array(['Electronics', 'Furniture', 'Office', 'Garden'], dtype=object)
+LOCATIONS = np.array(['New York', 'Los Angeles', 'San Francisco', 'Chicago',
+                      'Boston', 'Seattle'], dtype=object)
+
+# NULL fractions roughly follow the hand-written sample rows
+NULL_FRACTIONS = {
+    'customer_id': 0.10,
+    'quantity': 0.05,
+    'discount': 0.40,
+}
+
+SQLITE_DDL = {
+    'sales': """
+        CREATE TABLE sales (
+            sale_id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            customer_id INTEGER,
+            sale_date TEXT,
+            quantity INTEGER,
+            unit_price REAL,
+            discount REAL,
+            region TEXT
+        )""",
+    'products': """
+        CREATE TABLE products (
+            product_id INTEGER PRIMARY KEY,
+            product_name TEXT,
+            category TEXT
+        )""",
+    'customers': """
+        CREATE TABLE customers (
+            customer_id INTEGER PRIMARY KEY,
+            customer_name TEXT,
+            email TEXT
+        )""",
+    'employees': """
+        CREATE TABLE employees (
+            employee_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            dept_id INTEGER,
+            salary REAL,
+            hire_date TEXT,
+            manager_id INTEGER
+        )""",
+    'departments': """
+        CREATE TABLE departments (
+            dept_id INTEGER PRIMARY KEY,
+            dept_name TEXT NOT NULL,
+            location TEXT
+        )""",
+    'projects': """
+        CREATE TABLE projects (
+            project_id INTEGER PRIMARY KEY,
+            project_name TEXT,
+            dept_id INTEGER
+        )""",
+}
+
+
+def _nullable(rng, n_rows, fraction):
+    return rng.random(n_rows) >= fraction
+
+
+def generate_products(n_products=100, seed=42):
+    """Products with ids starting at 101, as in the sample data"""
+    rng = np.random.default_rng(seed)
+    product_id = np.arange(101, 101 + n_products, dtype=np.int64)
+    names = np.array([f'Product {i}' for i in product_id], dtype=object)
+    category = CATEGORIES[rng.integers(0, len(CATEGORIES), n_products)]
+    return {
+        'product_id': Column(product_id),
+        'product_name': Column(names),
+        'category': Column(category),
+    }
+
+
+def generate_customers(n_customers=10000, seed=42):
+    """Customers with roughly a third missing an email address"""
+    rng = np.random.default_rng(seed)
+    customer_id = np.arange(1, n_customers + 1, dtype=np.int64)
+    names = np.array([f'Customer {i}' for i in customer_id], dtype=object)
+    emails = np.array([f'customer{i}@example.com' for i in customer_id], dtype=object)
+    return {
+        'customer_id': Column(customer_id),
+        'customer_name': Column(names),
+        'email': Column(emails, _nullable(rng, n_customers, 0.3)),
+    }
+
+
+def generate_sales(n_rows, n_products=100, n_customers=10000, n_days=365, seed=42):
+    """Sales rows with NULL customer_id, quantity and discount values"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01')
+    sale_date = start + rng.integers(0, n_days, n_rows).astype('timedelta64[D]')
+    product_id = rng.integers(101, 101 + n_products, n_rows, dtype=np.int64)
+    # Price is a property of the product so AVG/MIN/MAX stay meaningful per group
+    price_table = np.round(rng.uniform(5, 500, n_products), 2)
+    return {
+        'sale_id': Column(np.arange(1, n_rows + 1, dtype=np.int64)),
+        'product_id': Column(product_id),
+        'customer_id': Column(rng.integers(1, n_customers + 1, n_rows, dtype=np.int64),
+                              _nullable(rng, n_rows, NULL_FRACTIONS['customer_id'])),
+        'sale_date': Column(sale_date),
+        'quantity': Column(rng.integers(1, 20, n_rows, dtype=np.int64),
+                           _nullable(rng, n_rows, NULL_FRACTIONS['quantity'])),
+        'unit_price': Column(price_table[product_id - 101]),
+        'discount': Column(np.round(rng.uniform(0, 25, n_rows), 2),
+                           _nullable(rng, n_rows, NULL_FRACTIONS['discount'])),
+        'region': Column(REGIONS[rng.integers(0, len(REGIONS), n_rows)]),
+    }
+
+
+def generate_departments(n_departments, seed=42):
+    """Departments with ids 10, 20, 30, ... as in the sample data"""
+    rng = np.random.default_rng(seed)
+    dept_id = np.arange(1, n_departments + 1, dtype=np.int64) * 10
+    names = np.array([f'Department {i}' for i in dept_id], dtype=object)
+    return {
+        'dept_id': Column(dept_id),
+        'dept_name': Column(names),
+        'location': Column(LOCATIONS[rng.integers(0, len(LOCATIONS), n_departments)]),
+    }
+
+
+def _department_ids(rng, n_rows, n_departments, skew):
+    """Department ids 10, 20, ...; skew > 0 gives Zipf-like weights 1 / rank**skew"""
+    if skew <= 0:
+        return rng.integers(1, n_departments + 1, n_rows, dtype=np.int64) * 10
+    weights = 1.0 / np.arange(1, n_departments + 1) ** skew
+    ranks = rng.choice(n_departments, size=n_rows, p=weights / weights.sum())
+    # Shuffle which department is "hot" so it is not always dept 10
+    return (rng.permutation(n_departments)[ranks] + 1).astype(np.int64) * 10
+
+
+def generate_employees(n_employees, n_departments, seed=42, skew=0.0):
+    """
+    Employees with a manager hierarchy.
+
+    About 5% have no department and 2% point at a department that does not
+    exist (like Eve and Frank in the sample data). Every employee except the
+    first reports to an earlier employee, so manager_id forms a tree.
+    """
+    rng = np.random.default_rng(seed)
+    employee_id = np.arange(1, n_employees + 1, dtype=np.int64)
+    dept_id = _department_ids(rng, n_employees, n_departments, skew)
+    orphaned = rng.random(n_employees) < 0.02
+    dept_id[orphaned] = (n_departments + 1 + rng.integers(0, 10, orphaned.sum())) * 10
+    start = np.datetime64('2015-01-01')
+    manager_id = np.floor(rng.random(n_employees) * (employee_id - 1)).astype(np.int64) + 1
+    return {
+        'employee_id': Column(employee_id),
+        'name': Column(np.array([f'Employee {i}' for i in employee_id], dtype=object)),
+        'dept_id': Column(dept_id, _nullable(rng, n_employees, 0.05)),
+        'salary': Column(np.round(rng.uniform(30000, 150000, n_employees), 2)),
+        'hire_date': Column(start + rng.integers(0, 3650, n_employees).astype('timedelta64[D]')),
+        'manager_id': Column(manager_id, employee_id > 1),
+    }
+
+
+def generate_projects(n_projects, n_departments, seed=42, skew=0.0):
+    """Projects assigned to random departments"""
+    rng = np.random.default_rng(seed)
+    project_id = np.arange(1, n_projects + 1, dtype=np.int64)
+    return {
+        'project_id': Column(project_id),
+        'project_name': Column(np.array([f'Project {i}' for i in project_id], dtype=object)),
+        'dept_id': Column(_department_ids(rng, n_projects, n_departments, skew)),
+    }
+
+
+def _sqlite_values(column):
+    values = column.values
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = np.datetime_as_string(values, unit='D').astype(object)
+    return Column(values, column.valid).to_list()
+
+
+INDEX_MODES = (None, 'indexed', 'deferred')
+
+
+def secondary_indexes(name):
+    """CREATE INDEX statements for a table from SECTION 8 of q5 and SECTION 11 of q6"""
+    found = {}
+    for statement in index_statements():
+        match = re.match(r'CREATE INDEX (\w+) ON (\w+)\s*\(', statement.sql, re.I)
+        if match and match.group(2) == name:
+            found.setdefault(match.group(1), statement.sql)
+    return list(found.values())
+
+
+def _primary_key(name):
+    return re.search(r'(\w+) INTEGER PRIMARY KEY', SQLITE_DDL[name]).group(1)
+
+
+def load_into_sqlite(conn, name, table, batch_size=500000, index_mode=None):
+    """
+    Create a table from SQLITE_DDL and bulk insert a columnar table into it.
+
+    index_mode=None creates no secondary indexes. 'indexed' creates the sql/
+    indexes first, so every row is inserted into every index as it arrives.
+    'deferred' sorts the rows by primary key, appends them to the table
+    B-tree in order, and only then builds each index with one sort-based
+    CREATE INDEX pass.
+    """
+    if index_mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode: {index_mode}")
+    conn.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.execute(SQLITE_DDL[name])
+    indexes = secondary_indexes(name) if index_mode else []
+    if index_mode == 'indexed':
+        for ddl in indexes:
+            conn.execute(ddl)
+    columns = list(table)
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({placeholders})"
+    n_rows = table_length(table)
+    if index_mode == 'deferred':
+        key = table[_primary_key(name)].values
+        if n_rows > 1 and not np.all(key[1:] > key[:-1]):
+            order = np.argsort(key, kind='stable')
+            table = {c: table[c].take(order) for c in columns}
+    for start in range(0, n_rows, batch_size):
+        stop = min(start + batch_size, n_rows)
+        chunk = [_sqlite_values(table[c].take(slice(start, stop))) for c in columns]
+        conn.executemany(sql, zip(*chunk))
+    if index_mode == 'deferred':
+        for ddl in indexes:
+            conn.execute(ddl)
+    conn.commit()
+
+
+def create_sales_database(n_rows, path=':memory:', seed=42, index_mode=None):
+    """Return a SQLite connection holding scaled sales, products and customers"""
+    conn = sqlite3.connect(path)
+    load_into_sqlite(conn, 'products', generate_products(seed=seed), index_mode=index_mode)
+    load_into_sqlite(conn, 'customers', generate_customers(seed=seed), index_mode=index_mode)
+    load_into_sqlite(conn, 'sales', generate_sales(n_rows, seed=seed), index_mode=index_mode)
+    return conn
+
+
+def create_hr_database(n_employees, path=':memory:', seed=42, index_mode=None):
+    """Return a SQLite connection holding scaled employees, departments and projects"""
+    n_departments = max(4, n_employees // 50)
+    conn = sqlite3.connect(path)
+    load_into_sqlite(conn, 'departments', generate_departments(n_departments, seed=seed),
+                     index_mode=index_mode)
+    load_into_sqlite(conn, 'employees', generate_employees(n_employees, n_departments, seed=seed),
+                     index_mode=index_mode)
+    load_into_sqlite(conn, 'projects', generate_projects(n_departments * 2, n_departments, seed=seed),
+                     index_mode=index_mode)
+    return conn
+
+
+def create_example_database(n_sales, n_employees, path=':memory:', seed=42, index_mode=None):
+    """Return a SQLite connection holding every scaled Q5 and Q6 table"""
+    conn = create_hr_database(n_employees, path, seed=seed, index_mode=index_mode)
+    load_into_sqlite(conn, 'products', generate_products(seed=seed), index_mode=index_mode)
+    load_into_sqlite(conn, 'customers', generate_customers(seed=seed), index_mode=index_mode)
+    load_into_sqlite(conn, 'sales', generate_sales(n_sales, seed=seed), index_mode=index_mode)
+    return conn
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Cached SQL Runner for the Example Queries
+Repeated report builds run the same SELECTs from sql/*.sql against tables
+that have not changed. SQLRunner wraps a SQLite connection with two caches:
+
+- a prepared-statement LRU: statements are normalized (comments stripped,
+  whitespace collapsed, keywords and identifiers case-folded outside quotes)
+  so equivalent texts share one entry, and the LRU has the same capacity as
+  the connection's own sqlite3 statement cache, so a hit usually reuses the
+  compiled statement and the tables it touches
+- a result cache keyed on normalized SQL and parameters, valid while the
+  version counters of every table the query read are unchanged
+
+Which tables a statement reads and writes comes from a SQLite authorizer
+callback installed once per connection: it fires while SQLite prepares a
+statement and reports base tables behind views, CTEs and subqueries as well
+as tables written by triggers. The two caches do not evict in lockstep, so
+when an LRU miss runs a statement sqlite3 still had compiled, the tables are
+collected by compiling an EXPLAIN of it instead. Successful writes bump the written tables'
+versions. Schema changes and commits from other connections (PRAGMA
+data_version) invalidate every result and every prepared statement (a
+redefined view reads different tables), a ROLLBACK re-bumps the tables
+written in the transaction, and queries calling random(), changes() or
+'now'-style time functions are never cached.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+
+from scaled_data import create_example_database
+from sql_workload import runnable_queries
+
+QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])""")
+COMMENTS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|--[^\n]*|/\*.*?\*/""", re.S)
+QUERY_KINDS = ('select', 'with', 'values')
+TRANSACTION_KINDS = ('begin', 'commit', 'end', 'rollback', 'savepoint', 'release')
+SCHEMA_ACTIONS = {
+    sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_TEMP_INDEX,
+    sqlite3.SQLITE_CREATE_TEMP_TABLE, sqlite3.SQLITE_CREATE_TEMP_TRIGGER,
+    sqlite3.SQLITE_CREATE_TEMP_VIEW, sqlite3.SQLITE_CREATE_TRIGGER, sqlite3.SQLITE_CREATE_VIEW,
+    sqlite3.SQLITE_DROP_INDEX, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_TEMP_INDEX,
+    sqlite3.SQLITE_DROP_TEMP_TABLE, sqlite3.SQLITE_DROP_TEMP_TRIGGER,
+    sqlite3.SQLITE_DROP_TEMP_VIEW, sqlite3.SQLITE_DROP_TRIGGER, sqlite3.SQLITE_DROP_VIEW,
+    sqlite3.SQLITE_ALTER_TABLE, sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH,
+    sqlite3.SQLITE_CREATE_VTABLE, sqlite3.SQLITE_DROP_VTABLE,
+}
+WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+VOLATILE_FUNCTIONS = {'random', 'randomblob', 'changes', 'total_changes', 'last_insert_rowid'}
+TIME_FUNCTIONS = {'date', 'time', 'datetime', 'julianday', 'strftime', 'unixepoch'}
+NOW = re.compile(r"\b(?:current_date|current_time|current_timestamp)\b|'now'")
+
+
+def normalize(sql):
+    """Canonical statement text: comments dropped, whitespace and case folded outside quotes"""
+    sql = COMMENTS.sub(lambda m: m.group(1) or ' ', sql)
+    parts = QUOTED.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = ' '.join(parts[i].split()).lower()
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+class PreparedStatement:
+    """A normalized statement and what the authorizer saw while SQLite compiled it"""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.kind = sql.split(None, 1)[0] if sql else ''
+        self.reads = set()
+        self.writes = set()
+        # Set once the authorizer has seen SQLite compile the statement
+        self.compiled = False
+        self.schema_change = False
+        self.transaction = None
+        self.volatile = False
+
+    @property
+    def cacheable(self):
+        return (self.kind in QUERY_KINDS and not self.writes and not self.schema_change
+                and not self.volatile)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache:
+    """OrderedDict LRU; get() refreshes recency, put() evicts the oldest entry"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.stats = CacheStats()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if self.capacity <= 0:
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class SQLRunner:
+    """
+    Execute SQL through a prepared-statement LRU and a version-checked result cache.
+
+    conn must have been opened with cached_statements=statement_capacity (or
+    fewer); use SQLRunner.connect() to get a matching connection. Every
+    statement on conn should go through the runner so writes are seen.
+    """
+
+    def __init__(self, conn, statement_capacity=128, result_capacity=256, max_result_rows=200_000):
+        self.conn = conn
+        self.statements = LRUCache(statement_capacity)
+        self.results = LRUCache(result_capacity)
+        self.max_result_rows = max_result_rows
+        self.versions = {}
+        # Bumped on schema changes and on commits by other connections
+        self.epoch = 0
+        self._dirty = set()
+        self._preparing = None
+        self._data_version = self._read_data_version()
+        # Installed once: setting an authorizer expires every prepared statement
+        conn.set_authorizer(self._authorize)
+
+    @classmethod
+    def connect(cls, path, statement_capacity=128, **options):
+        conn = sqlite3.connect(path, cached_statements=max(statement_capacity, 0))
+        return cls(conn, statement_capacity, **options)
+
+    def _read_data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _authorize(self, action, arg1, arg2, database, trigger):
+        statement = self._preparing
+        if (statement is not None and action == sqlite3.SQLITE_TRANSACTION
+                and statement.kind not in TRANSACTION_KINDS):
+            # sqlite3's implicit BEGIN before a write, not the statement itself
+            statement = None
+        if statement is not None:
+            statement.compiled = True
+            if action == sqlite3.SQLITE_READ and arg1:
+                statement.reads.add(arg1.lower())
+            elif action in WRITE_ACTIONS and arg1:
+                statement.writes.add(arg1.lower())
+            elif action in SCHEMA_ACTIONS:
+                statement.schema_change = True
+            elif action == sqlite3.SQLITE_FUNCTION:
+                name = (arg2 or '').lower()
+                if name in VOLATILE_FUNCTIONS or (name in TIME_FUNCTIONS and NOW.search(statement.sql)):
+                    statement.volatile = True
+            elif action in (sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT) and arg1:
+                statement.transaction = arg1.upper()
+        # conn.commit()/rollback() called directly also pass through here
+        if action == sqlite3.SQLITE_TRANSACTION and statement is None and arg1:
+            self._end_transaction(arg1.upper())
+        return sqlite3.SQLITE_OK
+
+    def _end_transaction(self, operation):
+        if operation == 'ROLLBACK':
+            # Results cached inside the transaction saw writes that no longer exist
+            self._bump(self._dirty)
+        if operation in ('COMMIT', 'END', 'ROLLBACK'):
+            self._dirty = set()
+
+    def _bump(self, tables):
+        for table in tables:
+            self.versions[table] = self.versions.get(table, 0) + 1
+
+    def _snapshot(self, tables):
+        return (self.epoch,) + tuple(sorted((t, self.versions.get(t, 0)) for t in tables))
+
+    def _check_external_writes(self):
+        """True if another connection committed; its schema may have changed too"""
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        self.epoch += 1
+        self.statements.clear()
+        return True
+
+    def prepare(self, sql):
+        """The cached PreparedStatement for sql (normalized text is the cache key)"""
+        key = normalize(sql)
+        statement = self.statements.get(key)
+        if statement is not None:
+            self.statements.stats.hits += 1
+            return statement, None
+        self.statements.stats.misses += 1
+        statement = PreparedStatement(key)
+        statement.volatile = bool(NOW.search(key)) and statement.kind in QUERY_KINDS
+        return statement, key
+
+    def execute(self, sql, params=()):
+        """Run one statement and return its rows (a list of tuples)"""
+        statement, new_key = self.prepare(sql)
+        use_results = self.results.capacity > 0 and statement.kind in QUERY_KINDS
+        if use_results and self._check_external_writes():
+            statement, new_key = self.prepare(sql)
+        # Tables read are known only once the statement has been compiled
+        if use_results and new_key is None and statement.cacheable:
+            start = time.perf_counter()
+            entry = self.results.get((statement.sql, tuple(params)))
+            if entry is not None:
+                snapshot, rows, seconds = entry
+                if snapshot == self._snapshot(statement.reads):
+                    self.results.stats.hits += 1
+                    self.results.stats.seconds_saved += seconds - (time.perf_counter() - start)
+                    return list(rows)
+                self.results.stats.invalidations += 1
+                self.results.pop((statement.sql, tuple(params)))
+
+        start = time.perf_counter()
+        # A statement missing from the LRU is usually missing from sqlite3's own
+        # statement cache too, so SQLite compiles it and calls the authorizer
+        self._preparing = statement if new_key is not None else None
+        try:
+            rows = self.conn.execute(statement.sql, params).fetchall()
+        finally:
+            self._preparing = None
+        seconds = time.perf_counter() - start
+        if new_key is not None:
+            if not statement.compiled:
+                # The two caches evict differently: sqlite3 still held a compiled copy
+                self._authorize_without_running(statement, params)
+            self.statements.put(new_key, statement)
+
+        self._after_execute(statement)
+        if use_results and statement.cacheable:
+            self.results.stats.misses += 1
+            if len(rows) <= self.max_result_rows:
+                self.results.put((statement.sql, tuple(params)),
+                                 (self._snapshot(statement.reads), tuple(rows), seconds))
+        return rows
+
+    def _authorize_without_running(self, statement, params):
+        """Collect a statement's reads and writes by compiling an EXPLAIN of it"""
+        # Re-installing the authorizer expires every prepared statement, so the
+        # EXPLAIN is compiled afresh even if sqlite3 has cached it before
+        self.conn.set_authorizer(self._authorize)
+        self._preparing = statement
+        try:
+            self.conn.execute(f"EXPLAIN {statement.sql}", params).fetchall()
+        finally:
+            self._preparing = None
+
+    def _after_execute(self, statement):
+        if statement.schema_change:
+            # Cached statements keep the tables they read before, e.g. a redefined view's
+            self.epoch += 1
+            self.results.clear()
+            self.statements.clear()
+        if statement.writes:
+            self._bump(statement.writes)
+            if self.conn.in_transaction:
+                self._dirty |= statement.writes
+        if statement.transaction:
+            self._end_transaction(statement.transaction)
+        if not self.conn.in_transaction:
+            self._dirty = set()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def report(self):
+        lines = []
+        for name, cache in (('Prepared statements', self.statements), ('Results', self.results)):
+            s = cache.stats
+            line = (f"{name:<20} {s.hits:>6,} hits {s.misses:>6,} misses "
+                    f"({s.hit_rate:.0%} hit rate), {s.evictions:,} evicted")
+            if cache is self.results:
+                line += f", {s.invalidations:,} invalidated, {s.seconds_saved * 1000:,.0f}ms saved"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+# ----------------------------------------------------------------------------
+# Demo: repeated builds of the sql/ workload with writes in between
+# ----------------------------------------------------------------------------
+
+def run_build(runner, queries):
+    start = time.perf_counter()
+    results = [runner.execute(sql) for sql in queries]
+    return time.perf_counter() - start, results
+
+
+def check_fresh(path, sqls, results):
+    """Results equal what a fresh, uncached connection returns for the committed data"""
+    reference = sqlite3.connect(path)
+    try:
+        return all(reference.execute(sql).fetchall() == rows for sql, rows in zip(sqls, results))
+    finally:
+        reference.close()
+
+
+def check_drifted_caches(directory):
+    """
+    A repeated INSERT after result-cache hits: the hits refresh the runner's
+    LRU but not sqlite3's cache, so the runner has evicted the INSERT while
+    sqlite3 still holds it compiled and the authorizer stays silent
+    """
+    count = "SELECT COUNT(*), TOTAL(x) FROM {}"
+    script = [count.format('c'), count.format('b'), "INSERT INTO a VALUES (9)", count.format('b'),
+              count.format('c'), count.format('a'), "INSERT INTO a VALUES (9)", count.format('a')]
+    path = os.path.join(directory, 'drift.db')
+    runner = SQLRunner.connect(path, 3)
+    reference = sqlite3.connect(path)
+    try:
+        for table in 'abc':
+            runner.execute(f"CREATE TABLE {table} (x INTEGER)")
+        runner.commit()
+        for sql in script:
+            rows = runner.execute(sql)
+            runner.commit()
+            if sql.startswith('SELECT') and rows != reference.execute(sql).fetchall():
+                return False
+        return True
+    finally:
+        reference.close()
+        runner.conn.close()
+        os.remove(path)
+
+
+def check_view_redefinition(directory):
+    """A view redefined here or by another connection: its queries read the new tables"""
+    total = "SELECT SUM(x) FROM v"
+    path = os.path.join(directory, 'views.db')
+    runner = SQLRunner.connect(path)
+    other = sqlite3.connect(path)
+    try:
+        runner.conn.executescript("""
+            CREATE TABLE a (x INTEGER); CREATE TABLE b (x INTEGER); CREATE TABLE c (x INTEGER);
+            INSERT INTO a VALUES (2); INSERT INTO b VALUES (2); INSERT INTO c VALUES (3);
+            CREATE VIEW v AS SELECT x FROM a""")
+        results = [runner.execute(total)]
+        runner.execute("DROP VIEW v")
+        runner.execute("CREATE VIEW v AS SELECT x FROM b")
+        runner.commit()
+        results.append(runner.execute(total))
+        runner.execute("INSERT INTO b VALUES (40)")
+        runner.commit()
+        results.append(runner.execute(total))
+        other.executescript("DROP VIEW v; CREATE VIEW v AS SELECT x FROM c")
+        results.append(runner.execute(total))
+        runner.execute("INSERT INTO c VALUES (4)")
+        runner.commit()
+        results.append(runner.execute(total))
+        return results == [[(2,)], [(2,)], [(42,)], [(3,)], [(7,)]]
+    finally:
+        other.close()
+        runner.conn.close()
+        os.remove(path)
+
+
+WRITES = [
+    ("INSERT INTO sales one row", [
+        "INSERT INTO sales (sale_id, product_id, customer_id, sale_date, quantity, unit_price, "
+        "discount, region) VALUES (99999999, 101, 1, '2024-02-01', 3, 10.0, NULL, 'North')"]),
+    ("UPDATE employees salary", [
+        "UPDATE employees SET salary = salary + 1000 WHERE employee_id = 1"]),
+    ("ALTER TABLE products ADD COLUMN", ["ALTER TABLE products ADD COLUMN note TEXT"]),
+]
+
+
+def main():
+    """Replay the sql/ SELECTs as repeated builds and report cache hit rates and savings"""
+    parser = argparse.ArgumentParser(description="Result and prepared-statement caches")
+    parser.add_argument('--sales', type=int, default=50_000)
+    parser.add_argument('--employees', type=int, default=2_000)
+    parser.add_argument('--builds', type=int, default=3)
+    parser.add_argument('--statements', type=int, default=128, help="prepared-statement LRU size")
+    parser.add_argument('--lookups', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print("Cached SQL runner")
+    print("=" * 90)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'examples.db')
+    create_example_database(args.sales, args.employees, path).close()
+    runner = SQLRunner.connect(path, args.statements)
+    queries = [q.sql for q in runnable_queries(runner.conn)]
+    print(f"{len(queries)} runnable SELECTs from sql/, {args.sales:,} sales, "
+          f"{args.employees:,} employees")
+
+    for build in range(1, args.builds + 1):
+        seconds, results = run_build(runner, queries)
+        print(f"Build {build}: {seconds * 1000:8.1f}ms "
+              f"{'✓' if check_fresh(path, queries, results) else '✗'}")
+
+    for label, statements in WRITES:
+        hits = runner.results.stats.hits
+        for sql in statements:
+            runner.execute(sql)
+        runner.commit()
+        seconds, results = run_build(runner, queries)
+        recomputed = len(queries) - (runner.results.stats.hits - hits)
+        print(f"After {label:<32} {seconds * 1000:8.1f}ms, {recomputed:>2} queries recomputed "
+              f"{'✓' if check_fresh(path, queries, results) else '✗'}")
+
+    # Results cached inside a transaction must not survive its rollback
+    by_region = "SELECT region, COUNT(*) FROM sales GROUP BY region"
+    runner.execute(by_region)
+    runner.execute("DELETE FROM sales WHERE region = 'North'")
+    inside = runner.execute(by_region)
+    runner.rollback()
+    after = runner.execute(by_region)
+    ok = inside != after and check_fresh(path, [by_region], [after])
+    print(f"Rollback of an uncommitted DELETE invalidates cached results {'✓' if ok else '✗'}")
+
+    # A commit from another connection is noticed through PRAGMA data_version
+    other = sqlite3.connect(path)
+    other.execute("UPDATE sales SET quantity = 1 WHERE sale_id = 1")
+    other.commit()
+    other.close()
+    _, results = run_build(runner, queries)
+    print(f"Commit from another connection invalidates cached results "
+          f"{'✓' if check_fresh(path, queries, results) else '✗'}")
+    random_rows = [runner.execute("SELECT random()") for _ in range(3)]
+    print(f"Volatile queries (random()) are never cached "
+          f"{'✓' if len(set(map(tuple, random_rows))) == 3 else '✗'}")
+    print(f"Statement caches that evicted differently still see every write "
+          f"{'✓' if check_drifted_caches(directory) else '✗'}")
+    print(f"Queries on a view redefined here or elsewhere read its new tables "
+          f"{'✓' if check_view_redefinition(directory) else '✗'}")
+    # Statement hits skip SQLite's compile step; EXPLAIN compiles without running
+    compiler = sqlite3.connect(path, cached_statements=0)
+    start = time.perf_counter()
+    for sql in queries:
+        compiler.execute(f"EXPLAIN {sql}").fetchall()
+    compile_seconds = (time.perf_counter() - start) / len(queries)
+    compiler.close()
+    statement_hits = runner.statements.stats.hits
+    print()
+    print(runner.report())
+    print(f"{'':<20} compiling a workload query takes {compile_seconds * 1e6:.0f}us, so "
+          f"{statement_hits:,} statement hits saved ~{statement_hits * compile_seconds * 1000:.1f}ms")
+    runner.conn.close()
+
+    # Where compilation dominates: a parameterized point lookup, results uncached
+    lookup = "SELECT name, salary FROM employees WHERE employee_id = ?"
+    timings = {}
+    for capacity in (args.statements, 0):
+        uncached = SQLRunner.connect(path, capacity, result_capacity=0)
+        start = time.perf_counter()
+        for employee_id in range(1, args.lookups + 1):
+            uncached.execute(lookup, (employee_id % args.employees + 1,))
+        timings[capacity] = (time.perf_counter() - start) / args.lookups
+        uncached.conn.close()
+    print(f"Point lookup x{args.lookups:,}: {timings[args.statements] * 1e6:.1f}us with the "
+          f"statement LRU vs {timings[0] * 1e6:.1f}us re-preparing "
+          f"({timings[0] / timings[args.statements]:.1f}x)")
+    os.remove(path)
+    os.rmdir(directory)
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
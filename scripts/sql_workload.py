@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+SQL Workload Extraction for the Q5 & Q6 Example Files
+Splits sql/*.sql into individual statements tagged with their SECTION header,
+so tools can replay the example queries against scaled SQLite databases.
+Statements that SQLite cannot prepare (SQL Server syntax such as TOP, APPLY,
+YEAR() or SET SHOWPLAN_ALL) are filtered out by runnable_queries().
+"""
+
+import os
+import re
+import sqlite3
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sql')
+SQL_FILES = ['q5_join_examples.sql', 'q6_groupby_examples.sql']
+
+SECTION_PATTERN = re.compile(r'^--\s*(SECTION \d+: .*|SETUP.*|CLEANUP.*)$')
+
+
+class Statement:
+    """One SQL statement from an example file"""
+
+    def __init__(self, source, section, index, sql):
+        self.source = source
+        self.section = section
+        self.index = index
+        self.sql = sql
+
+    @property
+    def label(self):
+        section = self.section.split(':')[0] if self.section else 'preamble'
+        return f"{self.source} {section} #{self.index}"
+
+    @property
+    def kind(self):
+        return self.sql.split(None, 1)[0].upper() if self.sql else ''
+
+    def __repr__(self):
+        return f"Statement({self.label!r})"
+
+
+def _strip_comments(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    return re.sub(r'--[^\n]*', '', text)
+
+
+def split_statements(path):
+    """Parse a .sql file into Statement objects in file order"""
+    source = os.path.splitext(os.path.basename(path))[0].split('_')[0]
+    statements = []
+    section = None
+    buffer = []
+    counter = 0
+    with open(path, encoding='utf-8') as handle:
+        text = re.sub(r'/\*.*?\*/', '', handle.read(), flags=re.S)
+
+    def flush():
+        nonlocal buffer, counter
+        sql = ' '.join(_strip_comments('\n'.join(buffer)).split())
+        buffer = []
+        if sql:
+            counter += 1
+            statements.append(Statement(source, section, counter, sql))
+
+    for line in text.splitlines():
+        header = SECTION_PATTERN.match(line.strip())
+        if header:
+            flush()
+            section = header.group(1).strip()
+            counter = 0
+            continue
+        if line.strip().upper() == 'GO':
+            flush()
+            continue
+        code = re.sub(r'--[^\n]*', '', line)
+        buffer.append(line)
+        if code.rstrip().endswith(';'):
+            buffer[-1] = code.rstrip()[:-1]
+            flush()
+    flush()
+    return statements
+
+
+def load_statements(files=None):
+    """All statements from the example files"""
+    files = files or SQL_FILES
+    statements = []
+    for name in files:
+        statements.extend(split_statements(os.path.join(SQL_DIR, name)))
+    return statements
+
+
+def select_statements(files=None):
+    """Only the SELECT queries from the example files"""
+    return [s for s in load_statements(files) if s.kind == 'SELECT']
+
+
+def index_statements(files=None):
+    """CREATE INDEX statements from the example files"""
+    return [s for s in load_statements(files)
+            if s.sql.upper().startswith('CREATE INDEX')]
+
+
+def is_runnable(conn, sql):
+    """True if SQLite can prepare the statement against conn's schema"""
+    try:
+        conn.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def runnable_queries(conn, files=None):
+    """SELECT statements from sql/ that SQLite can execute on this database"""
+    return [s for s in select_statements(files) if is_runnable(conn, s.sql)]
+
+
+def main():
+    """List every example query and whether SQLite can run it"""
+    conn = sqlite3.connect(':memory:')
+    # Replay the example DDL and DML so the runnable check sees the full schema
+    for statement in load_statements():
+        if statement.kind in ('CREATE', 'ALTER', 'INSERT', 'UPDATE'):
+            try:
+                conn.execute(statement.sql)
+            except sqlite3.Error:
+                pass
+    print("Example queries in sql/")
+    print("=" * 70)
+    for statement in select_statements():
+        mark = '✓' if is_runnable(conn, statement.sql) else '✗'
+        print(f"{mark} {statement.label:<22} {statement.sql[:44]}")
+
+
+if __name__ == "__main__":
+    main()
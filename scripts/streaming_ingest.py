@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Micro-Batch Streaming Ingestion for the Q6 GROUP BY Queries
+The SECTION 1 queries of q6_groupby_examples.sql (sales per region, per
+product and per region and product) are written for batch recomputation.
+This pipeline keeps them current while sales arrive as JSONL and CSV drops:
+
+1. Tail: a reader thread polls the input directory and picks up drop files
+   in name order, deleting each once it is parsed, so the directory holds
+   only the backlog. Producers write to a .tmp name and rename, so a file is
+   only seen once it is complete. If the reader fails, the error is raised
+   in the aggregating thread
+2. Parse: each file is read line by line into micro-batches of at most
+   --batch-rows rows, so memory does not grow with file size
+3. Backpressure: micro-batches pass through a bounded queue. When the
+   aggregator falls behind, the reader blocks on the queue and stops
+   opening files; the backlog stays on disk instead of in memory
+4. Aggregate: each micro-batch is grouped by the GROUP BY engine into
+   decomposable partials (counts, non-NULL counts, sums, minima, maxima)
+   that are merged into the running per-group state
+5. Publish: at most every --snapshot-interval seconds the views are
+   finalized and written atomically to latest.json
+
+End-to-end latency is measured per drop file, from the moment it lands in
+the directory to the moment the first snapshot containing all of its rows is
+published. The final snapshot is checked against a batch GROUP BY over every
+row that was produced.
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from columnar import Column, table_length
+from groupby_engine import group_by, result_rows, rows_match
+from scaled_data import generate_sales
+
+FIELDS = ('sale_id', 'product_id', 'customer_id', 'sale_date', 'quantity', 'unit_price',
+          'discount', 'region')
+PARSED = {'product_id': np.int64, 'quantity': np.int64, 'unit_price': np.float64,
+          'region': object}
+
+# SECTION 1 of q6_groupby_examples.sql, with revenue = quantity * unit_price
+VIEWS = {
+    'sales_by_region': (['region'], [('total_sales', 'COUNT(*)', None)]),
+    'sales_by_product': (['product_id'], [('num_sales', 'COUNT(*)', None),
+                                          ('total_quantity', 'SUM', 'quantity'),
+                                          ('avg_price', 'AVG', 'unit_price'),
+                                          ('min_price', 'MIN', 'unit_price'),
+                                          ('max_price', 'MAX', 'unit_price')]),
+    'sales_by_region_product': (['region', 'product_id'], [('sales_count', 'COUNT(*)', None),
+                                                           ('total_revenue', 'SUM', 'revenue')]),
+}
+
+
+# ----------------------------------------------------------------------------
+# Incrementally maintained aggregates
+# ----------------------------------------------------------------------------
+
+def _partials(aggregates):
+    """Decompose aggregates into (alias, function, column, merge) partials"""
+    partials = []
+    for alias, func, column in aggregates:
+        if func in ('COUNT(*)', 'COUNT'):
+            partials.append((alias, func, column, 'add'))
+        elif func in ('SUM', 'AVG'):
+            # A non-NULL count next to every sum keeps SUM/AVG over only NULLs NULL
+            partials.append((f'{alias}__sum', 'SUM', column, 'add'))
+            partials.append((f'{alias}__count', 'COUNT', column, 'add'))
+        elif func in ('MIN', 'MAX'):
+            partials.append((alias, func, column, func.lower()))
+        else:
+            raise ValueError(f"Aggregate cannot be maintained incrementally: {func}")
+    return partials
+
+
+class IncrementalView:
+    """GROUP BY result kept current by merging per-batch partial aggregates"""
+
+    def __init__(self, keys, aggregates):
+        self.keys = keys
+        self.aggregates = aggregates
+        self.partials = _partials(aggregates)
+        self.groups = {}
+
+    def apply(self, batch):
+        """Merge one micro-batch into the running state"""
+        result = group_by(batch, self.keys, [p[:3] for p in self.partials])
+        keys = list(zip(*(result[k].to_list() for k in self.keys)))
+        values = [result[alias].to_list() for alias, _, _, _ in self.partials]
+        for i, key in enumerate(keys):
+            state = self.groups.get(key)
+            if state is None:
+                self.groups[key] = [column[i] for column in values]
+                continue
+            for j, (_, _, _, merge) in enumerate(self.partials):
+                value = values[j][i]
+                if merge == 'add':
+                    state[j] = (state[j] or 0) + (value or 0)
+                elif value is not None and (state[j] is None
+                                            or (value < state[j] if merge == 'min'
+                                                else value > state[j])):
+                    state[j] = value
+
+    def rows(self):
+        """Current result as key-ordered rows, with the view's NULL semantics"""
+        index = {alias: j for j, (alias, _, _, _) in enumerate(self.partials)}
+        rows = []
+        for key in sorted(self.groups, key=lambda k: tuple((v is None, v) for v in k)):
+            state = self.groups[key]
+            row = list(key)
+            for alias, func, _ in self.aggregates:
+                if func in ('SUM', 'AVG'):
+                    total, count = state[index[f'{alias}__sum']], state[index[f'{alias}__count']]
+                    row.append(None if not count else total if func == 'SUM' else total / count)
+                else:
+                    row.append(state[index[alias]])
+            rows.append(tuple(row))
+        return rows
+
+
+# ----------------------------------------------------------------------------
+# Drop files: producer, tailer and bounded-memory parser
+# ----------------------------------------------------------------------------
+
+def render_drop(table, fmt):
+    """Serialize a slice of sales as JSONL or CSV text, NULLs as null / empty fields"""
+    columns = [table[name].to_list() for name in FIELDS]
+    rows = [[v.isoformat() if isinstance(v, datetime.date) else v for v in row]
+            for row in zip(*columns)]
+    if fmt == 'jsonl':
+        return ''.join(json.dumps(dict(zip(FIELDS, row))) + '\n' for row in rows)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(FIELDS)
+    writer.writerows(['' if v is None else v for v in row] for row in rows)
+    return out.getvalue()
+
+
+def produce(directory, drops, rows_per_second, done):
+    """Write pre-rendered drops at a target row rate, each via a .tmp name and a rename"""
+    start = time.perf_counter()
+    sent = 0
+    for i, (fmt, text, n_rows) in enumerate(drops):
+        if rows_per_second:
+            delay = start + sent / rows_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        path = os.path.join(directory, f'drop-{i:06d}.{fmt}')
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
+        sent += n_rows
+    done.set()
+
+
+def tail(directory, done, poll_seconds=0.01):
+    """
+    Yield complete drop files in name order until the producer is done and all
+    are read; each file is deleted when the caller asks for the next one
+    """
+    while True:
+        # Check done before listing, so files renamed just before it was set are still found
+        finished = done.is_set()
+        new = sorted(name for name in os.listdir(directory) if name.endswith(('.jsonl', '.csv')))
+        for name in new:
+            path = os.path.join(directory, name)
+            yield path
+            os.remove(path)
+        if not new:
+            if finished:
+                return
+            time.sleep(poll_seconds)
+
+
+def _records(path):
+    """Dicts of raw field values, one per line"""
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                yield json.loads(line)
+        else:
+            for record in csv.DictReader(f):
+                yield record
+
+
+def _value(raw, dtype):
+    if raw is None or raw == '':
+        return None
+    return raw if dtype is object else dtype(raw).item()
+
+
+def _batch(records):
+    batch = {name: Column.from_list([_value(r.get(name), dtype) for r in records], dtype=dtype)
+             for name, dtype in PARSED.items()}
+    batch['revenue'] = batch['quantity'] * batch['unit_price']
+    return batch
+
+
+def parse_micro_batches(path, batch_rows):
+    """Columnar micro-batches of at most batch_rows rows; the last one is marked final"""
+    records = []
+    for record in _records(path):
+        records.append(record)
+        if len(records) == batch_rows:
+            yield _batch(records), False
+            records = []
+    yield _batch(records), True
+
+
+def read_drops(directory, done, batches, batch_rows, stats):
+    """
+    Reader thread: tail and parse drops into the bounded queue, blocking when
+    it is full. The end-of-stream None is always sent; an error is left in
+    stats['error'] for the consumer to raise
+    """
+    try:
+        for path in tail(directory, done):
+            landed = os.stat(path).st_mtime
+            for batch, final in parse_micro_batches(path, batch_rows):
+                item = (batch, landed if final else None)
+                try:
+                    batches.put_nowait(item)
+                except queue.Full:
+                    start = time.perf_counter()
+                    batches.put(item)
+                    stats['stalls'] += 1
+                    stats['stalled'] += time.perf_counter() - start
+            stats['files'] += 1
+    except BaseException as error:
+        stats['error'] = error
+    finally:
+        batches.put(None)
+
+
+# ----------------------------------------------------------------------------
+# Pipeline
+# ----------------------------------------------------------------------------
+
+def publish(path, views, version, rows_in):
+    """Write a snapshot of every view atomically"""
+    snapshot = {'version': version, 'rows': rows_in, 'published': time.time(),
+                'views': {name: view.rows() for name, view in views.items()}}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(path + '.tmp', path)
+    return snapshot
+
+
+def run_pipeline(directory, output, done, batch_rows, queue_batches, snapshot_interval):
+    """Consume micro-batches until the stream ends; returns the last snapshot and statistics"""
+    views = {name: IncrementalView(keys, aggregates) for name, (keys, aggregates) in VIEWS.items()}
+    batches = queue.Queue(maxsize=queue_batches)
+    stats = {'files': 0, 'stalls': 0, 'stalled': 0.0, 'batches': 0, 'rows': 0,
+             'merge': 0.0, 'snapshots': 0, 'max_depth': 0, 'latencies': [], 'error': None}
+    reader = threading.Thread(target=read_drops,
+                              args=(directory, done, batches, batch_rows, stats), daemon=True)
+    reader.start()
+    path = os.path.join(output, 'latest.json')
+    waiting = []
+    last_publish = time.perf_counter()
+    snapshot = None
+    while True:
+        stats['max_depth'] = max(stats['max_depth'], batches.qsize())
+        item = batches.get()
+        if item is None and stats['error'] is not None:
+            reader.join()
+            raise stats['error']
+        if item is not None:
+            batch, landed = item
+            start = time.perf_counter()
+            for view in views.values():
+                view.apply(batch)
+            stats['merge'] += time.perf_counter() - start
+            stats['batches'] += 1
+            stats['rows'] += table_length(batch)
+            if landed is not None:
+                waiting.append(landed)
+        # Publish on the interval, and as soon as the stream goes idle or ends
+        now = time.perf_counter()
+        if waiting and (item is None or batches.empty() or now - last_publish >= snapshot_interval):
+            stats['snapshots'] += 1
+            snapshot = publish(path, views, stats['snapshots'], stats['rows'])
+            stats['latencies'] += [snapshot['published'] - landed for landed in waiting]
+            waiting = []
+            last_publish = now
+        if item is None:
+            break
+    reader.join()
+    return snapshot, stats
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else float('nan')
+
+
+def main():
+    """Stream sales drops through the pipeline and check the snapshot against a batch GROUP BY"""
+    parser = argparse.ArgumentParser(description="Micro-batch streaming GROUP BY ingestion")
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--file-rows', type=int, default=20_000, help="rows per drop file")
+    parser.add_argument('--rate', type=int, default=50_000,
+                        help="producer rows per second (0 = as fast as possible)")
+    parser.add_argument('--batch-rows', type=int, default=5_000)
+    parser.add_argument('--queue-batches', type=int, default=8,
+                        help="micro-batches buffered before the reader blocks")
+    parser.add_argument('--snapshot-interval', type=float, default=0.25)
+    args = parser.parse_args()
+
+    print("Micro-batch streaming ingestion")
+    print("=" * 72)
+    sales = generate_sales(args.rows)
+    drops = []
+    for i, start in enumerate(range(0, args.rows, args.file_rows)):
+        piece = {name: column.take(slice(start, start + args.file_rows))
+                 for name, column in sales.items()}
+        fmt = 'jsonl' if i % 2 == 0 else 'csv'
+        drops.append((fmt, render_drop(piece, fmt), table_length(piece)))
+    rate = f"{args.rate:,} rows/s" if args.rate else "unthrottled"
+    print(f"{args.rows:,} sales in {len(drops)} JSONL/CSV drops of {args.file_rows:,} rows, "
+          f"producer {rate}")
+    print(f"Micro-batches of {args.batch_rows:,} rows, queue of {args.queue_batches}, "
+          f"snapshots every {args.snapshot_interval}s")
+
+    directory = tempfile.mkdtemp()
+    inbox, output = os.path.join(directory, 'inbox'), os.path.join(directory, 'snapshots')
+    os.makedirs(inbox)
+    os.makedirs(output)
+    try:
+        done = threading.Event()
+        producer = threading.Thread(target=produce, args=(inbox, drops, args.rate, done))
+        start = time.perf_counter()
+        producer.start()
+        snapshot, stats = run_pipeline(inbox, output, done, args.batch_rows, args.queue_batches,
+                                       args.snapshot_interval)
+        elapsed = time.perf_counter() - start
+        producer.join()
+    finally:
+        shutil.rmtree(directory)
+
+    latencies = np.array(stats['latencies']) * 1000
+    print("-" * 72)
+    print(f"Ingested {stats['rows']:,} rows from {stats['files']} files in {elapsed:.2f}s: "
+          f"{stats['rows'] / elapsed:,.0f} rows/s")
+    print(f"Micro-batches: {stats['batches']:,}, merge time {stats['merge']:.2f}s "
+          f"({stats['merge'] / max(stats['batches'], 1) * 1000:.2f}ms each)")
+    print(f"Backpressure: {stats['stalls']} reader stalls, {stats['stalled']:.2f}s blocked, "
+          f"max queue depth {stats['max_depth']}/{args.queue_batches}")
+    print(f"Snapshots published: {stats['snapshots']}")
+    print(f"End-to-end latency per file: p50 {_percentile(latencies, 50):.0f}ms, "
+          f"p95 {_percentile(latencies, 95):.0f}ms, p99 {_percentile(latencies, 99):.0f}ms, "
+          f"max {latencies.max():.0f}ms")
+
+    print("-" * 72)
+    table = dict(sales)
+    table['revenue'] = table['quantity'] * table['unit_price']
+    start = time.perf_counter()
+    for name, (keys, aggregates) in VIEWS.items():
+        expected = result_rows(group_by(table, keys, aggregates))
+        actual = [tuple(row) for row in snapshot['views'][name]]
+        match = rows_match(expected, actual, len(keys))
+        print(f"{'✓' if match else '✗'} {name}: {len(actual)} groups match the batch GROUP BY")
+    recompute = time.perf_counter() - start
+    print(f"Batch recompute of all views over {args.rows:,} rows: {recompute * 1000:.0f}ms "
+          f"vs {stats['merge'] / max(stats['batches'], 1) * 1000:.2f}ms per incremental merge")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
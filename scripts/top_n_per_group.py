@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Top-N-per-Group Operator for OUTER APPLY / LATERAL Queries
+SECTION 10 of sql/q5_join_examples.sql picks the top earner per department:
+
+    SELECT d.dept_name, top_emp.name, top_emp.salary
+    FROM departments d
+    OUTER APPLY (SELECT TOP 1 e.name, e.salary FROM employees e
+                 WHERE e.dept_id = d.dept_id ORDER BY e.salary DESC) AS top_emp;
+
+SQLite has no APPLY, so it runs as a correlated subquery per department or
+as ROW_NUMBER() over a full sort of employees. top_n_per_group makes one
+pass over the rows in chunks instead. Every group keeps at most its best n
+candidates (plus ties) and a cutoff, the key of its worst kept candidate,
+like the root of a bounded heap: a new row is compared with its group's
+cutoff and only rows that beat it are merged into the candidates.
+
+Ties follow the three window functions: 'row_number' keeps exactly n rows
+(earlier rows win ties), 'rank' keeps every row tied with the n-th
+(TOP n WITH TIES) and 'dense_rank' keeps the top n distinct values. NULL
+group keys form their own group as in PARTITION BY, and NULL sort values
+come last in DESC and first in ASC order, as in SQLite.
+"""
+
+import argparse
+import math
+import sqlite3
+import time
+
+import numpy as np
+
+from columnar import Column, table_length
+from groupby_engine import compute_group_ids, factorize
+from join_engine import equi_join
+from scaled_data import generate_departments, generate_employees, load_into_sqlite
+
+TIES = ('row_number', 'rank', 'dense_rank')
+CHUNK_ROWS = 65536
+
+
+def _order_key(column, descending):
+    """
+    (tier, key) arrays where larger sorts first. tier places NULLs as SQLite
+    does (last for DESC, first for ASC); key stays int64 for integers, dates
+    and string codes so large values never collapse into ties
+    """
+    values = column.values
+    if values.dtype == object:
+        values = factorize(column)[0]
+    elif np.issubdtype(values.dtype, np.datetime64):
+        values = values.view(np.int64)
+    values = values.astype(np.int64 if values.dtype.kind in 'iub' else np.float64)
+    # ~ reverses int64 order without overflowing at the minimum, unlike negation
+    key = values if descending else _descending(values)
+    tier = (column.valid if descending else ~column.valid).astype(np.int8)
+    return tier, np.where(column.valid, key, 0).astype(key.dtype)
+
+
+def _descending(values):
+    return ~values if values.dtype.kind == 'i' else -values
+
+
+def _group_ids(table, keys):
+    """Group id per row; a single key needs only its factorized codes (NULL last)"""
+    if len(keys) == 1:
+        return factorize(table[keys[0]])
+    group_ids, n_groups, _ = compute_group_ids([table[k] for k in keys], table_length(table))
+    return group_ids, n_groups
+
+
+def _select(groups, keys, rows, n, ties):
+    """Keep the best n candidates of every group; returns them sorted by group and rank"""
+    tier, key = keys
+    # Row position breaks ties, so ROW_NUMBER keeps the earliest of equal rows
+    order = np.lexsort((rows, _descending(key), -tier, groups))
+    groups, tier, key, rows = groups[order], tier[order], key[order], rows[order]
+    positions = np.arange(len(groups))
+    first = np.r_[True, groups[1:] != groups[:-1]] if len(groups) else np.zeros(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(first, positions, 0))
+    if ties == 'row_number':
+        rank = positions - group_start + 1
+    else:
+        changed = (tier[1:] != tier[:-1]) | (key[1:] != key[:-1])
+        new_value = first | np.r_[True, changed][:len(key)]
+        if ties == 'rank':
+            rank = np.maximum.accumulate(np.where(new_value, positions, 0)) - group_start + 1
+        else:
+            distinct = np.cumsum(new_value)
+            rank = distinct - distinct[group_start] + 1
+    keep = rank <= n
+    return groups[keep], (tier[keep], key[keep]), rows[keep], rank[keep]
+
+
+def top_n_per_group(table, keys, order_by, n, descending=True, ties='row_number',
+                    chunk_rows=CHUNK_ROWS):
+    """
+    Row positions of the first n rows of every group of `keys` ordered by `order_by`.
+
+    Returns (rows, rank): rows grouped by key (NULL group last) and ordered by
+    rank within each group, rank being the ROW_NUMBER/RANK/DENSE_RANK value.
+    """
+    if ties not in TIES:
+        raise ValueError(f"ties must be one of {TIES}, not {ties!r}")
+    if n < 0:
+        raise ValueError("n must be non-negative")
+    n_rows = table_length(table)
+    group_ids, n_groups = _group_ids(table, keys)
+    tier, key = _order_key(table[order_by], descending)
+
+    full = np.zeros(n_groups, dtype=bool)
+    cutoff_tier = np.zeros(n_groups, dtype=np.int8)
+    cutoff_key = np.zeros(n_groups, dtype=key.dtype)
+    empty = np.zeros(0, dtype=np.int64)
+    groups, rows, rank = empty, empty, empty
+    best_tier, best_key = np.zeros(0, dtype=np.int8), np.zeros(0, dtype=key.dtype)
+    if n == 0:
+        return rows, rank
+    for start in range(0, n_rows, chunk_rows):
+        chunk_groups = group_ids[start:start + chunk_rows]
+        chunk_tier = tier[start:start + chunk_rows]
+        chunk_key = key[start:start + chunk_rows]
+        bound_tier, bound_key = cutoff_tier[chunk_groups], cutoff_key[chunk_groups]
+        same_tier = chunk_tier == bound_tier
+        beats = (chunk_tier > bound_tier) | (same_tier & (chunk_key > bound_key))
+        if ties != 'row_number':
+            # Later rows lose ROW_NUMBER ties, but join RANK and DENSE_RANK ties
+            beats |= same_tier & (chunk_key == bound_key)
+        candidates = np.flatnonzero(~full[chunk_groups] | beats)
+        if not len(candidates):
+            continue
+        # Only groups that received a candidate are re-ranked; the rest keep their rows
+        touched = np.zeros(n_groups, dtype=bool)
+        touched[chunk_groups[candidates]] = True
+        merge = touched[groups]
+        kept = ~merge
+        new_groups, (new_tier, new_key), new_rows, new_rank = _select(
+            np.r_[groups[merge], chunk_groups[candidates]],
+            (np.r_[best_tier[merge], chunk_tier[candidates]],
+             np.r_[best_key[merge], chunk_key[candidates]]),
+            np.r_[rows[merge], candidates + start], n, ties)
+
+        last = np.r_[new_groups[1:] != new_groups[:-1], True]
+        cutoff_tier[new_groups[last]] = new_tier[last]
+        cutoff_key[new_groups[last]] = new_key[last]
+        if ties == 'dense_rank':
+            full[new_groups[new_rank == n]] = True
+        else:
+            full[touched] = np.bincount(new_groups, minlength=n_groups)[touched] >= n
+        groups = np.r_[groups[kept], new_groups]
+        best_tier = np.r_[best_tier[kept], new_tier]
+        best_key = np.r_[best_key[kept], new_key]
+        rows = np.r_[rows[kept], new_rows]
+        rank = np.r_[rank[kept], new_rank]
+    order = np.lexsort((rows, rank, groups))
+    return rows[order], rank[order]
+
+
+def apply_top_n(outer, inner, key, order_by, n, descending=True, ties='row_number',
+                outer_apply=True):
+    """
+    outer [OUTER|CROSS] APPLY (SELECT TOP n ... FROM inner WHERE inner.key = outer.key
+    ORDER BY order_by).
+
+    Returns (outer_rows, inner_rows, rank) ordered by outer row and rank. OUTER APPLY
+    keeps outer rows without a match with inner_rows = -1; NULL keys never match.
+    """
+    rows, rank = top_n_per_group(inner, [key], order_by, n, descending, ties)
+    return attach(outer, inner, key, rows, rank, outer_apply)
+
+
+def attach(outer, inner, key, rows, rank, outer_apply=True):
+    """Join per-group (rows, rank) back to the outer table on key"""
+    left, right = equi_join(outer[key], inner[key].take(rows), 'hash')
+    if outer_apply:
+        unmatched = np.setdiff1d(np.arange(table_length(outer)), left)
+        left = np.r_[left, unmatched]
+        right = np.r_[right, np.full(len(unmatched), -1, dtype=np.int64)]
+    order = np.lexsort((right, left))
+    left, right = left[order], right[order]
+    return left, np.where(right >= 0, rows[right], -1), np.where(right >= 0, rank[right], -1)
+
+
+def take_outer(column, rows):
+    """Gather rows, with NULL where rows is -1 (the padded side of OUTER APPLY)"""
+    return Column(column.values[rows], column.valid[rows] & (rows >= 0))
+
+
+# ----------------------------------------------------------------------------
+# Reference rewrites
+# ----------------------------------------------------------------------------
+
+def window_top_n(table, keys, order_by, n, descending=True, ties='row_number'):
+    """The ROW_NUMBER() OVER (PARTITION BY ...) rewrite: rank every row after a full sort"""
+    group_ids, _ = _group_ids(table, keys)
+    rows = np.arange(table_length(table), dtype=np.int64)
+    _, _, rows, rank = _select(group_ids, _order_key(table[order_by], descending), rows,
+                               n, ties)
+    return rows, rank
+
+
+SQL_FUNCTIONS = {'row_number': 'ROW_NUMBER()', 'rank': 'RANK()', 'dense_rank': 'DENSE_RANK()'}
+
+
+def window_sql(n, order, ties):
+    """The window-function rewrite of the APPLY; employee_id breaks ROW_NUMBER ties"""
+    tie_break = ', employee_id' if ties == 'row_number' else ''
+    return f"""
+        SELECT d.dept_id, t.employee_id
+        FROM departments d
+        LEFT JOIN (
+            SELECT employee_id, dept_id, {order},
+                   {SQL_FUNCTIONS[ties]} OVER (PARTITION BY dept_id
+                                               ORDER BY {order} DESC{tie_break}) AS rn
+            FROM employees
+        ) t ON t.dept_id = d.dept_id AND t.rn <= {n}
+        ORDER BY d.dept_id, t.rn, t.employee_id"""
+
+
+def correlated_sql(n, order, ties):
+    """The APPLY as a subquery correlated with each department"""
+    if ties == 'row_number':
+        return f"""
+            SELECT d.dept_id, e.employee_id
+            FROM departments d
+            LEFT JOIN employees e ON e.employee_id IN (
+                SELECT e2.employee_id FROM employees e2 WHERE e2.dept_id = d.dept_id
+                ORDER BY e2.{order} DESC, e2.employee_id LIMIT {n})
+            ORDER BY d.dept_id, e.{order} DESC, e.employee_id"""
+    # WITH TIES: everyone at or above the n-th value (or n-th distinct value), found once
+    # per department; when that is NULL the department has fewer than n or NULLs tie last
+    distinct = 'DISTINCT ' if ties == 'dense_rank' else ''
+    return f"""
+        WITH cutoffs AS MATERIALIZED (
+            SELECT d.rowid AS position, d.dept_id,
+                   (SELECT {distinct}e2.{order} FROM employees e2 WHERE e2.dept_id = d.dept_id
+                    ORDER BY e2.{order} DESC LIMIT 1 OFFSET {n - 1}) AS nth
+            FROM departments d
+        )
+        SELECT c.dept_id, e.employee_id
+        FROM cutoffs c
+        LEFT JOIN employees e ON e.dept_id = c.dept_id AND (e.{order} >= c.nth OR c.nth IS NULL)
+        ORDER BY c.position, e.{order} DESC, e.employee_id"""
+
+
+def check_null_semantics():
+    """SECTION 1 sample rows plus a salary tie, a NULL salary and a second NULL department"""
+    employees = {
+        'employee_id': Column.from_list([1, 2, 3, 4, 5, 6, 7, 8, 9]),
+        'dept_id': Column.from_list([10, 20, 10, 30, None, 40, 10, 20, None]),
+        'salary': Column.from_list([75000.0, 65000.0, 80000.0, 70000.0, 60000.0,
+                                    55000.0, 80000.0, None, 90000.0]),
+    }
+    departments = {'dept_id': Column.from_list([10, 20, 30, 50])}
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE employees (employee_id INTEGER, dept_id INTEGER, salary REAL)")
+    conn.execute("CREATE TABLE departments (dept_id INTEGER)")
+    conn.executemany("INSERT INTO employees VALUES (?, ?, ?)",
+                     zip(*(c.to_list() for c in employees.values())))
+    conn.executemany("INSERT INTO departments VALUES (?)", [(d,) for d in [10, 20, 30, 50]])
+
+    for ties in TIES:
+        for n in (1, 2, 3):
+            for descending in (True, False):
+                direction = 'DESC' if descending else 'ASC'
+                tie_break = ', employee_id' if ties == 'row_number' else ''
+                expected = conn.execute(f"""
+                    SELECT employee_id, rn FROM (
+                        SELECT employee_id, {SQL_FUNCTIONS[ties]} OVER (PARTITION BY dept_id
+                            ORDER BY salary {direction}{tie_break}) AS rn
+                        FROM employees) WHERE rn <= {n}""").fetchall()
+                rows, rank = top_n_per_group(employees, ['dept_id'], 'salary', n, descending,
+                                             ties, chunk_rows=2)
+                actual = list(zip((rows + 1).tolist(), rank.tolist()))
+                assert sorted(expected) == sorted(actual), (ties, n, direction)
+            # Eve and the second NULL department never match a department row
+            outer_rows, inner_rows, _ = apply_top_n(departments, employees, 'dept_id',
+                                                    'salary', n, ties=ties)
+            actual = [(departments['dept_id'].values[d], e + 1 if e >= 0 else None)
+                      for d, e in zip(outer_rows.tolist(), inner_rows.tolist())]
+            expected = conn.execute(correlated_sql(n, 'salary', ties)).fetchall()
+            assert sorted(actual, key=str) == sorted(expected, key=str), (ties, n)
+    conn.close()
+
+    # Integers beyond 2**53 must not tie, and the int64 minimum must survive ASC reversal
+    big = 2 ** 62
+    table = {'g': Column.from_list([1, 1, 1, 1]),
+             'k': Column.from_list([big, big + 1, None, -2 ** 63])}
+    for descending, expected in ((True, [1, 0, 3, 2]), (False, [2, 3, 0, 1])):
+        for ties in TIES:
+            rows, rank = top_n_per_group(table, ['g'], 'k', 4, descending, ties, chunk_rows=2)
+            assert rows.tolist() == expected and rank.tolist() == [1, 2, 3, 4], (ties, descending)
+
+
+# ----------------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------------
+
+def _best(func, repeat):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _pairs(outer_rows, inner_rows, dept_id, employee_id):
+    ids = np.where(inner_rows >= 0, employee_id[inner_rows], -1)
+    return sorted(zip(dept_id[outer_rows].tolist(), ids.tolist()))
+
+
+def _sql_pairs(rows):
+    return sorted((d, -1 if e is None else e) for d, e in rows)
+
+
+CASES = [
+    # label, order column, n, ties
+    ("top earner per department", 'salary', 1, 'row_number'),
+    ("top 3 earners per department", 'salary', 3, 'row_number'),
+    ("3 latest hire dates WITH TIES", 'hire_date', 3, 'rank'),
+    ("3 latest distinct hire dates", 'hire_date', 3, 'dense_rank'),
+]
+
+
+def run_benchmark(n_employees, repeat, with_sqlite):
+    n_departments = max(4, n_employees // 50)
+    employees = generate_employees(n_employees, n_departments)
+    departments = generate_departments(n_departments)
+    employee_id = employees['employee_id'].values
+    dept_id = departments['dept_id'].values
+    conn = None
+    if with_sqlite:
+        conn = sqlite3.connect(':memory:')
+        load_into_sqlite(conn, 'employees', employees)
+        load_into_sqlite(conn, 'departments', departments)
+        # Without it every correlated subquery scans all employees
+        conn.execute("CREATE INDEX idx_employees_dept ON employees(dept_id)")
+
+    print(f"\nScale: {n_employees:,} employees in {n_departments:,} departments")
+    header = f"{'OUTER APPLY query':<32}{'Window':>10}{'Top-N':>10}{'Speedup':>9}"
+    if conn:
+        header += f"{'SQLite corr.':>14}{'SQLite win.':>13}"
+    print(header)
+    print("-" * len(header))
+    for label, order, n, ties in CASES:
+        def window():
+            rows, rank = window_top_n(employees, ['dept_id'], order, n, ties=ties)
+            return attach(departments, employees, 'dept_id', rows, rank)
+
+        window_time, expected = _best(window, repeat)
+        operator_time, actual = _best(
+            lambda: apply_top_n(departments, employees, 'dept_id', order, n, ties=ties), repeat)
+        expected = _pairs(expected[0], expected[1], dept_id, employee_id)
+        actual = _pairs(actual[0], actual[1], dept_id, employee_id)
+        ok = expected == actual
+        line = (f"{label:<32}{window_time * 1000:>8.1f}ms{operator_time * 1000:>8.1f}ms"
+                f"{window_time / operator_time:>8.1f}x")
+        if conn:
+            correlated_time, correlated = _best(
+                lambda: conn.execute(correlated_sql(n, order, ties)).fetchall(), 1)
+            window_sql_time, windowed = _best(
+                lambda: conn.execute(window_sql(n, order, ties)).fetchall(), 1)
+            ok &= _sql_pairs(correlated) == _sql_pairs(windowed) == actual
+            line += f"{correlated_time * 1000:>12.0f}ms{window_sql_time * 1000:>11.0f}ms"
+        print(f"{line} {'✓' if ok else '✗'} {len(actual):,} rows")
+    if conn:
+        conn.close()
+
+
+def main():
+    """Check ties and NULLs against SQLite, then compare with the window and correlated rewrites"""
+    parser = argparse.ArgumentParser(description="Top-N-per-group operator")
+    parser.add_argument('--employees', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-sqlite', action='store_true', help="skip the SQLite reference timings")
+    args = parser.parse_args()
+
+    print("Top-N per group")
+    print("=" * 98)
+    check_null_semantics()
+    print("✓ ROW_NUMBER, RANK and DENSE_RANK cut-offs and OUTER APPLY match SQLite, "
+          "NULLs included")
+    for n_employees in args.employees:
+        run_benchmark(n_employees, args.repeat, not args.no_sqlite)
+    print("=" * 98)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Incremental Sliding-Window Aggregation over sale_date
+Example 4 in SECTION 10 of sql/q6_groupby_examples.sql computes daily
+revenue per sale_date. 7-day and 30-day trailing windows on top of it are
+usually written with window functions:
+
+    SUM(daily_revenue) OVER (ORDER BY sale_day
+                             RANGE BETWEEN 6 PRECEDING AND CURRENT ROW)
+
+SlidingWindow keeps a trailing RANGE window of days instead and updates it
+in O(1) amortized time per day:
+
+- COUNT(*), COUNT, SUM and AVG: running totals; a day's partials are added
+  when it enters and subtracted when it falls out of the window
+- MIN and MAX: monotonic deques of (day, value). A new day pops every entry
+  it dominates from the back, and expired days leave from the front, so the
+  front is always the window's extreme
+
+Rows arrive as batches sorted by sale_date. Each batch is reduced to per-day
+partials (row count, non-NULL count, sum, min, max) with the GROUP BY engine,
+and a day split across two batches is merged before it is pushed, so any
+batch size gives the same result. Windows over raw rows and windows over the
+Example 4 daily rows are the same operator with different input. NULLs follow
+SQL: COUNT(column), SUM, AVG, MIN and MAX skip them, and an aggregate over no
+non-NULL value is NULL. Rows with a NULL sale_date sort first in SQL and form
+one peer group whose RANGE frame is just that group, so they come out as a
+leading NULL-date row aggregated over themselves.
+"""
+
+import argparse
+import sqlite3
+from collections import deque
+
+import numpy as np
+
+from columnar import Column, table_length
+from groupby_engine import group_by, rows_match, time_call
+from scaled_data import generate_sales, load_into_sqlite
+
+WINDOW_FUNCTIONS = ('COUNT(*)', 'COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+
+
+class SlidingWindow:
+    """Trailing RANGE window of `days` days over per-day partial aggregates pushed in day order"""
+
+    def __init__(self, days, aggregates):
+        for _, func, _ in aggregates:
+            if func not in WINDOW_FUNCTIONS:
+                raise ValueError(f"Unsupported window function: {func}")
+        self.days = days
+        self.aggregates = aggregates
+        self.columns = sorted({column for _, _, column in aggregates if column})
+        self._window = deque()
+        self._rows = 0
+        self._count = dict.fromkeys(self.columns, 0)
+        self._total = dict.fromkeys(self.columns, 0.0)
+        self._low = {column: deque() for column in self.columns}
+        self._high = {column: deque() for column in self.columns}
+        self._last_day = None
+
+    def push(self, day, n_rows, partials):
+        """
+        Add one day and return the window's aggregates ending at it.
+
+        day: integer day number; partials: column -> (count, total, low, high)
+        over the day's non-NULL values (low/high are ignored when count is 0).
+        """
+        if self._last_day is not None and day <= self._last_day:
+            raise ValueError(f"Days must be pushed in increasing order: {day} after {self._last_day}")
+        self._last_day = day
+        self._evict(day - self.days)
+        self._window.append((day, n_rows, partials))
+        self._rows += n_rows
+        for column, (count, total, low, high) in partials.items():
+            if not count:
+                continue
+            self._count[column] += count
+            self._total[column] += total
+            lows, highs = self._low[column], self._high[column]
+            while lows and lows[-1][1] >= low:
+                lows.pop()
+            lows.append((day, low))
+            while highs and highs[-1][1] <= high:
+                highs.pop()
+            highs.append((day, high))
+        return self.current()
+
+    def _evict(self, cutoff):
+        """Drop days at or before cutoff"""
+        while self._window and self._window[0][0] <= cutoff:
+            _, n_rows, partials = self._window.popleft()
+            self._rows -= n_rows
+            for column, (count, total, _, _) in partials.items():
+                self._count[column] -= count
+                # Reset instead of subtracting to zero so rounding error cannot linger
+                self._total[column] = self._total[column] - total if self._count[column] else 0.0
+        for extremes in (self._low, self._high):
+            for entries in extremes.values():
+                while entries and entries[0][0] <= cutoff:
+                    entries.popleft()
+
+    def current(self):
+        """One value per aggregate for the current window, None for SQL NULL"""
+        values = []
+        for _, func, column in self.aggregates:
+            if func == 'COUNT(*)':
+                values.append(self._rows)
+                continue
+            count = self._count[column]
+            if func == 'COUNT':
+                values.append(count)
+            elif not count:
+                values.append(None)
+            elif func == 'SUM':
+                values.append(self._total[column])
+            elif func == 'AVG':
+                values.append(self._total[column] / count)
+            else:
+                values.append((self._low if func == 'MIN' else self._high)[column][0][1])
+        return values
+
+
+# ----------------------------------------------------------------------------
+# Streaming driver
+# ----------------------------------------------------------------------------
+
+def day_partials(batch, date_column, columns):
+    """[(day, n_rows, {column: (count, total, low, high)})] for one date-sorted batch"""
+    aggregates = [('__rows', 'COUNT(*)', None)]
+    for column in columns:
+        aggregates += [(f'{column}__count', 'COUNT', column), (f'{column}__sum', 'SUM', column),
+                       (f'{column}__min', 'MIN', column), (f'{column}__max', 'MAX', column)]
+    result = group_by(batch, [date_column], aggregates)
+    days = result[date_column].values.astype('datetime64[D]').astype(np.int64).tolist()
+    n_rows = result['__rows'].values.tolist()
+    parts = {column: [result[f'{column}__{name}'].values.tolist()
+                      for name in ('count', 'sum', 'min', 'max')] for column in columns}
+    return [(day, n_rows[i], {column: (lists[0][i], lists[1][i] if lists[0][i] else 0.0,
+                                       lists[2][i], lists[3][i])
+                              for column, lists in parts.items()})
+            for i, day in enumerate(days)]
+
+
+def _undated_partial(batch, date_column, columns, mask):
+    """One partial over the rows in mask, which have a NULL date, as if they shared a day"""
+    rows = {name: column.filter(mask) for name, column in batch.items()}
+    rows[date_column] = Column(np.zeros(int(np.count_nonzero(mask)), dtype='datetime64[D]'))
+    return day_partials(rows, date_column, columns)[0]
+
+
+def _merge(a, b):
+    """Combine two partials of the same day"""
+    day, n_rows, partials = a
+    merged = {}
+    for column, (count, total, low, high) in partials.items():
+        other = b[2][column]
+        if not other[0]:
+            merged[column] = (count, total, low, high)
+        elif not count:
+            merged[column] = other
+        else:
+            merged[column] = (count + other[0], total + other[1], min(low, other[2]),
+                              max(high, other[3]))
+    return day, n_rows + b[1], merged
+
+
+def sliding_window(batches, date_column, windows, aggregates):
+    """
+    Trailing windows over a stream of date-sorted batches (dicts of Columns).
+
+    windows: window lengths in days; output columns are '<alias>_<days>d',
+    one row per distinct date, like a RANGE frame ending at each date.
+    """
+    operators = [SlidingWindow(days, aggregates) for days in windows]
+    columns = operators[0].columns
+    dates, rows = [], []
+    pending = undated = None
+
+    def emit(partial):
+        dates.append(partial[0])
+        rows.append([value for op in operators for value in op.push(*partial)])
+
+    for batch in batches:
+        if not table_length(batch):
+            continue
+        dated = batch[date_column].valid
+        if not dated.all():
+            partial = _undated_partial(batch, date_column, columns, ~dated)
+            undated = partial if undated is None else _merge(undated, partial)
+            batch = {name: column.filter(dated) for name, column in batch.items()}
+            if not table_length(batch):
+                continue
+        partials = day_partials(batch, date_column, columns)
+        if pending is not None:
+            if partials[0][0] == pending[0]:
+                partials[0] = _merge(pending, partials[0])
+            else:
+                emit(pending)
+        for partial in partials[:-1]:
+            emit(partial)
+        pending = partials[-1]
+    if pending is not None:
+        emit(pending)
+    valid = [True] * len(dates)
+    if undated is not None:
+        # The NULL peer group's frame holds only itself, whatever the window length
+        dates.insert(0, 0)
+        valid.insert(0, False)
+        rows.insert(0, [value for days in windows
+                        for value in SlidingWindow(days, aggregates).push(*undated)])
+
+    result = {date_column: Column(np.array(dates, dtype='datetime64[D]'), valid)}
+    names = [f'{alias}_{days}d' for days in windows for alias, _, _ in aggregates]
+    for i, name in enumerate(names):
+        values = [row[i] for row in rows]
+        result[name] = Column.from_list(values, dtype=np.float64)
+    return result
+
+
+def batches_of(table, batch_rows):
+    """Slice a date-sorted table into consecutive batches"""
+    n_rows = table_length(table)
+    for start in range(0, n_rows, batch_rows):
+        yield {name: column.take(slice(start, start + batch_rows)) for name, column in table.items()}
+
+
+# ----------------------------------------------------------------------------
+# Benchmark against SQLite window functions
+# ----------------------------------------------------------------------------
+
+ROW_AGGREGATES = [('sales', 'COUNT(*)', None), ('priced', 'COUNT', 'revenue'),
+                  ('revenue', 'SUM', 'revenue'), ('avg_sale', 'AVG', 'revenue'),
+                  ('min_sale', 'MIN', 'revenue'), ('max_sale', 'MAX', 'revenue')]
+DAILY_AGGREGATES = [('revenue', 'SUM', 'daily_revenue'), ('avg_day', 'AVG', 'daily_revenue'),
+                    ('worst_day', 'MIN', 'daily_revenue'), ('best_day', 'MAX', 'daily_revenue')]
+
+
+def _frame(days):
+    return f"(ORDER BY julianday(sale_date) RANGE BETWEEN {days - 1} PRECEDING AND CURRENT ROW)"
+
+
+def daily_window_sql(days):
+    """Example 4's daily revenue with trailing windows on top"""
+    return f"""
+        WITH daily AS (
+            SELECT sale_date, SUM(quantity * unit_price) AS daily_revenue
+            FROM sales GROUP BY sale_date)
+        SELECT sale_date, SUM(daily_revenue) OVER w, AVG(daily_revenue) OVER w,
+               MIN(daily_revenue) OVER w, MAX(daily_revenue) OVER w
+        FROM daily WINDOW w AS {_frame(days)} ORDER BY sale_date"""
+
+
+def row_window_sql(days):
+    """Trailing windows over every sale row, one output row per sale_date"""
+    revenue = "quantity * unit_price"
+    return f"""
+        SELECT sale_date, n, priced, total, average, low, high FROM (
+            SELECT sale_date, COUNT(*) OVER w AS n, COUNT({revenue}) OVER w AS priced,
+                   SUM({revenue}) OVER w AS total, AVG({revenue}) OVER w AS average,
+                   MIN({revenue}) OVER w AS low, MAX({revenue}) OVER w AS high
+            FROM sales WINDOW w AS {_frame(days)})
+        GROUP BY sale_date ORDER BY sale_date"""
+
+
+def _engine_rows(result, windows, aggregates):
+    """Rows per window length as (date, values...) tuples to compare with SQLite"""
+    column = result['sale_date']
+    dates = Column(column.values.astype(str).astype(object), column.valid).to_list()
+    by_window = {}
+    for days in windows:
+        names = [f'{alias}_{days}d' for alias, _, _ in aggregates]
+        values = [result[name].to_list() for name in names]
+        by_window[days] = [(d, *row) for d, *row in zip(dates, *values)]
+    return by_window
+
+
+def check_null_semantics():
+    """Empty windows, NULL-only days and a gap longer than the window"""
+    batch = {'sale_date': Column(np.array(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-09'],
+                                          dtype='datetime64[D]')),
+             'value': Column.from_list([5.0, None, None, 2.0])}
+    aggregates = [('n', 'COUNT(*)', None), ('c', 'COUNT', 'value'), ('s', 'SUM', 'value'),
+                  ('lo', 'MIN', 'value')]
+    result = sliding_window(batches_of(batch, 1), 'sale_date', [2], aggregates)
+    # 01-02 still sees 01-01's 5.0; on 01-09 the window holds only that day
+    assert result['n_2d'].to_list() == [2, 3, 1]
+    assert result['c_2d'].to_list() == [1, 1, 1]
+    assert result['s_2d'].to_list() == [5.0, 5.0, 2.0]
+    assert result['lo_2d'].to_list() == [5.0, 5.0, 2.0]
+    only_null = {'sale_date': batch['sale_date'].take(slice(1, 3)), 'value': batch['value'].take(slice(1, 3))}
+    assert sliding_window([only_null], 'sale_date', [7], aggregates)['s_7d'].to_list() == [None, None]
+    # NULL dates, in any batch, form one leading peer group that sees only itself
+    undated = {'sale_date': Column(batch['sale_date'].values, [False, True, True, False]),
+               'value': Column.from_list([1.0, 5.0, None, 2.0])}
+    result = sliding_window(batches_of(undated, 2), 'sale_date', [2], aggregates)
+    assert result['sale_date'].valid.tolist() == [False, True, True]
+    assert result['n_2d'].to_list() == [2, 1, 2]
+    assert result['s_2d'].to_list() == [3.0, 5.0, 5.0]
+    return True
+
+
+def run_benchmark(n_rows, n_days, windows, batch_rows, repeat):
+    sales = generate_sales(n_rows, n_days=n_days)
+    order = np.argsort(sales['sale_date'].values, kind='stable')
+    sales = {name: column.take(order) for name, column in sales.items()}
+    sales['revenue'] = sales['quantity'] * sales['unit_price']
+    conn = sqlite3.connect(':memory:')
+    load_into_sqlite(conn, 'sales', {n: c for n, c in sales.items() if n != 'revenue'})
+    print(f"\n{n_rows:,} sales over {n_days:,} days ({n_days / 365:.1f} years), "
+          f"batches of {batch_rows:,} rows")
+    print(f"{'Input':<16}{'Window':>8}{'SQLite':>11}{'Engine':>11}{'Speedup':>10}{'Match':>7}")
+    print("-" * 70)
+
+    def daily_engine():
+        daily = group_by(sales, ['sale_date'], [('daily_revenue', 'SUM', 'revenue')])
+        return sliding_window(batches_of(daily, batch_rows), 'sale_date', windows,
+                              DAILY_AGGREGATES)
+
+    def row_engine():
+        return sliding_window(batches_of(sales, batch_rows), 'sale_date', windows, ROW_AGGREGATES)
+
+    for label, engine, sql, aggregates in (
+            ("daily revenue", daily_engine, daily_window_sql, DAILY_AGGREGATES),
+            ("sale rows", row_engine, row_window_sql, ROW_AGGREGATES)):
+        engine_seconds, result = time_call(engine, repeat)
+        expected = _engine_rows(result, windows, aggregates)
+        # Every window length comes from the same pass, so share its time out evenly
+        for days in windows:
+            sqlite_seconds, rows = time_call(lambda: conn.execute(sql(days)).fetchall(), repeat)
+            share = engine_seconds / len(windows)
+            match = rows_match([tuple(row) for row in rows], expected[days], 1)
+            print(f"{label:<16}{f'{days}d':>8}{sqlite_seconds:>10.3f}s{share:>10.3f}s"
+                  f"{sqlite_seconds / share:>9.1f}x{'✓' if match else '✗':>7}")
+    conn.close()
+
+
+def main():
+    """Check NULL handling and benchmark 7/30-day windows against SQLite RANGE frames"""
+    parser = argparse.ArgumentParser(description="Incremental sliding-window aggregation")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--days', type=int, default=3 * 365, help="days of synthetic sales")
+    parser.add_argument('--windows', type=int, nargs='+', default=[7, 30])
+    parser.add_argument('--batch-rows', type=int, default=65536)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Incremental sliding-window aggregation")
+    print("=" * 70)
+    check_null_semantics()
+    print("✓ NULL-only days, NULL dates, empty frames and gaps match SQL RANGE semantics")
+    run_benchmark(args.rows, args.days, args.windows, args.batch_rows, args.repeat)
+    print("=" * 70)
+    print("Engine time covers every window length in one pass and is split evenly")
+
+
+if __name__ == "__main__":
+    main()